@@ -0,0 +1,109 @@
+"""
+Benchmark the scan of the current state of a directory.
+
+Compares globbing the directory once per pattern (legacy behaviour) against
+`DirectoryScanner`, which matches all the patterns in a single walk of the
+directory, on a synthetic tree. Then compares the serial and parallel walks
+of `DirectoryScanner` when every directory listing has a simulated metadata
+latency, as on network filesystems (e.g., Lustre or NFS).
+
+Usage:
+
+    python benchmarks/bench_directory_scanner.py
+"""
+import glob
+import os
+import shutil
+import tempfile
+import time
+
+from dpypeline.akita import directory_scanner
+from dpypeline.akita.directory_scanner import DirectoryScanner
+
+N_DIRS = 50
+N_SUBDIRS = 20
+N_FILES_PER_DIR = 50
+PATTERNS = ["**/*.nc", "**/*.csv", "**/*.zarr"]
+LATENCY = 0.002
+
+
+def create_tree(root: str) -> None:
+    """Create a synthetic directory tree."""
+    for i in range(N_DIRS):
+        for j in range(N_SUBDIRS):
+            directory = os.path.join(root, f"run_{i:03d}", f"output_{j:03d}")
+            os.makedirs(directory)
+            for k in range(N_FILES_PER_DIR):
+                extension = ["nc", "csv", "log", "txt"][k % 4]
+                open(os.path.join(directory, f"file_{k:04d}.{extension}"), "w").close()
+
+
+def glob_loop(root: str) -> list[str]:
+    """Glob the directory once per pattern."""
+    files = []
+    for pattern in PATTERNS:
+        files.extend(glob.glob(os.path.join(root, pattern), recursive=True))
+
+    return files
+
+
+def scanner(root: str, workers: int = 1) -> list[str]:
+    """Scan the directory once for all the patterns."""
+    return list(
+        DirectoryScanner(root, PATTERNS, recursive=True, workers=workers).scan()
+    )
+
+
+class SlowScandir:
+    """os.scandir with a simulated metadata latency."""
+
+    def __init__(self, latency: float) -> None:
+        """Initialize the wrapper."""
+        self.latency = latency
+        self.scandir = os.scandir
+
+    def __call__(self, path: str):
+        """List a directory after sleeping for the latency."""
+        time.sleep(self.latency)
+        return self.scandir(path)
+
+
+def timeit(func, root: str, repeat: int = 3) -> tuple[float, int]:
+    """Return the best time (in seconds) and number of files found."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        files = func(root)
+        best = min(best, time.perf_counter() - start)
+
+    return best, len(files)
+
+
+if __name__ == "__main__":
+    root = tempfile.mkdtemp()
+    create_tree(root)
+    n_entries = N_DIRS * N_SUBDIRS * N_FILES_PER_DIR
+
+    print(f"Tree of {n_entries} files, patterns {PATTERNS}.")
+    print(f"{'method':>20} | {'time (s)':>9} | {'files':>7}")
+    glob_time, glob_files = timeit(glob_loop, root)
+    print(f"{'glob per pattern':>20} | {glob_time:>9.3f} | {glob_files:>7}")
+    scan_time, scan_files = timeit(scanner, root)
+    print(f"{'DirectoryScanner':>20} | {scan_time:>9.3f} | {scan_files:>7}")
+    print(f"Speedup: {glob_time / scan_time:.1f}x")
+
+    print(f"\nSimulated metadata latency of {LATENCY * 1e3:.0f} ms per directory.")
+    print(f"{'workers':>20} | {'time (s)':>9} | {'files':>7}")
+    scandir = SlowScandir(LATENCY)
+    setattr(directory_scanner.os, "scandir", scandir)
+    serial_time = None
+    for workers in [1, 4, 16, 32]:
+        scan_time, scan_files = timeit(lambda r: scanner(r, workers), root, repeat=1)
+        serial_time = serial_time or scan_time
+        print(
+            f"{workers:>20} | {scan_time:>9.3f} | {scan_files:>7}"
+            + f" ({serial_time / scan_time:.1f}x)"
+        )
+    setattr(directory_scanner.os, "scandir", scandir.scandir)
+
+    shutil.rmtree(root)
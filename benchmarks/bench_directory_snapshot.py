@@ -0,0 +1,112 @@
+"""
+Benchmark the storage of the state of a directory.
+
+Compares the pickled list of paths (legacy format) against `DirectorySnapshot`,
+which stores the paths sorted and prefix-compressed in memory-mapped blocks,
+for a synthetic tree of a million files with long shared prefixes. Reports the
+size of the state file, the time to save it, to load it and to test the
+membership of paths. Snapshots are saved from the paths in the order of a
+scan, which is nearly sorted, and from the paths shuffled.
+
+Usage:
+
+    python benchmarks/bench_directory_snapshot.py
+"""
+import os
+import pickle
+import random
+import tempfile
+import time
+
+from dpypeline.akita.directory_snapshot import DirectorySnapshot, write_snapshot
+
+N_FILES = 1_000_000
+N_LOOKUPS = 10_000
+ROOT = "/gws/nopw/j04/project/model_output/experiment"
+
+
+def create_paths() -> list[str]:
+    """Create the paths of a synthetic tree."""
+    return [
+        f"{ROOT}/run_{i // 10000:03d}/year_{i // 100 % 100:02d}/file_{i:07d}.nc"
+        for i in range(N_FILES)
+    ]
+
+
+def bench_pickle(file: str, paths: list[str], lookups: list[str]) -> list[float]:
+    """Save, load and look up paths in a pickled list."""
+    start = time.perf_counter()
+    with open(file, "wb") as f:
+        pickle.dump(paths, f)
+    save_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with open(file, "rb") as f:
+        state = pickle.load(f)
+    load_time = time.perf_counter() - start
+
+    # The legacy state had to be turned into a set to look paths up
+    start = time.perf_counter()
+    state = set(state)
+    found = sum(path in state for path in lookups)
+    lookup_time = time.perf_counter() - start
+    assert found == len(lookups) // 2
+
+    return [os.path.getsize(file) / 1e6, save_time, load_time, lookup_time]
+
+
+def bench_snapshot(
+    file: str, paths: list[str], lookups: list[str], codec: str
+) -> list[float]:
+    """Save, load and look up paths in a snapshot."""
+    start = time.perf_counter()
+    write_snapshot(file, paths, codec=codec)
+    save_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    state = DirectorySnapshot(file)
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    found = sum(path in state for path in lookups)
+    lookup_time = time.perf_counter() - start
+    assert found == len(lookups) // 2
+    state.close()
+
+    return [os.path.getsize(file) / 1e6, save_time, load_time, lookup_time]
+
+
+def main() -> None:
+    """Run the benchmark."""
+    paths = create_paths()
+    random.seed(0)
+    lookups = random.sample(paths, N_LOOKUPS // 2) + [
+        f"{path}.missing" for path in random.sample(paths, N_LOOKUPS // 2)
+    ]
+    print(f"{N_FILES} paths, {N_LOOKUPS} lookups.")
+    print(
+        f"{'format':>16} | {'size (MB)':>9} | {'save (s)':>8} | "
+        + f"{'load (s)':>8} | {'lookups (s)':>11}"
+    )
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file = os.path.join(temp_dir, "state")
+        results = {"pickle": bench_pickle(file, paths, lookups)}
+        for codec in ["none", "zlib", "zstd"]:
+            try:
+                results[f"snapshot ({codec})"] = bench_snapshot(
+                    file, paths, lookups, codec
+                )
+            except ImportError:
+                print(f"Skipping codec {codec}: not installed.")
+        shuffled = random.sample(paths, len(paths))
+        results["snapshot (shuf)"] = bench_snapshot(file, shuffled, lookups, "none")
+
+    for name, (size, save, load, lookup) in results.items():
+        print(
+            f"{name:>16} | {size:>9.1f} | {save:>8.3f} | {load:>8.4f} | {lookup:>11.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Benchmark the upload of large files to an S3 object store.
+
+Compares the previous upload of `ObjectStoreS3.write_file_to_bucket`, which
+wrote each chunk as a separate `.partN` object, merged the parts server-side
+and removed them, against the multipart upload, which uploads each chunk as a
+part of a single multipart upload, with the parts read into buffers or sent
+from a memory map of the file. Reports the throughput and the number of
+requests of each, and the peak memory allocated by the client, against a local
+moto server standing in for S3. Then reports the throughput of the reads of
+the parts alone, as the HTTP client streams them, without the network.
+
+Usage (requires `moto[server]`):
+
+    python benchmarks/bench_object_store_upload.py
+"""
+import collections
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from threading import Lock
+
+import dask
+
+from dpypeline.filesystems.buffer_pool import BufferReader
+from dpypeline.filesystems.object_store import ObjectStoreS3
+
+FILE_SIZE = 256 * 2**20
+CHUNK_SIZE = 16 * 2**20
+BUCKET = "bucket-bench"
+
+
+def legacy_write_file_to_bucket(
+    store: ObjectStoreS3, path: str, dest_path: str, parallel: bool
+) -> None:
+    """Upload a file as part objects that are merged and removed (legacy)."""
+
+    def write_chunk(part_path: str, offset: int, length: int) -> None:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read(length)
+        with store.open(part_path, mode="wb") as f:
+            f.write(data)
+
+    store.open(dest_path, mode="wb").close()
+    chunks = store._create_chunks_offsets_lengths(os.path.getsize(path), CHUNK_SIZE)
+    parts = [f"{dest_path}.part{i}" for i in chunks]
+    args = [(part, c["offset"], c["length"]) for part, c in zip(parts, chunks.values())]
+    if parallel:
+        dask.compute([dask.delayed(write_chunk)(*a) for a in args])
+    else:
+        for a in args:
+            write_chunk(*a)
+    store.merge(dest_path, parts)
+    store.rm(parts)
+
+
+def unmapped_write_file_to_bucket(
+    store: ObjectStoreS3, path: str, dest_path: str, parallel: bool
+) -> None:
+    """Upload a file with the parts read into buffers rather than mapped."""
+    store._memory_map = False
+    try:
+        store.write_file_to_bucket(
+            path, BUCKET, dest_path.split("/", 1)[1], CHUNK_SIZE, parallel
+        )
+    finally:
+        store._memory_map = True
+
+
+def stream(body: BufferReader, block_size: int = 2**16) -> None:
+    """Read a body in blocks, as the HTTP client does."""
+    while body.read(block_size):
+        pass
+
+
+def bench_part_reads(store: ObjectStoreS3, path: str) -> None:
+    """Measure the throughput of the reads of the parts, without the network."""
+    chunks = store._create_chunks_offsets_lengths(
+        os.path.getsize(path), CHUNK_SIZE
+    ).values()
+
+    def buffered() -> None:
+        buffer = bytearray(CHUNK_SIZE)
+        with open(path, "rb") as f:
+            for chunk in chunks:
+                view = memoryview(buffer)[: chunk["length"]]
+                ObjectStoreS3._read_chunk(f, Lock(), view, chunk["offset"])
+                stream(BufferReader(view))
+
+    def mapped() -> None:
+        with open(path, "rb") as f:
+            mapped, _ = store._map_file(f)
+        for chunk in chunks:
+            offset, length = chunk["offset"], chunk["length"]
+            with BufferReader(memoryview(mapped)[offset : offset + length]) as body:
+                stream(body)
+        mapped.close()
+
+    print(f"{'part reads':>22} | {'GB/s':>6}")
+    for name, read in {"buffered": buffered, "mapped": mapped}.items():
+        read()
+        start = time.perf_counter()
+        read()
+        elapsed = time.perf_counter() - start
+        print(f"{name:>22} | {FILE_SIZE / elapsed / 1e9:>6.2f}")
+
+
+class MotoServer:
+    """Local moto server, in a separate process, that logs its requests."""
+
+    def __init__(self, log_file: str) -> None:
+        """Start the server."""
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+
+        # The server appends to the log, which is read with a separate handle
+        self.log = open(log_file, "w")
+        self.reader = open(log_file)
+        self.process = subprocess.Popen(
+            [sys.executable, "-u", "-m", "moto.server", "-p", str(self.port)],
+            stdout=self.log,
+            stderr=subprocess.STDOUT,
+        )
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", self.port)).close()
+                break
+            except ConnectionRefusedError:
+                time.sleep(0.1)
+
+    def count_requests(self) -> collections.Counter:
+        """Count the requests logged since the last call by HTTP method."""
+        counter: collections.Counter = collections.Counter()
+        for line in self.reader.readlines():
+            if '"' in line:
+                counter[line.split('"')[1].split()[0]] += 1
+
+        return counter
+
+    def stop(self) -> None:
+        """Stop the server."""
+        self.process.terminate()
+        self.process.wait()
+        self.log.close()
+        self.reader.close()
+
+
+def main() -> None:
+    """Run the benchmark."""
+    tmp_dir = tempfile.TemporaryDirectory()
+    server = MotoServer(os.path.join(tmp_dir.name, "server.log"))
+
+    store = ObjectStoreS3(
+        key="bench",
+        secret="bench",
+        endpoint_url=f"http://127.0.0.1:{server.port}",
+        skip_instance_cache=True,
+    )
+    store.create_bucket(BUCKET)
+    store.get_bucket_list()
+
+    print(
+        f"File of {FILE_SIZE / 2**20:.0f} MiB in chunks of {CHUNK_SIZE / 2**20:.0f} MiB."
+    )
+    print(
+        f"{'method':>22} | {'GB/s':>6} | {'peak (MiB)':>10} | "
+        + f"{'requests':>8} | breakdown"
+    )
+
+    with tempfile.NamedTemporaryFile() as f:
+        f.write(os.urandom(FILE_SIZE))
+        f.flush()
+
+        methods = {
+            "part-merge": lambda dest, p: legacy_write_file_to_bucket(
+                store, f.name, dest, p
+            ),
+            "buffered": lambda dest, p: unmapped_write_file_to_bucket(
+                store, f.name, dest, p
+            ),
+            "mapped": lambda dest, p: store.write_file_to_bucket(
+                f.name, BUCKET, dest.split("/", 1)[1], CHUNK_SIZE, p
+            ),
+        }
+        for name, method in methods.items():
+            for parallel in [False, True]:
+                dest = f"{BUCKET}/{name}_{parallel}.bin"
+                server.count_requests()
+                tracemalloc.start()
+                start = time.perf_counter()
+                method(dest, parallel)
+                elapsed = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1] / 2**20
+                tracemalloc.stop()
+                time.sleep(0.5)
+                counter = server.count_requests()
+
+                assert store.info(dest, refresh=True)["size"] == FILE_SIZE
+                label = f"{name} ({'parallel' if parallel else 'serial'})"
+                breakdown = ", ".join(f"{k}={v}" for k, v in sorted(counter.items()))
+                print(
+                    f"{label:>22} | {FILE_SIZE / elapsed / 1e9:>6.2f} | "
+                    + f"{peak:>10.0f} | {sum(counter.values()):>8} | {breakdown}"
+                )
+
+        print()
+        bench_part_reads(store, f.name)
+
+    server.stop()
+    tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark the observers of Akita.
+
+Builds a synthetic directory tree and measures, for each observer that can be
+selected through `AkitaFactory`, the CPU time used by the process while idle
+and the latency between the creation of a file and its detection.
+
+Usage:
+
+    python benchmarks/bench_observers.py
+"""
+import os
+import shutil
+import tempfile
+import time
+from threading import Event
+from typing import Any
+
+from watchdog.events import FileSystemEventHandler
+
+from dpypeline.akita.factory import AkitaFactory
+
+N_DIRS = 200
+N_FILES_PER_DIR = 100
+IDLE_TIME = 5.0
+N_NEW_FILES = 10
+
+
+class CreatedHandler(FileSystemEventHandler):
+    """Handler that records when the expected file is created."""
+
+    def __init__(self) -> None:
+        """Initialize the handler."""
+        self.expected: str | None = None
+        self.detected = Event()
+
+    def on_created(self, event) -> None:
+        """Signal the detection of the expected file."""
+        if event.src_path == self.expected:
+            self.detected.set()
+
+
+def create_tree(root: str) -> None:
+    """Create a synthetic directory tree."""
+    for i in range(N_DIRS):
+        directory = os.path.join(root, f"dir_{i:04d}")
+        os.mkdir(directory)
+        for j in range(N_FILES_PER_DIR):
+            open(os.path.join(directory, f"file_{j:04d}.nc"), "w").close()
+
+
+def benchmark(root: str, **factory_kwargs) -> tuple[float, float]:
+    """Return the idle CPU usage (in %) and mean detection latency (in seconds)."""
+    handler = CreatedHandler()
+    observer = AkitaFactory(root, **factory_kwargs).get_observer()
+    observer.schedule(handler, root, recursive=True)
+    observer.start()
+
+    # Let the observer take its initial snapshot
+    time.sleep(2)
+
+    cpu_start = time.process_time()
+    time.sleep(IDLE_TIME)
+    cpu_usage = 100 * (time.process_time() - cpu_start) / IDLE_TIME
+
+    latencies: list[float] = []
+    new_files: list[str] = []
+    for i in range(N_NEW_FILES):
+        handler.expected = os.path.join(root, f"dir_{i:04d}", f"new_{i:04d}.nc")
+        handler.detected.clear()
+        start = time.perf_counter()
+        open(handler.expected, "w").close()
+        handler.detected.wait(timeout=30)
+        latencies.append(time.perf_counter() - start)
+        new_files.append(handler.expected)
+
+    observer.stop()
+    observer.join()
+
+    # Files are removed once the observer has stopped, since a new file
+    # reusing the inode of a removed one is reported as moved by polling
+    for new_file in new_files:
+        os.remove(new_file)
+
+    return cpu_usage, sum(latencies) / len(latencies)
+
+
+if __name__ == "__main__":
+    root = tempfile.mkdtemp()
+    create_tree(root)
+
+    print(f"Tree of {N_DIRS} directories with {N_FILES_PER_DIR} files each.")
+    print(f"{'observer':>30} | {'idle CPU (%)':>12} | {'latency (s)':>11}")
+    configs: list[tuple[str, dict[str, Any]]] = [
+        ("polling", {"observer": "polling", "listdir_cache_size": 0}),
+        ("polling (cached listdir)", {"observer": "polling"}),
+        ("inotify", {"observer": "inotify"}),
+    ]
+    for name, kwargs in configs:
+        cpu_usage, latency = benchmark(root, **kwargs)
+        print(f"{name:>30} | {cpu_usage:>12.1f} | {latency:>11.3f}")
+
+    shutil.rmtree(root)
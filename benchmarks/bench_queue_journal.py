@@ -0,0 +1,65 @@
+"""
+Benchmark the cost of persisting the queue of events.
+
+Compares the per-operation cost of enqueuing events when the whole queue is
+re-pickled after every operation (legacy behaviour) against appending one
+record per operation to the write-ahead journal of `EventsQueue`.
+
+Usage:
+
+    python benchmarks/bench_queue_journal.py
+"""
+import os
+import pickle
+import tempfile
+import time
+from collections import deque
+
+N_OPS = 200
+
+
+def legacy_enqueue_cost(queue_size: int, cache_dir: str) -> float:
+    """Return the mean cost (in seconds) of an enqueue re-pickling the queue."""
+    queue = deque(f"/gws/nopw/j04/nemo/file_{i:08d}.nc" for i in range(queue_size))
+    state_file = os.path.join(cache_dir, "legacy_queue_state.pickle")
+
+    start = time.perf_counter()
+    for i in range(N_OPS):
+        queue.append(f"/gws/nopw/j04/nemo/new_{i:08d}.nc")
+        with open(state_file, "wb") as f:
+            pickle.dump(queue, f)
+
+    return (time.perf_counter() - start) / N_OPS
+
+
+def journal_enqueue_cost(queue_size: int, cache_dir: str) -> float:
+    """Return the mean cost (in seconds) of an enqueue using the journal."""
+    from dpypeline.akita.queue_events import EventsQueue
+
+    for file_name in ["queue_state.pickle", "queue_state.journal"]:
+        if os.path.isfile(os.path.join(cache_dir, file_name)):
+            os.remove(os.path.join(cache_dir, file_name))
+
+    queue = EventsQueue()
+    for i in range(queue_size):
+        queue.enqueue(f"/gws/nopw/j04/nemo/file_{i:08d}.nc")
+
+    start = time.perf_counter()
+    for i in range(N_OPS):
+        queue.enqueue(f"/gws/nopw/j04/nemo/new_{i:08d}.nc")
+    cost = (time.perf_counter() - start) / N_OPS
+
+    queue.clear_instance()
+
+    return cost
+
+
+if __name__ == "__main__":
+    cache_dir = tempfile.mkdtemp()
+    os.environ["CACHE_DIR"] = cache_dir
+
+    print(f"{'queue size':>12} | {'legacy (us/op)':>15} | {'journal (us/op)':>15}")
+    for queue_size in [1000, 10000, 50000, 100000, 200000]:
+        legacy = legacy_enqueue_cost(queue_size, cache_dir)
+        journal = journal_enqueue_cost(queue_size, cache_dir)
+        print(f"{queue_size:>12} | {legacy * 1e6:>15.1f} | {journal * 1e6:>15.1f}")
@@ -1,2 +1,16 @@
 """Akita package."""
-__all__ = ["core", "queue_events", "event_handler", "directory_state", "factory"]
+__all__ = [
+    "core",
+    "queue_events",
+    "queue_journal",
+    "processed_events",
+    "dead_letters",
+    "event_handler",
+    "settle_scheduler",
+    "event_coalescer",
+    "directory_state",
+    "directory_scanner",
+    "directory_snapshot",
+    "stat_cache",
+    "factory",
+]
@@ -1,9 +1,10 @@
 """Akita, the watchdog class."""
+import itertools
 import logging
+import os
 import time
-from itertools import chain
 from threading import Thread
-from typing import Any, Protocol
+from typing import Any, Collection, Iterable, Iterator, Protocol, Sequence
 
 logger = logging.getLogger(__name__)
 
@@ -15,14 +16,30 @@ class Queue(Protocol):
         """Enqueue an event."""
         ...
 
+    def enqueue_many(self, events: Iterable[Any]) -> int:
+        """Enqueue several events at once."""
+        ...
+
     @property
     def queue_list(self) -> list[Any]:
         """Return the list of events in the queue."""
         ...
 
     @property
-    def processed_events(self) -> list[Any]:
-        """Return the list of processed events."""
+    def processed_events(self) -> Collection[Any]:
+        """Return the store of processed events."""
+        ...
+
+    def is_processed(self, event: Any) -> bool:
+        """Return whether an event has been processed."""
+        ...
+
+    def processed_at(self, event: Any) -> float | None:
+        """Return the time at which an event was last processed, if known."""
+        ...
+
+    def is_dead_lettered(self, event: Any) -> bool:
+        """Return whether an event is in the dead-letter queue."""
         ...
 
     def set_sentinel_state(self, active: bool) -> bool:
@@ -34,7 +51,7 @@ class DirectoryState(Protocol):
     """DirectoryState class protocol."""
 
     @property
-    def stored_state(self) -> list[str]:
+    def stored_state(self) -> Sequence[str]:
         """Return the stored state of the directory."""
         ...
 
@@ -42,6 +59,15 @@ class DirectoryState(Protocol):
     def current_state(self) -> list[str]:
         """Return the current state of the directory."""
 
+    @property
+    def diff(self) -> Any:
+        """Return the files added, modified and removed since the previous scan."""
+        ...
+
+    def save_stat_cache(self) -> None:
+        """Save the stats of the files found by the last scan."""
+        ...
+
 
 class EventHandler(Protocol):
     """EventHandler class protocol."""
@@ -116,6 +142,10 @@ class Akita:
         Whether or not to run the watchdog.
     _worker
         Thread that runs the watchdog.
+    _enqueue_batch_size
+        Number of unenqueued files enqueued at once at the beginning of the run.
+    _log_sample_size
+        Number of events of each state logged at the beginning of the run.
     """
 
     def __init__(
@@ -127,6 +157,8 @@ class Akita:
         observer: Observer,
         monitor: bool = True,
         worker: Thread = None,
+        enqueue_batch_size: int = 10000,
+        log_sample_size: int = 10,
     ) -> None:
         """
         Initialize the Akita watchdog.
@@ -149,6 +181,12 @@ class Akita:
             If `True`, the watchdog will monitor the given path.
         worker
             Thread that runs the watchdog.
+        enqueue_batch_size, optional
+            Number of unenqueued files enqueued at once at the beginning
+            of the run, by default 10000.
+        log_sample_size, optional
+            Number of events of each state logged at the beginning
+            of the run, by default 10.
         """
         self._path = path
         self._queue = queue
@@ -157,6 +195,8 @@ class Akita:
         self._directory_state = directory_state
         self._worker = worker
         self._monitor = monitor
+        self._enqueue_batch_size = enqueue_batch_size
+        self._log_sample_size = log_sample_size
 
     @property
     def queue(self):
@@ -172,9 +212,11 @@ class Akita:
 
         del self._queue
 
-    def _get_unenqueued_files(self) -> list[str]:
+    def _iter_unenqueued_files(
+        self, curr_states: Iterable[str], queue: Iterable[Any]
+    ) -> Iterator[str]:
         """
-        Return a list of files that are not enqueued.
+        Yield the files that are not enqueued.
 
         Notes
         -----
@@ -183,55 +225,134 @@ class Akita:
           monitored have never been enqueued.
         This is done as follows:
 
-        n = d - (s V q V p)
+        n = d - (q V (p - m) V f)
 
         where
 
         - n / unqueued_events: events not enqueued.
-        - s / stored_states: events in the stored directory state.
         - d / curr_states: events in the current directory state.
         - q / queue: events in the queue when the previous session terminated.
-        - p / prev_sess_states: events processed in the previous session.
+        - p: events processed in the previous session.
+        - f: events in the dead-letter queue.
+        - m: events modified since the previous session and after they were
+          last processed, which are enqueued again even if they were processed.
+          Files still being written when the previous session scanned the
+          directory are reported as modified, but are not enqueued again if
+          they were processed after they were last written.
+
+        Processed and dead-lettered events are looked up by key in their
+        stores rather than materialised.
+
+        Parameters
+        ----------
+        curr_states
+            Events in the current directory state.
+        queue
+            Events in the queue.
+
+        Yields
+        ------
+            Files to enqueue, in the order of the current directory state,
+            each yielded once.
+        """
+        queued_events = set(queue)
+        diff = getattr(self._directory_state, "diff", None)
+        modified = set(diff.modified) if diff is not None else set()
+
+        for event in curr_states:
+            if (
+                event not in queued_events
+                and (
+                    not self._queue.is_processed(event)
+                    or (event in modified and self._is_modified_since_processed(event))
+                )
+                and not self._queue.is_dead_lettered(event)
+            ):
+                # Overlapping glob patterns may find the same file twice
+                queued_events.add(event)
+                yield event
+
+    def _is_modified_since_processed(self, event: str) -> bool:
+        """
+        Return whether a processed file has been modified since it was processed.
+
+        Parameters
+        ----------
+        event
+            Processed file.
+
+        Returns
+        -------
+            `True` if the file was modified after it was last processed, or if
+            the time at which it was processed is unknown; `False` otherwise.
+        """
+        processed_at = self._queue.processed_at(event)
+        if processed_at is None:
+            return True
+
+        try:
+            return os.stat(event).st_mtime > processed_at
+        except OSError:
+            return False
+
+    def _log_sample(self, message: str, events: Iterable[Any], n: int) -> None:
+        """
+        Log the number of events and a sample of them.
+
+        Parameters
+        ----------
+        message
+            Description of the events.
+        events
+            Events to sample.
+        n
+            Number of events.
+        """
+        logger.info(f"{message} (n={n}):")
+        for event in itertools.islice(events, self._log_sample_size):
+            logger.info(f"{event}")
+        if n > self._log_sample_size:
+            logger.info(f"... and {n - self._log_sample_size} more.")
+
+    def _get_unenqueued_files(self) -> list[str]:
+        """
+        Return a list of files that are not enqueued.
+
+        Notes
+        -----
+        See `_iter_unenqueued_files`. Only the number of events of each
+        state and a sample of them are logged.
 
         Returns
         -------
             List of files to enqueue.
         """
-        stored_states = self._directory_state.stored_state
         curr_states = self._directory_state.current_state
         queue = self._queue.queue_list
-        prev_sess_states = self._queue.processed_events
-        unqueued_events = set(curr_states) - set(
-            chain.from_iterable([queue, prev_sess_states])
-        )
+        diff = getattr(self._directory_state, "diff", None)
+        unqueued_events = list(self._iter_unenqueued_files(curr_states, queue))
 
         logger.info("-" * 79)
 
-        logger.info(f"Events in the stored directory state (n={len(stored_states)}):")
-        for event in stored_states:
-            logger.info(f"{event}")
-
-        logger.info(f"Events in the current directory state (n={len(curr_states)}):")
-        for event in curr_states:
-            logger.info(f"{event}")
-
-        logger.info(
-            "Events in the queue when the previous session terminated "
-            + f"(n={len(queue)}):"
+        self._log_sample(
+            "Events in the current directory state", curr_states, len(curr_states)
+        )
+        self._log_sample(
+            "Events in the queue when the previous session terminated",
+            queue,
+            len(queue),
         )
-        for event in queue:
-            logger.info(f"{event}")
-
         logger.info(
             "Events processed before the previous session terminated "
-            f"(n={len(prev_sess_states)}):"
+            + f"(n={len(self._queue.processed_events)})."
         )
-        for event in prev_sess_states:
-            logger.info(f"{event}")
-
-        logger.info(f"Events unenqueued (n={len(unqueued_events)}):")
-        for event in unqueued_events:
-            logger.info(f"{event}")
+        if diff is not None:
+            logger.info(
+                f"Events added (n={len(diff.added)}), modified "
+                + f"(n={len(diff.modified)}) and removed (n={len(diff.removed)}) "
+                + "since the previous session."
+            )
+        self._log_sample("Events unenqueued", unqueued_events, len(unqueued_events))
 
         logger.info(
             f"Found {len(unqueued_events)} files not enqueued "
@@ -240,18 +361,35 @@ class Akita:
 
         logger.info("-" * 79)
 
-        return list(unqueued_events)
+        return unqueued_events
 
     def enqueue_new_files(self) -> None:
-        """Enqueue events previously unqueued."""
+        """
+        Enqueue events previously unqueued.
+
+        Notes
+        -----
+        The events are sorted by file name and enqueued in batches of
+        `enqueue_batch_size`, so that consumers can start processing them
+        before all of them have been enqueued. The stat cache of the directory
+        state is saved only once all of them have been enqueued, so that the
+        changes found are reported again if Akita stops before then.
+        """
         # Get current state of the directory
         # TODO: Check if delimiter has to be "\" when running on Windows.
         not_enqueued_state = sorted(
             self._get_unenqueued_files(), key=lambda f: f.rsplit("/", 1)[-1]
         )
 
-        for event in not_enqueued_state:
-            self._queue.enqueue(event)
+        for i in range(0, len(not_enqueued_state), self._enqueue_batch_size):
+            self._queue.enqueue_many(
+                not_enqueued_state[i : i + self._enqueue_batch_size]
+            )
+
+        # The changes found by the scan are only forgotten once enqueued
+        save_stat_cache = getattr(self._directory_state, "save_stat_cache", None)
+        if save_stat_cache is not None:
+            save_stat_cache()
 
     def _run_watchdog(self) -> None:
         """Run the watchdog."""
@@ -330,6 +468,11 @@ class Akita:
         else:
             logger.info("Attempted to stop akita but no worker thread has been found.")
 
+        # Release the snapshot of the stored state, if any
+        close = getattr(self._directory_state, "close", None)
+        if close is not None:
+            close()
+
     def run(
         self, monitor: bool = True, enqueue_new_files: bool = True, daemon: bool = False
     ) -> None:
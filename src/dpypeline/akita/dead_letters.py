@@ -0,0 +1,133 @@
+"""Disk-backed dead-letter queue."""
+from __future__ import annotations
+
+import logging
+import sqlite3
+import time
+from threading import Lock
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class DeadLetterQueue:
+    """
+    Disk-backed queue of events whose processing has failed permanently.
+
+    Dead-lettered events are stored in a SQLite table whose primary key is
+    the event, together with the number of attempts made, the last error
+    and the time at which they were dead-lettered, so that they can be
+    inspected and re-queued.
+
+    Notes
+    -----
+    Events must be of a type supported by SQLite (e.g., `str`, `int`,
+    `float` or `bytes`).
+
+    Attributes
+    ----------
+    _db_file
+        File where the SQLite database is stored.
+    _connection
+        Connection to the SQLite database.
+    _lock
+        Lock that serialises the access to the connection.
+    """
+
+    def __init__(self, db_file: str) -> None:
+        """
+        Initialize the dead-letter queue.
+
+        Parameters
+        ----------
+        db_file
+            File where the SQLite database is stored.
+        """
+        self._db_file = db_file
+        self._lock = Lock()
+
+        self._connection = sqlite3.connect(db_file, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS dead_letters "
+            + "(event PRIMARY KEY, attempts INTEGER, error TEXT, failed_at REAL)"
+        )
+        self._connection.commit()
+
+    def add(self, event: Any, attempts: int, error: str) -> None:
+        """
+        Add an event to the dead-letter queue.
+
+        Parameters
+        ----------
+        event
+            Event whose processing has failed.
+        attempts
+            Number of attempts made to process the event.
+        error
+            Last error raised while processing the event.
+        """
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO dead_letters VALUES (?, ?, ?, ?)",
+                (event, attempts, error, time.time()),
+            )
+            self._connection.commit()
+
+    def remove(self, event: Any) -> bool:
+        """
+        Remove an event from the dead-letter queue.
+
+        Parameters
+        ----------
+        event
+            Event to remove.
+
+        Returns
+        -------
+            True if the event was removed, False if it was not dead-lettered.
+        """
+        with self._lock:
+            cursor = self._connection.execute(
+                "DELETE FROM dead_letters WHERE event = ?", (event,)
+            )
+            self._connection.commit()
+
+        return cursor.rowcount > 0
+
+    def items(self) -> list[tuple[Any, int, str, float]]:
+        """
+        Return the dead-lettered events, oldest first.
+
+        Returns
+        -------
+            List of tuples with the event, number of attempts, last error and
+            time at which the event was dead-lettered.
+        """
+        with self._lock:
+            return self._connection.execute(
+                "SELECT event, attempts, error, failed_at FROM dead_letters "
+                + "ORDER BY failed_at"
+            ).fetchall()
+
+    def __contains__(self, event: Any) -> bool:
+        """Return whether the event is dead-lettered."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM dead_letters WHERE event = ?", (event,)
+            ).fetchone()
+
+        return row is not None
+
+    def __len__(self) -> int:
+        """Return the number of dead-lettered events."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM dead_letters"
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        """Close the connection to the database."""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,471 @@
+"""Single-pass multi-pattern directory scanner."""
+import fnmatch
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+_MAGIC_CHARS = re.compile(r"[*?[]")
+
+# Kinds of pattern segments
+_RECURSIVE = "recursive"
+_NAME = "name"
+
+_NO_STATES: frozenset[tuple[int, int]] = frozenset()
+
+
+class _Plan(NamedTuple):
+    """
+    Transitions from a set of states.
+
+    Attributes
+    ----------
+    visible
+        Regular expression that matches the names, not starting with a dot,
+        that complete a pattern.
+    hidden
+        Regular expression that matches the names, starting with a dot,
+        that complete a pattern.
+    transitions
+        Transitions of directories, each a tuple with the regular expression
+        that matches their names, whether it matches names starting with a dot,
+        whether the directories complete a pattern and the states they reach.
+    """
+
+    visible: re.Pattern | None
+    hidden: re.Pattern | None
+    transitions: list[tuple[re.Pattern, bool, bool, frozenset[tuple[int, int]]]]
+
+
+def _is_dir(entry: os.DirEntry) -> bool:
+    """Return whether an entry is a directory, following symbolic links."""
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
+
+
+def list_directory(directory: str) -> list[tuple[str, bool]]:
+    """
+    List a directory.
+
+    Parameters
+    ----------
+    directory
+        Path to the directory.
+
+    Returns
+    -------
+        Entries of the directory, in sorted order, as tuples of name and
+        whether the entry is a directory (following symbolic links).
+    """
+    with os.scandir(directory) as it:
+        entries = list(it)
+
+    try:
+        return sorted([(entry.name, entry.is_dir()) for entry in entries])
+    except OSError:
+        return sorted([(entry.name, _is_dir(entry)) for entry in entries])
+
+
+class DirectoryScanner:
+    """
+    Scanner that matches several glob patterns in a single walk of a directory.
+
+    All the patterns are compiled into a single matcher, a nondeterministic
+    automaton whose states are the positions reached in each pattern. The tree
+    is walked once with `os.scandir`, every entry advancing the states of its
+    parent directory, and directories that cannot lead to a match are pruned.
+
+    Notes
+    -----
+    Patterns are relative to the scanned path and follow the semantics of
+    `glob.glob`: `**` matches any files and zero or more directories if
+    `recursive` is `True` (and behaves as `*` otherwise), and names starting
+    with a dot are only matched by wildcards if `include_hidden` is `True`.
+    As with `glob.glob`, directories that complete a pattern are returned
+    too: patterns ending with a separator only match directories, which are
+    returned with a trailing separator, as are the directories matched by a
+    final `**` matching zero directories (e.g., `sub/` for `sub/**`).
+    Unlike `glob.glob`, each path is returned once, even if it matches several
+    patterns, the entries of each directory are visited in sorted order, and
+    empty and `.` segments are dropped from the paths returned (e.g., `./a//b`
+    returns `a/b`). Patterns with `..` segments are not supported.
+
+    Attributes
+    ----------
+    _path
+        Path to scan.
+    _patterns
+        Compiled segments of each pattern.
+    _directories_only
+        Whether each pattern only matches directories.
+    _flags
+        Flags of the regular expressions.
+    _plans
+        Cache of the transitions from the sets of states reached.
+    _ignore_patterns
+        Compiled regular expressions of the patterns of paths to ignore.
+    _recursive
+        Whether `**` matches zero or more directories.
+    _include_hidden
+        Whether wildcards match names starting with a dot.
+    _workers
+        Number of threads that scan directories concurrently.
+    _listdir
+        Function that lists the entries of a directory.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        patterns: str | list[str],
+        ignore_patterns: str | list[str] | None = None,
+        recursive: bool = False,
+        include_hidden: bool = False,
+        case_sensitive: bool = True,
+        workers: int = 1,
+        listdir: Callable[[str], list[tuple[str, bool]]] = None,
+    ) -> None:
+        """
+        Initialize the scanner.
+
+        Parameters
+        ----------
+        path
+            Path to scan.
+        patterns
+            Glob patterns, relative to the path, of the paths to return.
+        ignore_patterns, optional
+            Patterns, matched with `fnmatch` against the whole path, of the
+            paths to ignore. Directories that match them are not walked.
+        recursive, optional
+            If `True`, `**` matches zero or more directories, by default False.
+        include_hidden, optional
+            If `True`, wildcards match names starting with a dot, by default False.
+        case_sensitive, optional
+            If `True`, names are matched sensitive to case, by default True.
+        workers, optional
+            Number of threads that scan directories concurrently, by default 1.
+            Useful on network filesystems (e.g., Lustre or NFS), where the scan
+            is limited by the latency of the metadata operations.
+        listdir, optional
+            Function that lists the entries of a directory in sorted order, as
+            tuples of name and whether the entry is a directory, by default
+            `list_directory`. E.g., `StatCache.list_directory` to reuse the
+            listings of unchanged directories.
+
+        Raises
+        ------
+        ValueError
+            If any of the patterns has a `..` segment.
+        """
+        patterns = [patterns] if isinstance(patterns, str) else patterns
+        ignore_patterns = (
+            [ignore_patterns] if isinstance(ignore_patterns, str) else ignore_patterns
+        )
+        self._path = path
+        self._recursive = recursive
+        self._include_hidden = include_hidden
+        self._flags = 0 if case_sensitive else re.IGNORECASE
+        self._patterns = [self._compile(pattern) for pattern in patterns]
+        self._directories_only = [
+            pattern.replace(os.path.sep, "/").endswith("/") for pattern in patterns
+        ]
+        self._ignore_patterns = [
+            re.compile(fnmatch.translate(pattern), self._flags)
+            for pattern in (ignore_patterns or [])
+        ]
+        self._plans: dict[frozenset[tuple[int, int]], _Plan] = {}
+        self._workers = workers
+        self._listdir = listdir if listdir is not None else list_directory
+
+    def _compile(self, pattern: str) -> list[tuple[str, str | None, bool]]:
+        """
+        Compile the segments of a pattern.
+
+        Parameters
+        ----------
+        pattern
+            Glob pattern.
+
+        Returns
+        -------
+            List of segments, each a tuple with the kind of segment ("recursive"
+            or "name"), the source of the regular expression that matches the
+            names (`None` for recursive wildcards) and whether it matches names
+            starting with a dot.
+
+        Raises
+        ------
+        ValueError
+            If the pattern has a `..` segment.
+        """
+        segments: list[tuple[str, str | None, bool]] = []
+        for segment in pattern.replace(os.path.sep, "/").split("/"):
+            if segment in ["", "."]:
+                continue
+            elif segment == "..":
+                raise ValueError(f"Unsupported '..' segment in pattern {pattern}.")
+            elif segment == "**" and self._recursive:
+                # Consecutive recursive wildcards are equivalent to one
+                if not segments or segments[-1][0] != _RECURSIVE:
+                    segments.append((_RECURSIVE, None, self._include_hidden))
+            elif _MAGIC_CHARS.search(segment):
+                hidden = self._include_hidden or segment.startswith(".")
+                segments.append((_NAME, fnmatch.translate(segment), hidden))
+            else:
+                segments.append((_NAME, re.escape(segment) + r"\Z", True))
+
+        return segments
+
+    def _closure(self, states: Iterable[tuple[int, int]]) -> set[tuple[int, int]]:
+        """
+        Add the states reached by recursive wildcards matching zero directories.
+
+        Parameters
+        ----------
+        states
+            States, as tuples of pattern index and segment index.
+
+        Returns
+        -------
+            States reachable without consuming a name.
+        """
+        closure = set()
+        for p, i in states:
+            closure.add((p, i))
+            segments = self._patterns[p]
+            while i < len(segments) and segments[i][0] == _RECURSIVE:
+                i += 1
+                closure.add((p, i))
+
+        return closure
+
+    def _split_final(
+        self, states: Iterable[tuple[int, int]]
+    ) -> tuple[bool, frozenset[tuple[int, int]]]:
+        """
+        Split the states reached by a directory.
+
+        Parameters
+        ----------
+        states
+            States reached by the directory.
+
+        Returns
+        -------
+            Whether any of the states is final, i.e., the directory matches a
+            pattern, and the states that can consume further names.
+        """
+        states = self._closure(states)
+        is_final = any(i == len(self._patterns[p]) for p, i in states)
+
+        return is_final, frozenset(
+            (p, i) for p, i in states if i < len(self._patterns[p])
+        )
+
+    def _get_plan(self, states: frozenset[tuple[int, int]]) -> _Plan:
+        """
+        Compile the transitions from a set of states.
+
+        Notes
+        -----
+        All the patterns a name must match to be returned are combined into a
+        single regular expression, so that each entry is matched once. Plans
+        are cached, since the directories of a tree reach few distinct states.
+
+        Parameters
+        ----------
+        states
+            States of a directory.
+
+        Returns
+        -------
+            Transitions from the states.
+        """
+        plan = self._plans.get(states)
+        if plan is not None:
+            return plan
+
+        visible, hidden, transitions = [], [], []
+        for p, i in sorted(states):
+            segments = self._patterns[p]
+            kind, regex, matches_hidden = segments[i]
+            is_last = i + 1 == len(segments)
+            directories_only = self._directories_only[p]
+            regex = regex if regex is not None else r"(?s:.*)\Z"
+
+            if is_last and not directories_only:
+                visible.append(regex)
+                if matches_hidden:
+                    hidden.append(regex)
+
+            # Recursive wildcards consume directories and stay active
+            next_states = [(p, i)] if kind == _RECURSIVE else [(p, i + 1)]
+            if kind == _RECURSIVE or not is_last or directories_only:
+                is_final, reached = self._split_final(next_states)
+                # A final recursive wildcard already matches the directories it
+                # consumes by name, as glob does
+                if kind == _RECURSIVE and is_last and not directories_only:
+                    is_final = False
+                transitions.append(
+                    (
+                        re.compile(regex, self._flags),
+                        matches_hidden,
+                        is_final,
+                        reached,
+                    )
+                )
+
+        def combine(regexes: list[str]) -> re.Pattern | None:
+            if not regexes:
+                return None
+            return re.compile("|".join(f"(?:{r})" for r in regexes), self._flags)
+
+        plan = _Plan(combine(visible), combine(hidden), transitions)
+        self._plans[states] = plan
+
+        return plan
+
+    def _is_ignored(self, path: str) -> bool:
+        """Return whether a path matches any of the ignore patterns."""
+        return any(regex.match(path) for regex in self._ignore_patterns)
+
+    def _scan_directory(
+        self, directory: str, states: frozenset[tuple[int, int]]
+    ) -> tuple[list[str], list[tuple[str, frozenset[tuple[int, int]]]]]:
+        """
+        Scan a directory.
+
+        Parameters
+        ----------
+        directory
+            Path to the directory.
+        states
+            States of the directory.
+
+        Returns
+        -------
+            Paths of the entries that match any pattern, in sorted order, and
+            subdirectories to walk, in sorted order, together with their states.
+            Directories that complete a pattern are returned with a trailing
+            separator.
+        """
+        try:
+            entries = self._listdir(directory)
+        except (FileNotFoundError, NotADirectoryError, PermissionError) as error:
+            logger.warning(f"Could not scan {directory}: {error}")
+            return [], []
+
+        plan = self._get_plan(states)
+        paths, subdirectories = [], []
+        for name, is_dir in entries:
+            is_hidden = name.startswith(".")
+            regex = plan.hidden if is_hidden else plan.visible
+            matched = regex is not None and regex.match(name) is not None
+
+            completed = False
+            next_states = _NO_STATES
+            if is_dir and plan.transitions:
+                for regex, matches_hidden, is_final, states_ in plan.transitions:
+                    if (not is_hidden or matches_hidden) and regex.match(name):
+                        completed = completed or is_final
+                        next_states = next_states | states_
+
+            if not matched and not completed and not next_states:
+                continue
+
+            path = os.path.join(directory, name)
+            if self._ignore_patterns and self._is_ignored(path):
+                continue
+
+            if matched:
+                paths.append(path)
+            if completed:
+                paths.append(os.path.join(path, ""))
+            if next_states:
+                subdirectories.append((path, next_states))
+
+        return paths, subdirectories
+
+    def _get_root_states(self) -> tuple[bool, frozenset[tuple[int, int]]]:
+        """Return whether the scanned path matches a pattern and its states."""
+        return self._split_final((p, 0) for p in range(len(self._patterns)))
+
+    def scan(self) -> Iterator[str]:
+        """
+        Walk the directory once and yield the paths that match any pattern.
+
+        Notes
+        -----
+        The files of a directory are yielded in sorted order, before its
+        subdirectories are walked depth-first in sorted order. The order
+        does not depend on the number of workers.
+
+        Yields
+        ------
+            Paths that match any of the patterns.
+        """
+        is_final, states = self._get_root_states()
+        if is_final:
+            yield os.path.join(self._path, "")
+
+        if self._workers > 1:
+            yield from self._scan_parallel(states)
+            return
+
+        stack = [(self._path, states)]
+        while stack:
+            paths, subdirectories = self._scan_directory(*stack.pop())
+            yield from paths
+            stack.extend(reversed(subdirectories))
+
+    def _scan_parallel(self, states: frozenset[tuple[int, int]]) -> Iterator[str]:
+        """
+        Walk the directory with a pool of threads.
+
+        Notes
+        -----
+        The walk is the same depth-first walk as the serial one, but the
+        directories next in line are scanned ahead by the pool of threads,
+        so that the latency of the metadata operations (e.g., on network
+        filesystems) overlaps. At most `4 * workers` directories are scanned
+        ahead, which bounds the memory used by their results.
+
+        Parameters
+        ----------
+        states
+            States of the scanned path.
+
+        Yields
+        ------
+            Paths that match any of the patterns.
+        """
+        max_ahead = 4 * self._workers
+
+        with ThreadPoolExecutor(
+            max_workers=self._workers, thread_name_prefix="dpypeline-scanner"
+        ) as executor:
+            # Stack of directories to walk, as lists of path, states and future
+            stack: list[list[Any]] = [[self._path, states, None]]
+
+            while stack:
+                directory, states, future = stack.pop()
+                if future is None:
+                    paths, subdirectories = self._scan_directory(directory, states)
+                else:
+                    paths, subdirectories = future.result()
+
+                yield from paths
+                stack.extend(
+                    [path, states_, None] for path, states_ in reversed(subdirectories)
+                )
+
+                # Scan ahead the directories next in line
+                for item in stack[-max_ahead:]:
+                    if item[2] is None:
+                        item[2] = executor.submit(self._scan_directory, *item[:2])
@@ -0,0 +1,340 @@
+"""Compact on-disk snapshot of the state of a directory."""
+import mmap
+import operator
+import os
+import struct
+import zlib
+from bisect import bisect_right
+from collections.abc import Sequence
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Iterable, Iterator, overload
+
+# Layout of the file:
+#   header | block 0 | ... | block n-1 | index | first key 0 | ... | first key n-1
+# Each block holds up to `block_size` sorted paths, each encoded as the length
+# of the prefix shared with the previous path of the block, the length of the
+# rest of the path and the rest of the path. The first path of a block is
+# stored in full, so that blocks can be decoded independently.
+_MAGIC = b"DPSNAP01"
+_HEADER = struct.Struct("<8sB3xIQQQ")
+_INDEX_ENTRY = struct.Struct("<QIQI")
+
+_CODECS = {"none": 0, "zlib": 1, "zstd": 2}
+
+
+def _encode_varint(value: int, out: bytearray) -> None:
+    """Append an unsigned integer to a buffer as a LEB128 varint."""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_varint(data: bytes, pos: int) -> tuple[int, int]:
+    """Decode a LEB128 varint and return its value and the next position."""
+    byte = data[pos]
+    if byte < 0x80:
+        return byte, pos + 1
+
+    value, shift = 0, 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _encode_path(path: str) -> bytes:
+    """Encode a path, preserving undecodable bytes of file names."""
+    return path.encode("utf-8", "surrogateescape")
+
+
+def _decode_path(path: bytes) -> str:
+    """Decode a path encoded with `_encode_path`."""
+    return path.decode("utf-8", "surrogateescape")
+
+
+def _get_compressor(codec: str) -> Any:
+    """Return the function that compresses the blocks with a codec."""
+    if codec == "none":
+        return bytes
+    elif codec == "zlib":
+        return zlib.compress
+    elif codec == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor().compress
+    raise ValueError(f'Invalid codec "{codec}". Must be one of {list(_CODECS)}.')
+
+
+def _get_decompressor(codec_id: int) -> Any:
+    """Return the function that decompresses the blocks of a codec."""
+    if codec_id == _CODECS["none"]:
+        return bytes
+    elif codec_id == _CODECS["zlib"]:
+        return zlib.decompress
+    elif codec_id == _CODECS["zstd"]:
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompress
+    raise ValueError(f"Invalid codec id {codec_id}.")
+
+
+def write_snapshot(
+    file: str, paths: Iterable[str], block_size: int = 64, codec: str = "none"
+) -> int:
+    """
+    Write a snapshot of the paths of a directory.
+
+    Notes
+    -----
+    The snapshot is written to a temporary file that then replaces the given
+    file, so that a snapshot is never left half written.
+
+    Parameters
+    ----------
+    file
+        File where the snapshot is written.
+    paths
+        Paths of the directory. Duplicates are removed.
+    block_size, optional
+        Number of paths per block, by default 64. Larger blocks compress better
+        but make lookups decode more paths.
+    codec, optional
+        Compression of the blocks: "none" (default), "zlib" or "zstd", which
+        requires the `zstandard` package.
+
+    Returns
+    -------
+        Number of paths written.
+    """
+    compress = _get_compressor(codec)
+
+    # Sorting is close to linear on the output of a scan, which is sorted
+    # within each directory, and the paths are encoded and deduplicated in
+    # bulk. Paths with undecodable bytes may sort differently once encoded.
+    keys = list(dict.fromkeys(map(_encode_path, sorted(paths))))
+    if not all(map(operator.lt, keys, islice(keys, 1, None))):
+        keys.sort()
+
+    from_bytes = int.from_bytes
+    blocks, first_keys = [], []
+    for start in range(0, len(keys), block_size):
+        block, prev = bytearray(), b""
+        for key in keys[start : start + block_size]:
+            # The leading zero bytes of the XOR of the paths, read as big-endian
+            # integers, are the bytes they share
+            n = min(len(prev), len(key))
+            diff = from_bytes(prev[:n], "big") ^ from_bytes(key[:n], "big")
+            shared = n - (diff.bit_length() + 7) // 8
+            length = len(key) - shared
+            if shared < 0x80 and length < 0x80:
+                block.append(shared)
+                block.append(length)
+            else:
+                _encode_varint(shared, block)
+                _encode_varint(length, block)
+            block += key[shared:]
+            prev = key
+        blocks.append(compress(bytes(block)))
+        first_keys.append(keys[start])
+
+    index_offset = _HEADER.size + sum(len(block) for block in blocks)
+    key_offset = index_offset + _INDEX_ENTRY.size * len(blocks)
+    block_offset = _HEADER.size
+    index = bytearray()
+    for block, key in zip(blocks, first_keys):
+        index += _INDEX_ENTRY.pack(block_offset, len(block), key_offset, len(key))
+        block_offset += len(block)
+        key_offset += len(key)
+
+    tmp_file = f"{file}.tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(
+            _HEADER.pack(
+                _MAGIC, _CODECS[codec], block_size, len(keys), len(blocks), index_offset
+            )
+        )
+        f.writelines(blocks)
+        f.write(index)
+        f.writelines(first_keys)
+    os.replace(tmp_file, file)
+
+    return len(keys)
+
+
+def is_snapshot(file: str) -> bool:
+    """Return whether a file is a directory snapshot."""
+    with open(file, "rb") as f:
+        return f.read(len(_MAGIC)) == _MAGIC
+
+
+class DirectorySnapshot(Sequence):
+    """
+    Read-only, memory-mapped snapshot of the paths of a directory.
+
+    The snapshot is loaded lazily: opening it only maps the file into memory,
+    and the blocks of paths are decoded as they are accessed. Paths are sorted,
+    so that testing the membership of a path is a binary search over the first
+    paths of the blocks followed by the decoding of a single block.
+
+    Attributes
+    ----------
+    _file
+        File where the snapshot is stored.
+    _mmap
+        Memory map of the file.
+    _block_size
+        Number of paths per block.
+    _count
+        Number of paths in the snapshot.
+    _n_blocks
+        Number of blocks.
+    _index_offset
+        Offset of the index of the blocks in the file.
+    _decompress
+        Function that decompresses the blocks.
+    _first_keys
+        First paths of the blocks, encoded, read on the first membership test.
+    """
+
+    def __init__(self, file: str) -> None:
+        """
+        Open a snapshot.
+
+        Parameters
+        ----------
+        file
+            File where the snapshot is stored.
+
+        Raises
+        ------
+        ValueError
+            If the file is not a directory snapshot.
+        """
+        self._file = file
+        with open(file, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (
+            magic,
+            codec_id,
+            self._block_size,
+            self._count,
+            self._n_blocks,
+            self._index_offset,
+        ) = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{file} is not a directory snapshot.")
+
+        self._decompress = _get_decompressor(codec_id)
+        self._get_block = lru_cache(maxsize=16)(self._decode_block)
+        self._first_keys: list[bytes] = None
+
+    def close(self) -> None:
+        """Close the memory map of the file."""
+        self._mmap.close()
+
+    def __enter__(self) -> "DirectorySnapshot":
+        """Return the snapshot."""
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        """Close the snapshot."""
+        self.close()
+
+    def _get_index_entry(self, i: int) -> tuple[int, ...]:
+        """Return the offset and length of the i-th block and its first path."""
+        return _INDEX_ENTRY.unpack_from(
+            self._mmap, self._index_offset + i * _INDEX_ENTRY.size
+        )
+
+    def _get_first_key(self, i: int) -> bytes:
+        """Return the first path of the i-th block, encoded."""
+        _, _, key_offset, key_length = self._get_index_entry(i)
+        return self._mmap[key_offset : key_offset + key_length]
+
+    def _decode_block(self, i: int) -> list[bytes]:
+        """Decode the paths of the i-th block, encoded."""
+        block_offset, block_length, _, _ = self._get_index_entry(i)
+        data = self._decompress(self._mmap[block_offset : block_offset + block_length])
+
+        keys, prev, pos, end = [], b"", 0, len(data)
+        while pos < end:
+            # Lengths below 128 are encoded in a single byte
+            shared = data[pos]
+            if shared < 0x80:
+                pos += 1
+            else:
+                shared, pos = _decode_varint(data, pos)
+            length = data[pos]
+            if length < 0x80:
+                pos += 1
+            else:
+                length, pos = _decode_varint(data, pos)
+            prev = prev[:shared] + data[pos : pos + length]
+            pos += length
+            keys.append(prev)
+
+        return keys
+
+    def __len__(self) -> int:
+        """Return the number of paths in the snapshot."""
+        return self._count
+
+    @overload
+    def __getitem__(self, index: int) -> str:
+        """Return the path at the given position in sorted order."""
+
+    @overload
+    def __getitem__(self, index: slice) -> list[str]:
+        """Return the paths in the given slice of positions in sorted order."""
+
+    def __getitem__(self, index: int | slice) -> str | list[str]:
+        """Return the path at the given position in sorted order."""
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+
+        position = index + self._count if index < 0 else index
+        if not 0 <= position < self._count:
+            raise IndexError("Snapshot index out of range.")
+
+        block, offset = divmod(position, self._block_size)
+        return _decode_path(self._get_block(block)[offset])
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the paths in sorted order."""
+        for i in range(self._n_blocks):
+            yield from map(_decode_path, self._decode_block(i))
+
+    def __contains__(self, path: Any) -> bool:
+        """Return whether a path is in the snapshot."""
+        if not isinstance(path, str) or not self._n_blocks:
+            return False
+
+        if self._first_keys is None:
+            self._first_keys = [self._get_first_key(i) for i in range(self._n_blocks)]
+
+        key = _encode_path(path)
+        block = bisect_right(self._first_keys, key)
+        if block == 0:
+            return False
+
+        keys = self._get_block(block - 1)
+        i = bisect_right(keys, key)
+        return i > 0 and keys[i - 1] == key
+
+    def __eq__(self, other: Any) -> bool:
+        """Return whether the snapshot holds the same paths as a sequence."""
+        if not isinstance(other, Sequence) or isinstance(other, (str, bytes)):
+            return NotImplemented
+
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self) -> str:
+        """Return the representation of the snapshot."""
+        return f"{type(self).__name__}({self._file!r}, n={self._count})"
@@ -3,15 +3,33 @@ import glob
 import logging
 import os
 import pickle
+from threading import Thread
+from typing import Iterator, Sequence
+
+from .directory_scanner import DirectoryScanner
+from .directory_snapshot import DirectorySnapshot, write_snapshot
+from .stat_cache import StatCache, StateDiff
 
 
 class DirectoryState:
     """DirectoryState class."""
 
-    _state_file_suffix: str = "directory_state.pickle"
+    _state_file_suffix: str = "directory_state.snapshot"
+    _legacy_state_file_suffix: str = "directory_state.pickle"
+    _stat_cache_file_suffix: str = "directory_stat_cache.pickle"
+    _scanner_kwargs: tuple[str, ...] = ("recursive", "include_hidden")
 
     def __init__(
-        self, path: str, patterns: str | list[str], glob_kwargs: dict = None
+        self,
+        path: str,
+        patterns: str | list[str],
+        glob_kwargs: dict = None,
+        ignore_patterns: str | list[str] | None = None,
+        case_sensitive: bool = True,
+        workers: int = 1,
+        stat_cache: bool = True,
+        check_modified: bool = True,
+        snapshot_codec: str = "none",
     ) -> None:
         """
         Initiate the DirectoryState class.
@@ -22,25 +40,73 @@ class DirectoryState:
             Path to watch.
         patterns
             Patterns for matching files.
+        glob_kwargs, optional
+            Kwargs with the glob semantics of the patterns, i.e.,
+            `recursive` and `include_hidden`.
+        ignore_patterns, optional
+            Patterns for ignoring files.
+        case_sensitive, optional
+            If `True` path names are matched sensitive to case; `False` otherwise.
+        workers, optional
+            Number of threads that scan directories concurrently, by default 1.
+        stat_cache, optional
+            If `True` (default), the listings of the directories and the stats of
+            the files are cached in `CACHE_DIR`, so that directories that have
+            not changed since the last scan are not listed again and the files
+            added, modified or removed since then are reported by `diff`.
+        check_modified, optional
+            If `True` (default), all the files found are stat'ed to detect files
+            modified in place. If `False`, only the files in directories that
+            have changed are stat'ed.
+        snapshot_codec, optional
+            Compression of the blocks of the stored state: "none" (default),
+            "zlib" or "zstd", which requires the `zstandard` package.
         """
         self._current_state: list[str] = None
-        self._stored_state: list[str] = None
+        self._stored_state: Sequence[str] = None
+        self._stored_state_stat: tuple[int, int, int] = None
+        self._diff: StateDiff = None
+        self._save_thread: Thread = None
 
         self._path = path
         self._patterns = [patterns] if isinstance(patterns, str) else patterns
         self._glob_kwargs = glob_kwargs if glob_kwargs is not None else {}
+        self._ignore_patterns = ignore_patterns
+        self._case_sensitive = case_sensitive
+        self._workers = workers
+        self._snapshot_codec = snapshot_codec
 
         assert (
             os.getenv("CACHE_DIR") is not None
         ), "CACHE_DIR environmental variable is not set."
 
         self._state_file = os.path.join(os.getenv("CACHE_DIR"), self._state_file_suffix)
+        self._legacy_state_file = os.path.join(
+            os.getenv("CACHE_DIR"), self._legacy_state_file_suffix
+        )
+        self._stat_cache = (
+            StatCache(
+                os.path.join(os.getenv("CACHE_DIR"), self._stat_cache_file_suffix),
+                check_modified=check_modified,
+                workers=workers,
+            )
+            if stat_cache
+            else None
+        )
 
     @property
-    def stored_state(self) -> list[str]:
+    def stored_state(self) -> Sequence[str]:
         """
         Return the stored state of the directory.
 
+        Notes
+        -----
+        The stored state is a lazily loaded `DirectorySnapshot` of the paths in
+        sorted order, which supports `len`, iteration, indexing and membership
+        tests by binary search. The snapshot is reused while the state file is
+        unchanged, and closed once a newer state replaces it, so it must not be
+        used after the stored state is accessed again.
+
         Returns
         -------
             Store state of the directory.
@@ -60,53 +126,179 @@ class DirectoryState:
         self._get_current_directory_state()
         return self._current_state
 
-    def _save_state(self) -> None:
+    @property
+    def diff(self) -> StateDiff | None:
+        """
+        Return the changes found by the last scan of the directory.
+
+        Notes
+        -----
+        The directory is scanned if it has not been scanned yet.
+
+        Returns
+        -------
+            Files added, modified and removed since the previous scan,
+            or `None` if the stat cache is disabled.
+        """
+        if self._stat_cache is not None and self._diff is None:
+            self._get_current_directory_state()
+        return self._diff
+
+    def _write_state(self, paths: list[str]) -> None:
+        """Write the snapshot of the directory state."""
+        try:
+            write_snapshot(self._state_file, paths, codec=self._snapshot_codec)
+        except Exception as error:
+            logging.error(f"Could not save the state of the directory: {error}")
+
+    def _wait_for_save(self) -> None:
+        """Wait for the directory state being saved in the background, if any."""
+        if self._save_thread is not None:
+            self._save_thread.join()
+            self._save_thread = None
+
+    def _save_state(self, background: bool = False) -> None:
         """
         Save the directory state.
 
         Notes
         -----
         Save the state of the directory by only saving
-        files that were already enqueued.
+        files that were already enqueued. The paths are stored
+        sorted and prefix-compressed in a `DirectorySnapshot`.
+        The snapshot replaces the previous one atomically, so it
+        can be written in the background while files are enqueued.
+
+        Parameters
+        ----------
+        background, optional
+            If `True`, the state is saved by a background thread that
+            the stored state waits for; `False` (default) otherwise.
         """
         logging.info("-" * 79)
         logging.info("Saving state of the directory.")
 
-        with open(self._state_file, "wb") as f:
-            pickle.dump(self._current_state, f)
+        self._wait_for_save()
+        if not background:
+            self._write_state(self._current_state)
+            return
+
+        self._save_thread = Thread(
+            target=self._write_state,
+            args=(self._current_state,),
+            name="dpypeline-snapshot",
+        )
+        self._save_thread.start()
+
+    def _close_stored_state(self) -> None:
+        """Close the snapshot of the stored state, if any."""
+        if isinstance(self._stored_state, DirectorySnapshot):
+            self._stored_state.close()
+        self._stored_state_stat = None
+
+    def close(self) -> None:
+        """Wait for the state being saved and close the stored state."""
+        self._wait_for_save()
+        self._close_stored_state()
 
     def _load_state(self) -> None:
         """Load the stored state of the directory."""
         logging.info("-" * 79)
         logging.info("Loading state of the directory.")
 
+        self._wait_for_save()
+
         if os.path.isfile(self._state_file):
             logging.info(f"Found stored directory state file {self._state_file}.")
-            with open(self._state_file, "rb") as f:
+            st = os.stat(self._state_file)
+            stat = (st.st_ino, st.st_size, st.st_mtime_ns)
+            if stat == self._stored_state_stat:
+                return
+
+            self._close_stored_state()
+            self._stored_state = DirectorySnapshot(self._state_file)
+            self._stored_state_stat = stat
+            return
+
+        self._close_stored_state()
+        if os.path.isfile(self._legacy_state_file):
+            logging.info(
+                f"Found legacy directory state file {self._legacy_state_file}."
+            )
+            with open(self._legacy_state_file, "rb") as f:
                 self._stored_state = pickle.load(f)
         else:
             logging.info(f"No directory state file {self._state_file} was found.")
             self._stored_state = []
 
+    def scan(self) -> Iterator[str]:
+        """
+        Walk the directory once and yield the files that match the patterns.
+
+        Notes
+        -----
+        If glob kwargs not supported by `DirectoryScanner` are given,
+        the directory is globbed once per pattern instead.
+
+        Yields
+        ------
+            Files that match any of the patterns.
+        """
+        if set(self._glob_kwargs).difference(self._scanner_kwargs):
+            for pattern in self._patterns:
+                yield from glob.iglob(
+                    os.path.join(self._path, pattern), **self._glob_kwargs
+                )
+            return
+
+        scanner = DirectoryScanner(
+            self._path,
+            self._patterns,
+            ignore_patterns=self._ignore_patterns,
+            case_sensitive=self._case_sensitive,
+            workers=self._workers,
+            listdir=(
+                self._stat_cache.list_directory
+                if self._stat_cache is not None
+                else None
+            ),
+            **self._glob_kwargs,
+        )
+        yield from scanner.scan()
+
     def _get_current_directory_state(self) -> list[str]:
         """
         Get and set the current state of the directory.
 
         Notes
         -----
-        Everytime this method is called, the current state of the directory is saved.
+        Everytime this method is called, the current state of the directory is saved
+        in the background, since it is not needed to find the files to enqueue.
+        If the stat cache is enabled, the changes since the previous scan are
+        also found. The stat cache is not saved until `save_stat_cache` is
+        called, once the changes have been handled (e.g., enqueued).
 
         Returns
         -------
             Current state of the directory.
         """
-        self._current_state = []
-        for pattern in self._patterns:
-            found_files = glob.glob(
-                os.path.join(self._path, pattern), **self._glob_kwargs
-            )
-            self._current_state.extend(found_files)
+        self._current_state = list(self.scan())
+        self._save_state(background=True)
 
-        self._save_state()
+        if self._stat_cache is not None:
+            self._diff = self._stat_cache.update(self._current_state)
 
         return self._current_state
+
+    def save_stat_cache(self) -> None:
+        """
+        Save the stat cache.
+
+        Notes
+        -----
+        The stat cache must only be saved once the changes found by the last
+        scan have been handled, since they are not reported again by the next
+        scan after it is saved. Nothing is done if the stat cache is disabled.
+        """
+        if self._stat_cache is not None:
+            self._stat_cache.save()
@@ -0,0 +1,186 @@
+"""Buffer that coalesces bursts of events into batches."""
+import logging
+import time
+from threading import Condition, Thread
+from typing import Any, Iterable, Protocol
+
+logger = logging.getLogger(__name__)
+
+
+class Queue(Protocol):
+    """Queue interface."""
+
+    def enqueue_many(self, events: Iterable[Any]) -> int:
+        """Enqueue several events at once."""
+        ...
+
+
+class EventCoalescer:
+    """
+    Buffer that coalesces bursts of events into batches.
+
+    Events are buffered, deduplicated, for a time window that starts with the
+    first buffered event, and then put in the queue as a single batch, so that
+    storms of events (e.g., bulk copies or repeated writes to the same file)
+    turn into a single operation of the queue. The buffer is also flushed as
+    soon as it holds the maximum number of events per batch.
+
+    Notes
+    -----
+    Implements the `enqueue` and `enqueue_many` methods of the queue, so that
+    it can be used in its place, e.g., by `EventHandler` and `SettleScheduler`.
+
+    Attributes
+    ----------
+    _queue
+        Queue where batches of events are placed.
+    _window
+        Time in seconds for which events are buffered before being flushed.
+    _max_batch
+        Maximum number of events per batch.
+    _pending
+        Buffered events, in order of arrival.
+    _first_at
+        Time at which the first buffered event arrived.
+    _condition
+        Condition that serialises the access to the buffer and
+        wakes up the flush thread.
+    _stopped
+        Whether the flush thread has been stopped.
+    _worker
+        Thread that flushes the buffer when the window expires.
+    """
+
+    def __init__(
+        self, queue: Queue, window: float = 0.5, max_batch: int = 1000
+    ) -> None:
+        """
+        Initialize the buffer.
+
+        Parameters
+        ----------
+        queue
+            Queue where batches of events are placed.
+        window, optional
+            Time in seconds for which events are buffered before being flushed,
+            by default 0.5.
+        max_batch, optional
+            Maximum number of events per batch, by default 1000.
+        """
+        self._queue = queue
+        self._window = window
+        self._max_batch = max_batch
+        self._pending: dict[Any, None] = {}
+        self._first_at: float = None
+        self._condition = Condition()
+        self._stopped = False
+        self._worker: Thread = None
+
+    @property
+    def pending(self) -> list[Any]:
+        """Return the buffered events."""
+        with self._condition:
+            return list(self._pending)
+
+    def enqueue(self, event: Any) -> bool:
+        """
+        Buffer an event.
+
+        Parameters
+        ----------
+        event
+            Event to buffer.
+
+        Returns
+        -------
+            `True` if the event was not buffered yet; `False` otherwise.
+        """
+        return self.enqueue_many([event]) > 0
+
+    def enqueue_many(self, events: Iterable[Any]) -> int:
+        """
+        Buffer several events.
+
+        Parameters
+        ----------
+        events
+            Events to buffer.
+
+        Returns
+        -------
+            Number of events that were not buffered yet.
+        """
+        n_new = 0
+
+        with self._condition:
+            for event in events:
+                if event not in self._pending:
+                    self._pending[event] = None
+                    n_new += 1
+
+                if len(self._pending) >= self._max_batch:
+                    self._flush()
+
+            if self._pending and self._first_at is None:
+                self._first_at = time.monotonic()
+                self._condition.notify()
+
+            if self._worker is None or not self._worker.is_alive():
+                self._stopped = False
+                self._worker = Thread(target=self._run, daemon=True)
+                self._worker.start()
+
+        return n_new
+
+    def _flush(self) -> int:
+        """Put the buffered events in the queue, holding the lock of the buffer."""
+        events = list(self._pending)
+        if events:
+            logger.debug(f"Flushing a batch of {len(events)} events.")
+            self._queue.enqueue_many(events)
+
+        # Events are kept in the buffer if they could not be put in the queue
+        self._pending.clear()
+        self._first_at = None
+
+        return len(events)
+
+    def flush(self) -> int:
+        """
+        Put the buffered events in the queue.
+
+        Returns
+        -------
+            Number of events put in the queue.
+        """
+        with self._condition:
+            return self._flush()
+
+    def _run(self) -> None:
+        """Flush the buffer whenever its window expires."""
+        with self._condition:
+            while not self._stopped:
+                if self._first_at is None:
+                    self._condition.wait()
+                    continue
+
+                remaining = self._first_at + self._window - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                else:
+                    try:
+                        self._flush()
+                    except Exception as error:
+                        logger.exception(f"Error while flushing the events: {error}")
+                        self._condition.wait(self._window)
+
+    def stop(self) -> None:
+        """Stop the flush thread and flush the buffered events."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+        if self._worker is not None:
+            self._worker.join()
+
+        self.flush()
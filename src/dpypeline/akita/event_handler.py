@@ -3,19 +3,23 @@
 import logging
 import os
 import time
-from typing import Any, Protocol
+from typing import Any, Iterable, Protocol
 
 from watchdog.events import (
     DirCreatedEvent,
     DirDeletedEvent,
     DirModifiedEvent,
     DirMovedEvent,
+    FileClosedEvent,
     FileCreatedEvent,
     FileDeletedEvent,
     FileModifiedEvent,
     FileMovedEvent,
     PatternMatchingEventHandler,
 )
+from watchdog.utils.patterns import match_any_paths
+
+from .settle_scheduler import SettleScheduler
 
 
 class Queue(Protocol):
@@ -25,6 +29,10 @@ class Queue(Protocol):
         """Add an event to the queue."""
         ...
 
+    def enqueue_many(self, events: Iterable[Any]) -> int:
+        """Add several events to the queue at once."""
+        ...
+
 
 class EventHandler(PatternMatchingEventHandler):
     """
@@ -33,8 +41,13 @@ class EventHandler(PatternMatchingEventHandler):
     Child class of PatternMatchingEventHandler.
     PatternMatchingEventHandler matches given patterns with file paths
     associated with occurring events.
-    Whenever a file in the target path is modified, EventHandler puts the
-    associated event in a queue.
+    Whenever a file in the target path is ready, EventHandler puts the
+    associated event in a queue. A file is ready as soon as it is closed after
+    being written, if the observer delivers close events (e.g., inotify), or
+    moved into a path matching the patterns. Created files are also tracked
+    and put in the queue once they have settled, unless they are closed
+    first, since files moved in from outside the watched path are reported
+    as created with no close event.
     """
 
     def __init__(
@@ -44,6 +57,8 @@ class EventHandler(PatternMatchingEventHandler):
         ignore_patterns: str | list[str] | None = None,
         ignore_directories: bool = False,
         case_sensitive: bool = True,
+        settle_scheduler: SettleScheduler = None,
+        close_events: bool = False,
     ) -> None:
         """
         Initialize the EventHandler.
@@ -67,8 +82,22 @@ class EventHandler(PatternMatchingEventHandler):
             If `True` path names are matched sensitive to case; `False` otherwise.
         queue
             Queue where events are placed.
+        settle_scheduler, optional
+            Scheduler that enqueues created files once they have settled,
+            by default a scheduler with a quiet period of 1 second.
+        close_events, optional
+            If `True`, the observer delivers close-after-write events and
+            created files are enqueued when closed, or once they have settled
+            if no close event follows; `False` otherwise, in which case created
+            files are enqueued once they have settled.
         """
         self._queue = queue
+        self._close_events = close_events
+        self._settle_scheduler = (
+            settle_scheduler
+            if settle_scheduler is not None
+            else SettleScheduler(queue, quiet_period=1.0)
+        )
 
         super().__init__(
             patterns=patterns,
@@ -141,6 +170,15 @@ class EventHandler(PatternMatchingEventHandler):
         """
         Return event when a file or directory is created.
 
+        Notes
+        -----
+        The file is tracked by the settle scheduler, which enqueues it once its
+        size and modification time are stable, so that the dispatch thread of
+        the observer is not blocked while the file is written. If the observer
+        delivers close events, the file is enqueued as soon as it is closed
+        instead; tracking it regardless covers files moved in from outside the
+        watched path, which are reported as created and never closed.
+
         Parameters
         ----------
         event
@@ -152,8 +190,32 @@ class EventHandler(PatternMatchingEventHandler):
         """
         self._logging_message(event)
 
-        if self.is_file_size_stable(event.src_path):
-            self._process_event(event)
+        if not event.is_directory:
+            self._settle_scheduler.track(event.src_path)
+
+        return event
+
+    def on_closed(self, event: FileClosedEvent) -> FileClosedEvent:
+        """
+        Return event when a file opened for writing is closed.
+
+        Notes
+        -----
+        The file is ready and is enqueued immediately, and the settle scheduler
+        stops tracking it.
+
+        Parameters
+        ----------
+        event
+            Event representing the closing of a file opened for writing.
+
+        Returns
+        -------
+        event
+        """
+        self._logging_message(event)
+        self._settle_scheduler.untrack(event.src_path)
+        self._process_event(event)
 
         return event
 
@@ -201,6 +263,11 @@ class EventHandler(PatternMatchingEventHandler):
         """
         Return event when a file or directory is moved.
 
+        Notes
+        -----
+        Files moved into a path matching the patterns (e.g., renamed from a
+        temporary file once written) are ready and enqueued immediately.
+
         Parameters
         ----------
         event
@@ -212,4 +279,15 @@ class EventHandler(PatternMatchingEventHandler):
         """
         self._logging_message(event)
 
+        if not event.is_directory:
+            self._settle_scheduler.untrack(event.src_path)
+
+            if match_any_paths(
+                [event.dest_path],
+                included_patterns=self.patterns,
+                excluded_patterns=self.ignore_patterns,
+                case_sensitive=self.case_sensitive,
+            ):
+                self._queue.enqueue(event.dest_path)
+
         return event
@@ -1,10 +1,169 @@
 """Akita dependency factory."""
+import logging
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
 
-from watchdog.observers.polling import PollingObserver
+from watchdog.observers.api import BaseObserver
+from watchdog.observers.polling import PollingObserver, PollingObserverVFS
 
 from .directory_state import DirectoryState
+from .event_coalescer import EventCoalescer
 from .event_handler import EventHandler
 from .queue_events import EventsQueue
+from .settle_scheduler import SettleScheduler
+from .stat_cache import _RACY_WINDOW_NS
+
+logger = logging.getLogger(__name__)
+
+# Filesystems on which inotify does not report changes made by other hosts
+NETWORK_FILESYSTEMS = {
+    "nfs",
+    "nfs4",
+    "cifs",
+    "smbfs",
+    "smb3",
+    "lustre",
+    "gpfs",
+    "ceph",
+    "glusterfs",
+    "beegfs",
+    "9p",
+}
+
+
+def supports_close_events(observer: BaseObserver) -> bool:
+    """
+    Return whether an observer delivers close-after-write events.
+
+    Parameters
+    ----------
+    observer
+        Observer to check.
+
+    Returns
+    -------
+        `True` if the observer is an inotify observer; `False` otherwise.
+    """
+    try:
+        from watchdog.observers.inotify import InotifyObserver
+    except Exception:
+        return False
+
+    return isinstance(observer, InotifyObserver)
+
+
+class CachedListdir:
+    """
+    LRU cache of directory listings for polling observers.
+
+    The listing of a directory is reused while the modification time of the
+    directory does not change, i.e., while no entries have been added, removed
+    or renamed, so that unchanged directories are not re-listed on every poll.
+    As in `StatCache`, the listings of directories modified shortly before they
+    were listed are not reused, since entries added within the resolution of
+    the modification time (e.g., on NFS) would otherwise go unnoticed.
+
+    Attributes
+    ----------
+    _maxsize
+        Maximum number of directory listings cached.
+    _cache
+        Dictionary mapping the directories to their modification time
+        (`None` if not trusted) and listing, ordered from least to most
+        recently used.
+    _lock
+        Lock that serialises the access to the cache.
+    """
+
+    def __init__(self, maxsize: int = 10000) -> None:
+        """
+        Initialize the cache.
+
+        Parameters
+        ----------
+        maxsize, optional
+            Maximum number of directory listings cached, by default 10000.
+        """
+        self._maxsize = maxsize
+        self._cache: OrderedDict[
+            str, tuple[int | None, list[os.DirEntry]]
+        ] = OrderedDict()
+        self._lock = Lock()
+
+    def __call__(self, path: str) -> list[os.DirEntry]:
+        """
+        List a directory.
+
+        Parameters
+        ----------
+        path
+            Path to the directory.
+
+        Returns
+        -------
+            Entries of the directory.
+        """
+        mtime = os.stat(path).st_mtime_ns
+
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached is not None and cached[0] == mtime:
+                self._cache.move_to_end(path)
+                return cached[1]
+
+        listed_at = time.time_ns()
+        with os.scandir(path) as it:
+            entries = list(it)
+
+        # Racily modified directories are listed again in the next poll
+        trusted = mtime < listed_at - _RACY_WINDOW_NS
+        with self._lock:
+            self._cache[path] = (mtime if trusted else None, entries)
+            self._cache.move_to_end(path)
+            while len(self._cache) > self._maxsize:
+                self._cache.popitem(last=False)
+
+        return entries
+
+
+def is_network_filesystem(path: str) -> bool:
+    """
+    Return whether a path is on a network filesystem.
+
+    Notes
+    -----
+    The filesystem is looked up in `/proc/mounts`, so paths are
+    assumed to be on a local filesystem on other platforms.
+
+    Parameters
+    ----------
+    path
+        Path to check.
+
+    Returns
+    -------
+        `True` if the path is on a network filesystem; `False` otherwise.
+    """
+    try:
+        with open("/proc/mounts") as f:
+            mounts = [line.split()[1:3] for line in f]
+    except OSError:
+        return False
+
+    path = os.path.realpath(path)
+    fs_type, mount_len = None, -1
+    for mount_point, mount_fs_type in mounts:
+        mount_point = mount_point.replace("\\040", " ")
+        is_under_mount = path == mount_point or path.startswith(
+            mount_point.rstrip("/") + "/"
+        )
+        # Later mounts on the same mount point shadow earlier ones
+        if is_under_mount and len(mount_point) >= mount_len:
+            fs_type, mount_len = mount_fs_type, len(mount_point)
+
+    return fs_type is not None and fs_type.split(".")[-1] in NETWORK_FILESYSTEMS
 
 
 class AkitaFactory:
@@ -18,6 +177,17 @@ class AkitaFactory:
         ignore_directories: bool = True,
         case_sensitive: bool = True,
         glob_kwargs: dict = None,
+        quiet_period: float = 1.0,
+        sweep_interval: float = None,
+        observer: str = "polling",
+        polling_interval: float = 1.0,
+        listdir_cache_size: int = 10000,
+        coalesce_window: float = 0.5,
+        max_batch: int = 1000,
+        scan_workers: int = 1,
+        stat_cache: bool = True,
+        check_modified: bool = True,
+        snapshot_codec: str = "none",
     ) -> None:
         """
         Initialize the factory.
@@ -36,7 +206,49 @@ class AkitaFactory:
             If True path names are matched sensitive to case, by default True
         glob_kwargs, optional
             Kwargs to pass to glob, by default None
+        quiet_period, optional
+            Time in seconds for which a created file must not change
+            before it is enqueued, by default 1
+        sweep_interval, optional
+            Time in seconds between consecutive checks of the created files,
+            by default half of the quiet period
+        observer, optional
+            Observer to use: "inotify", "polling" or "auto", by default "polling".
+            If "auto", inotify is used on Linux for paths that are not on a
+            network filesystem, and polling otherwise.
+        polling_interval, optional
+            Time in seconds between consecutive polls of the polling observer,
+            by default 1
+        listdir_cache_size, optional
+            Maximum number of directory listings cached by the polling observer,
+            by default 10000. If 0, directories are listed on every poll
+        coalesce_window, optional
+            Time in seconds for which the events of the event handler are
+            buffered and deduplicated before being enqueued as a single batch,
+            by default 0.5. If 0, events are enqueued immediately
+        max_batch, optional
+            Maximum number of events per batch, by default 1000
+        scan_workers, optional
+            Number of threads that scan the directory concurrently when its
+            current state is computed, by default 1. Useful on network
+            filesystems, where the scan is limited by metadata latency
+        stat_cache, optional
+            If True, the listings of the directories and the stats of the files
+            are cached between runs, so that unchanged directories are not
+            listed again and modified files are enqueued again, by default True
+        check_modified, optional
+            If True, all the files are stat'ed to detect files modified in place.
+            If False, only the files in changed directories are, by default True
+        snapshot_codec, optional
+            Compression of the stored directory state: "none", "zlib" or "zstd",
+            by default "none"
         """
+        assert observer in [
+            "inotify",
+            "polling",
+            "auto",
+        ], f'Invalid observer "{observer}". Must be "inotify", "polling" or "auto".'
+
         self._path = path
         self._patterns = list(patterns) if patterns is str else patterns
         self._ignore_patterns = (
@@ -45,6 +257,17 @@ class AkitaFactory:
         self._ignore_directories = ignore_directories
         self._case_sensitive = case_sensitive
         self._glob_kwargs = glob_kwargs if glob_kwargs is not None else {}
+        self._quiet_period = quiet_period
+        self._sweep_interval = sweep_interval
+        self._observer = observer
+        self._polling_interval = polling_interval
+        self._listdir_cache_size = listdir_cache_size
+        self._coalesce_window = coalesce_window
+        self._max_batch = max_batch
+        self._scan_workers = scan_workers
+        self._stat_cache = stat_cache
+        self._check_modified = check_modified
+        self._snapshot_codec = snapshot_codec
 
     def get_queue(self, maxsize=0) -> EventsQueue:
         """
@@ -61,6 +284,41 @@ class AkitaFactory:
         """
         return EventsQueue(maxsize)
 
+    def get_event_coalescer(self, queue: EventsQueue) -> EventCoalescer | None:
+        """
+        Create the buffer that coalesces the events of the event handler.
+
+        Parameters
+        ----------
+        queue
+            Queue where batches of events are placed.
+
+        Returns
+        -------
+            EventCoalescer instance, or `None` if coalescing is disabled.
+        """
+        if self._coalesce_window <= 0:
+            return None
+
+        return EventCoalescer(queue, self._coalesce_window, self._max_batch)
+
+    def get_settle_scheduler(
+        self, queue: EventsQueue | EventCoalescer
+    ) -> SettleScheduler:
+        """
+        Create the settle scheduler.
+
+        Parameters
+        ----------
+        queue
+            Queue where settled files are placed.
+
+        Returns
+        -------
+            SettleScheduler instance.
+        """
+        return SettleScheduler(queue, self._quiet_period, self._sweep_interval)
+
     def get_event_handler(
         self,
         queue: EventsQueue,
@@ -68,6 +326,7 @@ class AkitaFactory:
         ignore_patterns: str | list[str] = None,
         ignore_directories: bool = None,
         case_sensitive: bool = None,
+        close_events: bool = False,
     ) -> EventHandler:
         """
         Create the event handler.
@@ -75,7 +334,8 @@ class AkitaFactory:
         Notes
         -----
         Create the handler responsible for matching given patterns with file paths
-        associated with occurring events.
+        associated with occurring events. Unless coalescing is disabled, the
+        events are buffered by an `EventCoalescer` before reaching the queue.
 
         Parameters
         ----------
@@ -87,6 +347,8 @@ class AkitaFactory:
             If `True` directories are ignored; `False` otherwise.
         case_sensitive
             If `True` path names are matched sensitive to case; `False` otherwise.
+        close_events
+            If `True`, the observer delivers close-after-write events.
 
         Returns
         -------
@@ -105,19 +367,72 @@ class AkitaFactory:
             case_sensitive if case_sensitive is not None else self._case_sensitive
         )
 
+        # Bursts of events are coalesced before reaching the queue
+        coalescer = self.get_event_coalescer(queue)
+        handler_queue: EventsQueue | EventCoalescer = (
+            coalescer if coalescer is not None else queue
+        )
+
         return EventHandler(
-            queue, patterns, ignore_patterns, ignore_directories, case_sensitive
+            handler_queue,
+            patterns,
+            ignore_patterns,
+            ignore_directories,
+            case_sensitive,
+            settle_scheduler=self.get_settle_scheduler(handler_queue),
+            close_events=close_events,
         )
 
-    def get_polling_observer(self) -> PollingObserver:
+    def get_polling_observer(self) -> PollingObserver | PollingObserverVFS:
         """
         Create the polling observer.
 
         Returns
         -------
-            PollingObserver instance.
+            PollingObserver instance, or PollingObserverVFS instance
+            with cached directory listings.
+        """
+        if self._listdir_cache_size > 0:
+            return PollingObserverVFS(
+                stat=os.stat,
+                listdir=CachedListdir(self._listdir_cache_size),
+                polling_interval=self._polling_interval,
+            )
+
+        return PollingObserver(timeout=self._polling_interval)
+
+    def get_inotify_observer(self) -> BaseObserver:
+        """
+        Create the inotify observer.
+
+        Returns
+        -------
+            InotifyObserver instance.
+        """
+        from watchdog.observers.inotify import InotifyObserver
+
+        return InotifyObserver()
+
+    def get_observer(self) -> BaseObserver:
         """
-        return PollingObserver()
+        Create the observer.
+
+        Returns
+        -------
+            Observer instance.
+        """
+        if self._observer == "inotify":
+            return self.get_inotify_observer()
+        elif self._observer == "auto" and not is_network_filesystem(self._path):
+            try:
+                return self.get_inotify_observer()
+            except Exception as error:
+                logger.warning(
+                    f"inotify is not available ({error}). "
+                    + "The polling observer will be used."
+                )
+
+        return self.get_polling_observer()
 
     def get_directory_state(
         self,
@@ -145,7 +460,17 @@ class AkitaFactory:
         patterns = patterns if patterns is not None else self._patterns
         glob_kwargs = glob_kwargs if glob_kwargs is not None else self._glob_kwargs
 
-        return DirectoryState(path, patterns, glob_kwargs)
+        return DirectoryState(
+            path,
+            patterns,
+            glob_kwargs,
+            ignore_patterns=self._ignore_patterns,
+            case_sensitive=self._case_sensitive,
+            workers=self._scan_workers,
+            stat_cache=self._stat_cache,
+            check_modified=self._check_modified,
+            snapshot_codec=self._snapshot_codec,
+        )
 
 
 def get_akita_dependencies(
@@ -155,7 +480,18 @@ def get_akita_dependencies(
     ignore_directories: bool = True,
     case_sensitive: bool = True,
     glob_kwargs: dict = None,
-) -> tuple[str, EventsQueue, EventHandler, DirectoryState, PollingObserver]:
+    quiet_period: float = 1.0,
+    sweep_interval: float = None,
+    observer: str = "polling",
+    polling_interval: float = 1.0,
+    listdir_cache_size: int = 10000,
+    coalesce_window: float = 0.5,
+    max_batch: int = 1000,
+    scan_workers: int = 1,
+    stat_cache: bool = True,
+    check_modified: bool = True,
+    snapshot_codec: str = "none",
+) -> tuple[str, EventsQueue, EventHandler, DirectoryState, BaseObserver]:
     """
     Get the dependencies of Akita.
 
@@ -164,11 +500,29 @@ def get_akita_dependencies(
         List of dependencies of Akita.
     """
     akita_factory = AkitaFactory(
-        path, patterns, ignore_patterns, ignore_directories, case_sensitive, glob_kwargs
+        path,
+        patterns,
+        ignore_patterns,
+        ignore_directories,
+        case_sensitive,
+        glob_kwargs,
+        quiet_period,
+        sweep_interval,
+        observer,
+        polling_interval,
+        listdir_cache_size,
+        coalesce_window,
+        max_batch,
+        scan_workers,
+        stat_cache,
+        check_modified,
+        snapshot_codec,
     )
     queue = akita_factory.get_queue()
-    event_handler = akita_factory.get_event_handler(queue)
+    akita_observer = akita_factory.get_observer()
+    event_handler = akita_factory.get_event_handler(
+        queue, close_events=supports_close_events(akita_observer)
+    )
     directory_state = akita_factory.get_directory_state()
-    polling_observer = akita_factory.get_polling_observer()
 
-    return path, queue, event_handler, directory_state, polling_observer
+    return path, queue, event_handler, directory_state, akita_observer
@@ -0,0 +1,185 @@
+"""Disk-backed store of processed events."""
+from __future__ import annotations
+
+import logging
+import os
+import pickle
+import sqlite3
+import time
+from threading import Lock
+from typing import Any, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessedEventsStore:
+    """
+    Indexed, disk-backed store of processed events.
+
+    Events are stored in a SQLite table whose primary key is the event,
+    so that appending an event and testing its membership are indexed
+    operations that do not require loading the whole store into memory.
+    The time at which each event was last processed is stored as well, so
+    that files modified after being processed can be told apart from files
+    that were still being written when the directory was last scanned.
+
+    Notes
+    -----
+    Events must be of a type supported by SQLite (e.g., `str`, `int`,
+    `float` or `bytes`).
+
+    Attributes
+    ----------
+    _db_file
+        File where the SQLite database is stored.
+    _connection
+        Connection to the SQLite database.
+    _lock
+        Lock that serialises the access to the connection.
+    """
+
+    def __init__(self, db_file: str, legacy_file: str = None) -> None:
+        """
+        Initialize the store of processed events.
+
+        Parameters
+        ----------
+        db_file
+            File where the SQLite database is stored.
+        legacy_file, optional
+            Pickle file holding a list of processed events. If given and the
+            database does not exist yet, its events are imported into the store.
+        """
+        self._db_file = db_file
+        self._lock = Lock()
+
+        is_new = not os.path.isfile(db_file)
+        self._connection = sqlite3.connect(db_file, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS processed_events "
+            + "(event PRIMARY KEY, processed_at REAL) WITHOUT ROWID"
+        )
+        columns = [
+            row[1]
+            for row in self._connection.execute("PRAGMA table_info(processed_events)")
+        ]
+        if "processed_at" not in columns:
+            # Stores created before the processing times were recorded
+            self._connection.execute(
+                "ALTER TABLE processed_events ADD COLUMN processed_at REAL"
+            )
+        self._connection.commit()
+
+        if is_new and legacy_file is not None and os.path.isfile(legacy_file):
+            self._import_legacy_file(legacy_file)
+
+    def _import_legacy_file(self, legacy_file: str) -> None:
+        """
+        Import the events of a pickled list of processed events.
+
+        Parameters
+        ----------
+        legacy_file
+            Pickle file holding a list of processed events.
+        """
+        logger.info(f"Importing processed events from {legacy_file}.")
+
+        with open(legacy_file, "rb") as f:
+            events = pickle.load(f)
+
+        # The times at which they were processed are unknown
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO processed_events VALUES (?, NULL)",
+                ((event,) for event in events),
+            )
+            self._connection.commit()
+        logger.info(f"Imported {len(events)} processed events.")
+
+    def add(self, event: Any) -> None:
+        """
+        Add an event to the store.
+
+        Parameters
+        ----------
+        event
+            Event to add.
+        """
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO processed_events VALUES (?, ?)",
+                (event, time.time()),
+            )
+            self._connection.commit()
+
+    def add_many(self, events: Iterable[Any]) -> None:
+        """
+        Add several events to the store in a single transaction.
+
+        Parameters
+        ----------
+        events
+            Events to add.
+        """
+        processed_at = time.time()
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO processed_events VALUES (?, ?)",
+                ((event, processed_at) for event in events),
+            )
+            self._connection.commit()
+
+    def processed_at(self, event: Any) -> float | None:
+        """
+        Get the time at which an event was last processed.
+
+        Parameters
+        ----------
+        event
+            Event to look up.
+
+        Returns
+        -------
+            Time at which the event was last processed, or `None` if it has not
+            been processed or was processed before the times were recorded.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT processed_at FROM processed_events WHERE event = ?", (event,)
+            ).fetchone()
+
+        return None if row is None else row[0]
+
+    def __contains__(self, event: Any) -> bool:
+        """Return whether the event has been processed."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM processed_events WHERE event = ?", (event,)
+            ).fetchone()
+
+        return row is not None
+
+    def __len__(self) -> int:
+        """Return the number of processed events."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM processed_events"
+            ).fetchone()[0]
+
+    def __iter__(self) -> Iterator[Any]:
+        """Iterate over the processed events."""
+        with self._lock:
+            events = self._connection.execute("SELECT event FROM processed_events")
+            rows = events.fetchmany(10000)
+        while rows:
+            for (event,) in rows:
+                yield event
+            with self._lock:
+                rows = events.fetchmany(10000)
+
+    def close(self) -> None:
+        """Close the connection to the database."""
+        with self._lock:
+            self._connection.close()
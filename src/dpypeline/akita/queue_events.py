@@ -3,9 +3,18 @@ from __future__ import annotations
 
 import logging
 import os
-import pickle
+from collections import Counter
 from queue import Empty, Full, Queue
-from typing import Any
+from typing import Any, Iterable
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .dead_letters import DeadLetterQueue
+from .processed_events import ProcessedEventsStore
+from .queue_journal import QueueJournal
 
 logger = logging.getLogger(__name__)
 
@@ -28,36 +37,82 @@ class Sentinel:
 
 
 class EventsQueue(Queue):
-    """EventsQueue singleton class."""
+    """
+    EventsQueue singleton class.
+
+    Notes
+    -----
+    The queue holds an exclusive lock on a file in `CACHE_DIR` while it is
+    alive, so that no other process (e.g., the dead-letter commands of the
+    CLI while a pipeline is running) can open the same journal and stores.
+    """
 
     _instance: EventsQueue = None
     _initialized: bool = False
     _state_file_suffix: str = "queue_state.pickle"
+    _journal_file_suffix: str = "queue_state.journal"
     _processed_events_file_suffix: str = "processed_events.pickle"
+    _processed_events_db_suffix: str = "processed_events.db"
+    _dead_letters_db_suffix: str = "dead_letters.db"
+    _lock_file_suffix: str = "queue.lock"
 
-    def __init__(self, maxsize: int = 0) -> None:
-        """Initiate the EventsQueue singleton."""
+    def __init__(self, maxsize: int = 0, compact_every: int = 10000) -> None:
+        """
+        Initiate the EventsQueue singleton.
+
+        Parameters
+        ----------
+        maxsize, optional
+            Maximum size of the queue, by default 0 (infinite).
+        compact_every, optional
+            Minimum number of operations appended to the journal before it is
+            compacted into a snapshot of the queue, by default 10000.
+
+        Raises
+        ------
+        RuntimeError
+            If the queue in `CACHE_DIR` is in use by another process.
+        """
         assert (
             os.getenv("CACHE_DIR") is not None
         ), "CACHE_DIR environmental variable is not set."
 
         if not self._initialized:
             logger.debug("Initializing singleton instance of EventsQueue.")
+            self._lock_file = self._acquire_lock(
+                os.path.join(os.getenv("CACHE_DIR"), self._lock_file_suffix)
+            )
             super().__init__(maxsize=maxsize)
             self._initialized: bool = True
-            self._processed_events: list[str] = None
+            self._leased: Counter = Counter()
             self._state_file = os.path.join(
                 os.getenv("CACHE_DIR"), self._state_file_suffix
             )
+            self._journal = QueueJournal(
+                snapshot_file=self._state_file,
+                journal_file=os.path.join(
+                    os.getenv("CACHE_DIR"), self._journal_file_suffix
+                ),
+                compact_every=compact_every,
+            )
             self._load_state()
-
-        self._processed_events_file = str = os.path.join(
-            os.getenv("CACHE_DIR"), self._processed_events_file_suffix
-        )
+            self._processed_events = ProcessedEventsStore(
+                db_file=os.path.join(
+                    os.getenv("CACHE_DIR"), self._processed_events_db_suffix
+                ),
+                legacy_file=os.path.join(
+                    os.getenv("CACHE_DIR"), self._processed_events_file_suffix
+                ),
+            )
+            self._dead_letters = DeadLetterQueue(
+                db_file=os.path.join(
+                    os.getenv("CACHE_DIR"), self._dead_letters_db_suffix
+                )
+            )
 
         self._sentinel = Sentinel()
 
-    def __new__(cls, maxsize: int = 0) -> EventsQueue:
+    def __new__(cls, *args, **kwargs) -> EventsQueue:
         """
         Create a new instance of the EventsQueue class using the Singleton pattern.
 
@@ -74,11 +129,50 @@ class EventsQueue(Queue):
 
         return cls._instance
 
+    @staticmethod
+    def _acquire_lock(lock_file: str) -> Any:
+        """
+        Take the exclusive lock of the queue.
+
+        Parameters
+        ----------
+        lock_file
+            File that is locked while the queue is alive.
+
+        Returns
+        -------
+            Open lock file, whose lock is released when it is closed.
+
+        Raises
+        ------
+        RuntimeError
+            If the lock is held by another process.
+        """
+        f = open(lock_file, "a")
+        if fcntl is None:
+            # Locks are not supported on this platform
+            return f
+
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            raise RuntimeError(
+                f"The queue in {os.path.dirname(lock_file)} is in use by another "
+                + "process. Stop the running pipeline first."
+            )
+
+        return f
+
     @property
     def queue_list(self) -> list[Any]:
         """
         Return the list of events in the queue.
 
+        Notes
+        -----
+        Leased events are not included (see `leased_events`).
+
         Returns
         -------
             List of events in the queue.
@@ -98,73 +192,208 @@ class EventsQueue(Queue):
         ----------
         active
             The new state of the sentinel.
+
+        Notes
+        -----
+        Consumers waiting for events are woken up, so that they can exit
+        as soon as the queue is empty and the sentinel is active.
         """
-        return self._sentinel.set_state(active)
+        with self.not_empty:
+            state = self._sentinel.set_state(active)
+            self.not_empty.notify_all()
 
-    @property
-    def processed_events(self) -> list[Any]:
+        return state
+
+    def wait_for_events(self, timeout: float | None = None) -> bool:
         """
-        Return the list of events processed thus far.
+        Block until there are events in the queue or the sentinel is active.
+
+        Parameters
+        ----------
+        timeout, optional
+            Maximum time to wait (in seconds). If `None`, waits indefinitely.
 
         Returns
         -------
-            List of events processed thus far.
+            `True` if there are events in the queue, `False` otherwise
+            (i.e., the sentinel is active or the timeout has expired).
         """
-        if self._processed_events is None:
-            # Only load processed events if first time called.
-            self._load_processed_events()
+        with self.not_empty:
+            self.not_empty.wait_for(
+                lambda: self._qsize() > 0 or self._sentinel(), timeout=timeout
+            )
+            return self._qsize() > 0
 
+    @property
+    def processed_events(self) -> ProcessedEventsStore:
+        """
+        Return the store of events processed thus far.
+
+        Returns
+        -------
+            Indexed store of events processed thus far.
+        """
         return self._processed_events
 
+    def is_processed(self, event: Any) -> bool:
+        """
+        Return whether an event has been processed.
+
+        Parameters
+        ----------
+        event
+            Event to look up.
+
+        Returns
+        -------
+            `True` if the event has been processed, `False` otherwise.
+        """
+        return event in self._processed_events
+
+    def processed_at(self, event: Any) -> float | None:
+        """
+        Return the time at which an event was last processed.
+
+        Parameters
+        ----------
+        event
+            Event to look up.
+
+        Returns
+        -------
+            Time at which the event was last processed, or `None` if unknown.
+        """
+        return self._processed_events.processed_at(event)
+
+    def _put(self, item: Any) -> None:
+        """Put an item in the queue and append the operation to the journal."""
+        self.queue.append(item)
+        self._log_operation("enqueue", item)
+
+    def _get(self) -> Any:
+        """Get an item from the queue and append the operation to the journal."""
+        item = self.queue.popleft()
+        self._log_operation("dequeue")
+        return item
+
+    def _log_operation(self, op: str, *args: Any) -> None:
+        """
+        Append an operation to the journal of the queue.
+
+        Notes
+        -----
+        Must be called while holding the mutex of the queue, so that the
+        order of the records matches the order of the operations.
+
+        Parameters
+        ----------
+        op
+            Name of the operation.
+        args
+            Arguments of the operation.
+        """
+        self._journal.append(op, *args)
+
+        if self._journal.needs_compaction(len(self.queue) + len(self._leased)):
+            self._journal.compact(self._get_state())
+
+    def _get_state(self) -> dict:
+        """Return the state of the queue to be stored in a snapshot."""
+        return {"queue": self.queue, "leased": self._leased}
+
+    def _release_lease(self, event: Any) -> None:
+        """
+        Release the lease of an event.
+
+        Parameters
+        ----------
+        event
+            Leased event.
+
+        Raises
+        ------
+        ValueError
+            If the event is not leased.
+        """
+        if not self._leased[event]:
+            raise ValueError(f"Event {event} is not leased.")
+
+        self._leased[event] -= 1
+        if not self._leased[event]:
+            del self._leased[event]
+
+    def _replay_operation(self, op: str, *args: Any) -> None:
+        """
+        Replay an operation recovered from the journal.
+
+        Parameters
+        ----------
+        op
+            Name of the operation.
+        args
+            Arguments of the operation.
+        """
+        if op == "enqueue":
+            self.queue.append(*args)
+        elif op == "enqueue_many":
+            self.queue.extend(*args)
+        elif op == "dequeue":
+            self.queue.popleft()
+        elif op == "remove":
+            self.queue.remove(*args)
+        elif op == "claim":
+            self._leased[self.queue.popleft()] += 1
+        elif op == "ack":
+            self._release_lease(*args)
+        elif op == "nack":
+            self._release_lease(*args)
+            self.queue.append(*args)
+        elif op == "dead_letter":
+            self._release_lease(*args)
+        else:
+            raise ValueError(f"Invalid journal operation: {op}")
+
     def _save_state(self, logger_prefix="") -> None:
-        """Save the state of the queue."""
+        """Save a snapshot of the state of the queue and truncate its journal."""
         logger.debug(f"{logger_prefix}Saving state of the queue.")
 
-        with open(self._state_file, "wb") as f:
-            pickle.dump(self.queue, f)
+        with self.mutex:
+            self._journal.compact(self._get_state())
 
         logger.debug(
             f"{logger_prefix}Save of the state of the queue has been saved succesful."
         )
 
     def _load_state(self) -> None:
-        """Load the state of the queue."""
+        """Load the state of the queue from its snapshot and journal."""
         logger.debug("Loading state of the queue.")
 
-        if os.path.isfile(self._state_file):
-            logger.debug(f"Found queue state file {self._state_file}")
+        state, records = self._journal.recover()
+        if isinstance(state, dict):
+            self.queue = state["queue"]
+            self._leased = state["leased"]
+        elif state is not None:
+            # Snapshot written before leases existed
+            self.queue = state
 
-            with open(self._state_file, "rb") as f:
-                self.queue = pickle.load(f)
-        else:
-            logger.debug(f"No queue state file {self._state_file} was found.")
+        for op, args in records:
+            self._replay_operation(op, *args)
 
-    def _load_processed_events(self) -> None:
-        """Load the processed events."""
-        logger.debug("Loading processed events.")
+        if self._leased:
+            # Events leased when the previous session terminated are
+            # re-delivered first, as they were at the head of the queue
+            logger.info(f"Re-delivering {sum(self._leased.values())} leased events.")
+            self.queue.extendleft(reversed(list(self._leased.elements())))
+            self._leased.clear()
+            self._journal.compact(self._get_state())
 
-        if os.path.isfile(self._processed_events_file):
-            logger.debug(f"Found processed events file {self._processed_events_file}.")
-
-            with open(self._processed_events_file, "rb") as f:
-                self._processed_events = pickle.load(f)
-        else:
-            logger.debug(
-                f"No processed events file {self._processed_events_file} was found."
-            )
-            self._processed_events = []
-
-    def _save_processed_events(self) -> None:
-        """Save the events processed so far in this session."""
-        logger.debug("Saving processed events.")
-        with open(self._processed_events_file, "wb") as f:
-            pickle.dump(self._processed_events, f)
-        logger.debug("Save of processed events has been successful.")
+        logger.debug(f"Loaded {len(self.queue)} events into the queue.")
 
     def enqueue(self, event: Any) -> bool:
         """Add an event to the queue.
 
-        Everytime an event is added to the queue, the state of the queue is saved.
+        Everytime an event is added to the queue, the operation is appended
+        to the journal of the queue.
 
         Parameters
         ----------
@@ -178,42 +407,265 @@ class EventsQueue(Queue):
         try:
             logger.debug(f"Enqueuing event '{event}'.")
             self.put(event, block=False)
-            self._save_state(logger_prefix="Enqueueing event: ")
             logger.debug(f"Event '{event}' has been enqueued succesfully.")
             return True
         except Full:
             raise Full("Queue is full.")
 
+    def enqueue_many(self, events: Iterable[Any]) -> int:
+        """Add several events to the queue at once.
+
+        The events are added while holding the lock of the queue only once,
+        appended to the journal as a single record and consumers waiting for
+        events are notified only once.
+
+        Parameters
+        ----------
+        events
+            Events to add to the queue.
+
+        Returns
+        -------
+        Number of events added to the queue.
+        """
+        events = list(events)
+        if not events:
+            return 0
+
+        logger.debug(f"Enqueuing {len(events)} events.")
+        with self.not_full:
+            if 0 < self.maxsize < self._qsize() + len(events):
+                raise Full("Queue is full.")
+
+            self.queue.extend(events)
+            self.unfinished_tasks += len(events)
+            self._log_operation("enqueue_many", events)
+            self.not_empty.notify_all()
+
+        logger.debug(f"{len(events)} events have been enqueued succesfully.")
+        return len(events)
+
     def _set_as_processed(self, event: Any) -> None:
         """Set the event as processed."""
-        # Set as processesed event
-        if self._processed_events is None:
-            self._processed_events = []
-
-        self._processed_events.append(event)
-        self._save_processed_events()
+        self._processed_events.add(event)
 
-    def dequeue(self) -> Any:
+    def dequeue(self, block: bool = False, timeout: float | None = None) -> Any:
         """
         Remove and return an event from the queue.
 
         If the queue is empty, returns None.
 
+        Parameters
+        ----------
+        block, optional
+            If `True`, blocks until an event is available, the sentinel
+            is active or the timeout expires, by default False.
+        timeout, optional
+            Maximum time to block (in seconds). If `None`, blocks indefinitely.
+
         Returns
         -------
         First event in the queue or None if the queue is empty.
         """
+        if block and not self.wait_for_events(timeout=timeout):
+            return None
+
         try:
             logger.debug("-" * 79)
             logger.debug("Dequeuing event: Starting.")
             event = self.get(block=False)
             logger.debug(f"Dequeued event: {event}.")
-            self._save_state(logger_prefix="Dequeuing event: ")
             self._set_as_processed(event)
             return event
         except Empty:
             return None
 
+    def claim(self, block: bool = False, timeout: float | None = None) -> Any:
+        """
+        Claim the first event in the queue.
+
+        The claimed event is moved from the queue into the set of leased
+        events, where it stays until it is acknowledged or negatively
+        acknowledged. Leases are persisted, so that the events leased when
+        a session terminates are re-delivered in the next session.
+
+        Parameters
+        ----------
+        block, optional
+            If `True`, blocks until an event is available, the sentinel
+            is active or the timeout expires, by default False.
+        timeout, optional
+            Maximum time to block (in seconds). If `None`, blocks indefinitely.
+
+        Returns
+        -------
+        First event in the queue or None if the queue is empty.
+        """
+        if block and not self.wait_for_events(timeout=timeout):
+            return None
+
+        with self.mutex:
+            if not self._qsize():
+                return None
+
+            event = self.queue.popleft()
+            self._leased[event] += 1
+            self._log_operation("claim")
+            self.not_full.notify()
+
+        logger.debug(f"Claimed event: {event}.")
+        return event
+
+    def ack(self, event: Any) -> bool:
+        """
+        Acknowledge that a leased event has been processed.
+
+        Parameters
+        ----------
+        event
+            Leased event.
+
+        Returns
+        -------
+            True if the lease was released, False otherwise.
+        """
+        try:
+            with self.mutex:
+                self._release_lease(event)
+                self._log_operation("ack", event)
+        except ValueError as e:
+            logger.error(f"{e}")
+            return False
+
+        self._set_as_processed(event)
+        logger.debug(f"Acknowledged event: {event}.")
+        return True
+
+    def nack(self, event: Any) -> bool:
+        """
+        Negatively acknowledge a leased event, putting it back in the queue.
+
+        Parameters
+        ----------
+        event
+            Leased event.
+
+        Returns
+        -------
+            True if the lease was released, False otherwise.
+        """
+        try:
+            with self.mutex:
+                self._release_lease(event)
+                self.queue.append(event)
+                self._log_operation("nack", event)
+                self.not_empty.notify()
+        except ValueError as e:
+            logger.error(f"{e}")
+            return False
+
+        logger.debug(f"Negatively acknowledged event: {event}.")
+        return True
+
+    def dead_letter(self, event: Any, attempts: int, error: str) -> bool:
+        """
+        Move a leased event whose processing has failed to the dead-letter queue.
+
+        Parameters
+        ----------
+        event
+            Leased event.
+        attempts
+            Number of attempts made to process the event.
+        error
+            Last error raised while processing the event.
+
+        Returns
+        -------
+            True if the event was moved to the dead-letter queue, False if it
+            was not leased.
+        """
+        try:
+            with self.mutex:
+                # Only leased events are stored, before their lease is released,
+                # so that a crash in between re-delivers the event
+                if not self._leased[event]:
+                    raise ValueError(f"Event {event} is not leased.")
+                self._dead_letters.add(event, attempts, error)
+                self._release_lease(event)
+                self._log_operation("dead_letter", event)
+        except ValueError as e:
+            logger.error(f"{e}")
+            return False
+
+        logger.warning(f"Event {event} has been moved to the dead-letter queue.")
+        return True
+
+    @property
+    def dead_letters(self) -> DeadLetterQueue:
+        """
+        Return the dead-letter queue.
+
+        Returns
+        -------
+            Queue of events whose processing has failed permanently.
+        """
+        return self._dead_letters
+
+    def is_dead_lettered(self, event: Any) -> bool:
+        """
+        Return whether an event is in the dead-letter queue.
+
+        Parameters
+        ----------
+        event
+            Event to look up.
+
+        Returns
+        -------
+            `True` if the event is in the dead-letter queue, `False` otherwise.
+        """
+        return event in self._dead_letters
+
+    def requeue_dead_letters(self, events: list[Any] = None) -> int:
+        """
+        Move events from the dead-letter queue back into the queue.
+
+        Parameters
+        ----------
+        events, optional
+            Events to re-queue. If `None`, all dead-lettered events are re-queued.
+
+        Returns
+        -------
+            Number of events re-queued.
+        """
+        if events is None:
+            events = [event for event, *_ in self._dead_letters.items()]
+
+        requeued = [event for event in events if event in self._dead_letters]
+        logger.info(f"Re-queueing {len(requeued)} dead-lettered events.")
+
+        # Events are only removed from the dead-letter queue once enqueued,
+        # so that they are not lost if the queue is full or the process dies
+        n_requeued = self.enqueue_many(requeued)
+        for event in requeued:
+            self._dead_letters.remove(event)
+
+        return n_requeued
+
+    @property
+    def leased_events(self) -> list[Any]:
+        """
+        Return the list of leased events.
+
+        Returns
+        -------
+            List of events claimed but not yet acknowledged.
+        """
+        with self.mutex:
+            return list(self._leased.elements())
+
     def peek(self) -> Any:
         """
         Peek first item in the queue withou removing it.
@@ -239,7 +691,7 @@ class EventsQueue(Queue):
         """
         return self.qsize()
 
-    def remove(self, event: Any) -> int:
+    def remove(self, event: Any) -> bool:
         """
         Remove an event from the queue.
 
@@ -262,8 +714,9 @@ class EventsQueue(Queue):
         try:
             logger.debug("-" * 79)
             logger.debug(f"Removing event: {event}.")
-            self.queue.remove(event)
-            self._save_state(logger_prefix="Removing event: ")
+            with self.mutex:
+                self.queue.remove(event)
+                self._log_operation("remove", event)
             self._set_as_processed(event)
             return True
         except ValueError as e:
@@ -273,4 +726,10 @@ class EventsQueue(Queue):
     @classmethod
     def clear_instance(cls):
         """Clear the singleton instance."""
+        if cls._instance is not None and cls._instance._initialized:
+            cls._instance._journal.close()
+            cls._instance._processed_events.close()
+            cls._instance._dead_letters.close()
+            cls._instance._lock_file.close()
+
         cls._instance = None
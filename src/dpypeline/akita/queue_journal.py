@@ -0,0 +1,238 @@
+"""Write-ahead journal of the queue of events."""
+from __future__ import annotations
+
+import logging
+import os
+import pickle
+from typing import IO, Any
+
+logger = logging.getLogger(__name__)
+
+
+class QueueJournal:
+    """
+    Append-only write-ahead journal of the operations applied to a queue.
+
+    Instead of rewriting the whole state of the queue on every operation,
+    each operation is appended to the journal as a small pickled record.
+    The journal is periodically compacted into a snapshot of the state,
+    after which it is truncated. Upon recovery, the snapshot is loaded and
+    the records appended after it are replayed.
+
+    Attributes
+    ----------
+    _snapshot_file
+        File where the snapshot of the state is stored.
+    _journal_file
+        File where the records are appended.
+    _compact_every
+        Minimum number of records appended before compacting the journal.
+    _fsync
+        If `True`, every record is fsynced to disk.
+    _seq
+        Sequence number of the last record appended.
+    _n_records
+        Number of records appended since the last snapshot.
+    _file
+        Open handle of the journal file.
+    """
+
+    def __init__(
+        self,
+        snapshot_file: str,
+        journal_file: str,
+        compact_every: int = 10000,
+        fsync: bool = False,
+    ) -> None:
+        """
+        Initialize the journal.
+
+        Parameters
+        ----------
+        snapshot_file
+            File where the snapshot of the state is stored.
+        journal_file
+            File where the records are appended.
+        compact_every, optional
+            Minimum number of records appended before compacting the journal,
+            by default 10000.
+        fsync, optional
+            If `True`, every record is fsynced to disk, by default False.
+        """
+        self._snapshot_file = snapshot_file
+        self._journal_file = journal_file
+        self._compact_every = compact_every
+        self._fsync = fsync
+        self._seq: int = 0
+        self._n_records: int = 0
+        self._file: IO = None
+
+    def _load_snapshot(self) -> tuple[int, Any]:
+        """
+        Load the snapshot of the state.
+
+        Notes
+        -----
+        Snapshots written before the journal existed contain the bare state,
+        which is assigned the sequence number 0.
+
+        Returns
+        -------
+            Sequence number of the last record included in the snapshot
+            and the state, or `None` if no snapshot was found.
+        """
+        if not os.path.isfile(self._snapshot_file):
+            logger.debug(f"No snapshot file {self._snapshot_file} was found.")
+            return 0, None
+
+        logger.debug(f"Found snapshot file {self._snapshot_file}.")
+        with open(self._snapshot_file, "rb") as f:
+            snapshot = pickle.load(f)
+
+        if isinstance(snapshot, dict) and "seq" in snapshot:
+            return snapshot["seq"], snapshot["state"]
+
+        return 0, snapshot
+
+    def _read_records(self, seq: int) -> list[tuple[str, tuple]]:
+        """
+        Read the records appended after a given sequence number.
+
+        Notes
+        -----
+        A record that was only partially written (e.g., due to a crash) is
+        discarded and truncated from the journal.
+
+        Parameters
+        ----------
+        seq
+            Sequence number of the last record included in the snapshot.
+
+        Returns
+        -------
+            List of operations and respective arguments.
+        """
+        records: list[tuple[str, tuple]] = []
+        if not os.path.isfile(self._journal_file):
+            return records
+
+        with open(self._journal_file, "rb+") as f:
+            offset = 0
+            while True:
+                try:
+                    record_seq, op, args = pickle.load(f)
+                except EOFError:
+                    break
+                except Exception as e:
+                    logger.warning(
+                        f"Discarding torn record at offset {offset} of the journal "
+                        + f"{self._journal_file}: {e}"
+                    )
+                    f.truncate(offset)
+                    break
+
+                offset = f.tell()
+                self._seq = max(self._seq, record_seq)
+                if record_seq > seq:
+                    records.append((op, args))
+
+        return records
+
+    def recover(self) -> tuple[Any, list[tuple[str, tuple]]]:
+        """
+        Recover the state from the snapshot and the journal.
+
+        Returns
+        -------
+            State stored in the snapshot (`None` if there is no snapshot) and the
+            list of operations, and respective arguments, to replay on top of it.
+        """
+        logger.debug("Recovering state from the journal.")
+        seq, state = self._load_snapshot()
+        self._seq = seq
+        records = self._read_records(seq)
+        self._n_records = len(records)
+        logger.debug(f"Found {len(records)} records to replay.")
+
+        self._file = open(self._journal_file, "ab")
+
+        return state, records
+
+    def append(self, op: str, *args: Any) -> None:
+        """
+        Append a record to the journal.
+
+        Parameters
+        ----------
+        op
+            Name of the operation.
+        args
+            Arguments of the operation.
+        """
+        if self._file is None:
+            self._file = open(self._journal_file, "ab")
+
+        self._seq += 1
+        self._file.write(
+            pickle.dumps((self._seq, op, args), protocol=pickle.HIGHEST_PROTOCOL)
+        )
+        self._file.flush()
+        if self._fsync:
+            os.fsync(self._file.fileno())
+
+        self._n_records += 1
+
+    def needs_compaction(self, state_size: int) -> bool:
+        """
+        Return whether the journal should be compacted.
+
+        Notes
+        -----
+        The journal is compacted once the number of records exceeds both
+        `compact_every` and the size of the state, so that the cost of the
+        snapshots is amortised to O(1) per record.
+
+        Parameters
+        ----------
+        state_size
+            Size of the state (e.g., number of events in the queue).
+
+        Returns
+        -------
+            `True` if the journal should be compacted.
+        """
+        return self._n_records >= max(self._compact_every, state_size)
+
+    def compact(self, state: Any) -> None:
+        """
+        Write a snapshot of the state and truncate the journal.
+
+        Parameters
+        ----------
+        state
+            Current state, resulting from applying all records appended so far.
+        """
+        logger.debug(f"Compacting journal {self._journal_file}.")
+        tmp_file = f"{self._snapshot_file}.tmp"
+        with open(tmp_file, "wb") as f:
+            pickle.dump(
+                {"seq": self._seq, "state": state},
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self._snapshot_file)
+
+        # Records up to self._seq are now in the snapshot
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self._journal_file, "wb")
+        self._n_records = 0
+        logger.debug("Compaction of the journal has been successful.")
+
+    def close(self) -> None:
+        """Close the journal file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,194 @@
+"""Scheduler that enqueues files once they have settled."""
+import logging
+import os
+import time
+from threading import Event, Lock, Thread
+from typing import Any, Iterable, Protocol
+
+logger = logging.getLogger(__name__)
+
+
+class Queue(Protocol):
+    """Queue interface."""
+
+    def enqueue_many(self, events: Iterable[Any]) -> int:
+        """Enqueue several events at once."""
+        ...
+
+
+class SettleScheduler:
+    """
+    Scheduler that enqueues files once they have settled.
+
+    Candidate files are tracked with the size and modification time seen in
+    the last check. A timer-driven thread re-checks all of them in a single
+    sweep and enqueues each file as soon as its size and modification time
+    have not changed for the quiet period, so that files being written
+    concurrently do not wait behind each other.
+
+    Attributes
+    ----------
+    _queue
+        Queue where settled files are placed.
+    _quiet_period
+        Time in seconds for which the size and modification time of a file
+        must not change for it to be considered settled.
+    _sweep_interval
+        Time in seconds between consecutive sweeps.
+    _candidates
+        Dictionary mapping the tracked files to their size and modification
+        time in the last check and the time since which they have not changed.
+    _lock
+        Lock that serialises the access to the candidates.
+    _stop_event
+        Event set to stop the sweep thread.
+    _worker
+        Thread that sweeps the candidates.
+    """
+
+    def __init__(
+        self, queue: Queue, quiet_period: float = 1.0, sweep_interval: float = None
+    ) -> None:
+        """
+        Initialize the scheduler.
+
+        Parameters
+        ----------
+        queue
+            Queue where settled files are placed.
+        quiet_period, optional
+            Time in seconds for which the size and modification time of a file
+            must not change for it to be considered settled, by default 1.
+        sweep_interval, optional
+            Time in seconds between consecutive sweeps,
+            by default half of the quiet period.
+        """
+        self._queue = queue
+        self._quiet_period = quiet_period
+        self._sweep_interval = (
+            sweep_interval if sweep_interval is not None else quiet_period / 2
+        )
+        self._candidates: dict[str, tuple[int, int, float]] = {}
+        self._lock = Lock()
+        self._stop_event = Event()
+        self._worker: Thread = None
+
+    @property
+    def pending(self) -> list[str]:
+        """Return the files that have not settled yet."""
+        with self._lock:
+            return list(self._candidates)
+
+    @staticmethod
+    def _get_signature(path: str) -> tuple[int, int] | None:
+        """
+        Get the size and modification time of a file.
+
+        Parameters
+        ----------
+        path
+            Path to the file.
+
+        Returns
+        -------
+            Size and modification time in nanoseconds of the file,
+            or `None` if the file does not exist.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        return stat.st_size, stat.st_mtime_ns
+
+    def track(self, path: str) -> None:
+        """
+        Track a file until it has settled.
+
+        Parameters
+        ----------
+        path
+            Path to the file.
+        """
+        signature = self._get_signature(path)
+        if signature is None:
+            logger.warning(f"{path} no longer exists and will not be tracked.")
+            return
+
+        with self._lock:
+            self._candidates[path] = (*signature, time.monotonic())
+
+        self.start()
+
+    def untrack(self, path: str) -> bool:
+        """
+        Stop tracking a file.
+
+        Parameters
+        ----------
+        path
+            Path to the file.
+
+        Returns
+        -------
+            `True` if the file was being tracked; `False` otherwise.
+        """
+        with self._lock:
+            return self._candidates.pop(path, None) is not None
+
+    def sweep(self) -> list[str]:
+        """
+        Check all the tracked files and enqueue those that have settled.
+
+        Returns
+        -------
+            List of files enqueued.
+        """
+        now = time.monotonic()
+        settled = []
+
+        with self._lock:
+            candidates = list(self._candidates.items())
+
+        for path, (size, mtime, stable_since) in candidates:
+            signature = self._get_signature(path)
+
+            with self._lock:
+                if self._candidates.get(path) != (size, mtime, stable_since):
+                    # Tracked again while it was being checked
+                    continue
+                elif signature is None:
+                    logger.warning(f"{path} was deleted before it settled.")
+                    del self._candidates[path]
+                elif signature != (size, mtime):
+                    self._candidates[path] = (*signature, now)
+                elif now - stable_since >= self._quiet_period:
+                    del self._candidates[path]
+                    settled.append(path)
+
+        if settled:
+            self._queue.enqueue_many(settled)
+
+        return settled
+
+    def _run(self) -> None:
+        """Sweep the tracked files until the scheduler is stopped."""
+        while not self._stop_event.wait(self._sweep_interval):
+            try:
+                self.sweep()
+            except Exception as error:
+                logger.exception(f"Error while sweeping the tracked files: {error}")
+
+    def start(self) -> None:
+        """Start the sweep thread, if it is not running."""
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stop_event.clear()
+                self._worker = Thread(target=self._run, daemon=True)
+                self._worker.start()
+
+    def stop(self) -> None:
+        """Stop the sweep thread."""
+        self._stop_event.set()
+        if self._worker is not None:
+            self._worker.join()
@@ -0,0 +1,232 @@
+"""Persistent cache of the listings of directories and the stats of files."""
+import logging
+import os
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, NamedTuple
+
+from .directory_scanner import list_directory
+
+logger = logging.getLogger(__name__)
+
+# Listings of directories modified less than this many nanoseconds before
+# they were listed are not trusted, since further changes within the
+# resolution of the modification time would go unnoticed
+_RACY_WINDOW_NS = 2_000_000_000
+
+
+class FileStat(NamedTuple):
+    """Stat of a file that tells whether its content has changed."""
+
+    size: int
+    mtime_ns: int
+    ino: int
+
+
+class StateDiff(NamedTuple):
+    """
+    Difference between two states of a directory.
+
+    Attributes
+    ----------
+    added
+        Files that were not in the previous state.
+    modified
+        Files whose size, modification time or inode has changed.
+    removed
+        Files of the previous state that are no longer found.
+    """
+
+    added: list[str]
+    modified: list[str]
+    removed: list[str]
+
+
+class StatCache:
+    """
+    Persistent cache of the listings of directories and the stats of files.
+
+    The listing of a directory is reused while the modification time of the
+    directory does not change, i.e., while no entries have been added, removed
+    or renamed, so that unchanged subtrees are not re-listed when the directory
+    is scanned again. The stats (size, modification time and inode) of the
+    files found are compared with those of the previous scan to tell which
+    files have been added, modified (e.g., overwritten in place) or removed.
+
+    Attributes
+    ----------
+    _cache_file
+        File where the cache is stored.
+    _check_modified
+        Whether the files in directories whose listing is reused are stat'ed.
+    _workers
+        Number of threads that stat files concurrently.
+    _listings
+        Dictionary mapping the directories listed in the last scan to their
+        modification time (`None` if not trusted) and their entries.
+    _scanning
+        Listings of the directories listed in the current scan.
+    _stats
+        Dictionary mapping the files found in the last scan to their stats.
+    _reused
+        Directories whose listing was reused in the current scan.
+    """
+
+    def __init__(
+        self, cache_file: str, check_modified: bool = True, workers: int = 1
+    ) -> None:
+        """
+        Initialize the cache.
+
+        Parameters
+        ----------
+        cache_file
+            File where the cache is stored.
+        check_modified, optional
+            If `True` (default), all the files found are stat'ed to detect files
+            modified in place. If `False`, the files in directories whose listing
+            is reused are assumed unchanged, so that only the directories are
+            stat'ed.
+        workers, optional
+            Number of threads that stat files concurrently, by default 1.
+        """
+        self._cache_file = cache_file
+        self._check_modified = check_modified
+        self._workers = workers
+        self._listings: dict[str, tuple[int | None, list[tuple[str, bool]]]] = {}
+        self._scanning: dict[str, tuple[int | None, list[tuple[str, bool]]]] = {}
+        self._stats: dict[str, FileStat] = {}
+        self._reused: set[str] = set()
+
+        self._load()
+
+    def _load(self) -> None:
+        """Load the cache."""
+        if not os.path.isfile(self._cache_file):
+            logger.info(f"No stat cache file {self._cache_file} was found.")
+            return
+
+        try:
+            with open(self._cache_file, "rb") as f:
+                cache = pickle.load(f)
+            self._listings = cache["listings"]
+            self._stats = cache["stats"]
+        except Exception as error:
+            logger.warning(f"Could not load stat cache {self._cache_file}: {error}")
+            return
+
+        logger.info(
+            f"Loaded stat cache {self._cache_file} with {len(self._listings)} "
+            + f"directories and {len(self._stats)} files."
+        )
+
+    def save(self) -> None:
+        """
+        Save the cache.
+
+        Notes
+        -----
+        Only the directories listed in the last scan are saved, so that the
+        listings of removed or no longer matched directories are dropped.
+        """
+        tmp_file = f"{self._cache_file}.tmp"
+        with open(tmp_file, "wb") as f:
+            pickle.dump({"listings": self._listings, "stats": self._stats}, f)
+        os.replace(tmp_file, self._cache_file)
+
+    def list_directory(self, directory: str) -> list[tuple[str, bool]]:
+        """
+        List a directory, reusing its cached listing if it has not changed.
+
+        Parameters
+        ----------
+        directory
+            Path to the directory.
+
+        Returns
+        -------
+            Entries of the directory, in sorted order, as tuples of name and
+            whether the entry is a directory (following symbolic links).
+        """
+        mtime_ns = os.stat(directory).st_mtime_ns
+
+        cached = self._listings.get(directory)
+        if cached is not None and cached[0] == mtime_ns:
+            self._scanning[directory] = cached
+            self._reused.add(os.path.normpath(directory))
+            return cached[1]
+
+        listed_at = time.time_ns()
+        entries = list_directory(directory)
+
+        # Racily modified directories are listed again in the next scan
+        trusted = mtime_ns < listed_at - _RACY_WINDOW_NS
+        self._scanning[directory] = (mtime_ns if trusted else None, entries)
+
+        return entries
+
+    def _stat(self, path: str) -> FileStat | None:
+        """Return the stat of a file, or `None` if it no longer exists."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+
+        return FileStat(st.st_size, st.st_mtime_ns, st.st_ino)
+
+    def update(self, paths: Iterable[str]) -> StateDiff:
+        """
+        Update the stats of the files of the directory.
+
+        Parameters
+        ----------
+        paths
+            Files currently found in the directory.
+
+        Returns
+        -------
+            Difference between the previous and the current state.
+        """
+        prev_stats, self._stats = self._stats, {}
+        paths = list(paths)
+
+        # Files in reused directories are assumed unchanged unless checked
+        to_stat = [
+            path
+            for path in paths
+            if self._check_modified
+            or path not in prev_stats
+            or os.path.normpath(os.path.dirname(path)) not in self._reused
+        ]
+        if self._workers > 1:
+            with ThreadPoolExecutor(
+                max_workers=self._workers, thread_name_prefix="dpypeline-stat"
+            ) as executor:
+                stats = dict(zip(to_stat, executor.map(self._stat, to_stat)))
+        else:
+            stats = {path: self._stat(path) for path in to_stat}
+
+        added, modified = [], []
+        for path in paths:
+            stat = stats[path] if path in stats else prev_stats[path]
+            if stat is None:
+                # Removed since the directory was listed
+                continue
+
+            self._stats[path] = stat
+            prev_stat = prev_stats.pop(path, None)
+            if prev_stat is None:
+                added.append(path)
+            elif stat != prev_stat:
+                modified.append(path)
+        removed = list(prev_stats)
+
+        self._listings, self._scanning, self._reused = self._scanning, {}, set()
+
+        logger.info(
+            f"Directory state changes: {len(added)} added, {len(modified)} "
+            + f"modified and {len(removed)} removed files."
+        )
+
+        return StateDiff(added, modified, removed)
@@ -19,6 +19,25 @@ def create_parser():
         help="filepath to the pipeline YAML file",
     )
 
+    parser.add_argument(
+        "--list-dead-letters",
+        dest="list_dead_letters",
+        action="store_true",
+        help="list the events in the dead-letter queue and exit "
+        + "(the pipeline must be stopped first)",
+    )
+
+    parser.add_argument(
+        "--requeue-dead-letters",
+        dest="requeue_dead_letters",
+        nargs="*",
+        metavar="EVENT",
+        default=None,
+        help="move the given events (or all, if none is given) from the "
+        + "dead-letter queue back into the queue and exit "
+        + "(the pipeline must be stopped first)",
+    )
+
     parser.add_argument(
         "-v",
         "--version",
@@ -2,7 +2,9 @@
 import logging
 import sys
 import time
+from datetime import datetime
 
+from ..akita.queue_events import EventsQueue
 from .argument_parser import __version__, create_parser
 from .yaml_loader import get_loader, load_yaml
 
@@ -38,6 +40,46 @@ def exit_banner():
     logger.info("dpypeline has terminated succesfully! :)", extra={"simple": True})
 
 
+def dead_letters(list_dead_letters: bool, requeue_dead_letters: list[str]) -> None:
+    """
+    Inspect and re-queue the events in the dead-letter queue.
+
+    Parameters
+    ----------
+    list_dead_letters
+        If `True`, logs the events in the dead-letter queue.
+    requeue_dead_letters
+        Events to move from the dead-letter queue back into the queue.
+        If empty, all events are re-queued. If `None`, no event is re-queued.
+
+    Notes
+    -----
+    The pipeline must be stopped first, since the queue cannot be opened
+    while a running pipeline holds it.
+    """
+    try:
+        queue = EventsQueue()
+    except RuntimeError as e:
+        logger.error(f"{e}")
+        sys.exit(1)
+
+    if list_dead_letters:
+        items = queue.dead_letters.items()
+        logger.info(f"Events in the dead-letter queue (n={len(items)}):")
+        for event, attempts, error, failed_at in items:
+            logger.info(
+                f"{event} | attempts: {attempts} | "
+                + f"failed at: {datetime.fromtimestamp(failed_at):%Y-%m-%d %H:%M:%S}"
+                + f" | error: {error}"
+            )
+
+    if requeue_dead_letters is not None:
+        n_requeued = queue.requeue_dead_letters(requeue_dead_letters or None)
+        logger.info(f"{n_requeued} events have been moved back into the queue.")
+
+    queue.clear_instance()
+
+
 def dpypeline():
     """Run the dpypeline."""
     logging.basicConfig(
@@ -51,6 +93,11 @@ def dpypeline():
     parser = create_parser()
     args = parser.parse_args()
 
+    if args.list_dead_letters or args.requeue_dead_letters is not None:
+        dead_letters(args.list_dead_letters, args.requeue_dead_letters)
+        exit_banner()
+        return
+
     settings = load_yaml(args.input_file, loader=get_loader())
 
     akita = settings["akita"]
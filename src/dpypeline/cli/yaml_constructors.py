@@ -9,8 +9,11 @@ from ..akita.factory import get_akita_dependencies
 from ..etl_pipeline.basic_pipeline import BasicPipeline
 from ..etl_pipeline.core import Job, Task
 from ..etl_pipeline.thread_pipeline import ThreadPipeline
+from ..event_consumer.consumer_async import AsyncConsumer
 from ..event_consumer.consumer_parallel import ConsumerParallel
+from ..event_consumer.consumer_process_pool import ConsumerProcessPool
 from ..event_consumer.consumer_serial import ConsumerSerial
+from ..event_consumer.consumer_threaded import ConsumerThreaded
 from ..filesystems.object_store import ObjectStoreS3
 
 
@@ -87,6 +90,33 @@ def consumer_parallel_constructor(
     return ConsumerParallel(queue=params["akita"].queue, **kwargs)
 
 
+def consumer_threaded_constructor(
+    loader: yaml.SafeLoader, node: yaml.nodes.MappingNode
+) -> ConsumerThreaded:
+    """Construct a ConsumerThreaded instance."""
+    params = loader.construct_mapping(node, deep=True)
+    kwargs = {str(key): params[key] for key in params if key not in ["akita"]}
+    return ConsumerThreaded(queue=params["akita"].queue, **kwargs)
+
+
+def consumer_process_pool_constructor(
+    loader: yaml.SafeLoader, node: yaml.nodes.MappingNode
+) -> ConsumerProcessPool:
+    """Construct a ConsumerProcessPool instance."""
+    params = loader.construct_mapping(node, deep=True)
+    kwargs = {str(key): params[key] for key in params if key not in ["akita"]}
+    return ConsumerProcessPool(queue=params["akita"].queue, **kwargs)
+
+
+def async_consumer_constructor(
+    loader: yaml.SafeLoader, node: yaml.nodes.MappingNode
+) -> AsyncConsumer:
+    """Construct an AsyncConsumer instance."""
+    params = loader.construct_mapping(node, deep=True)
+    kwargs = {str(key): params[key] for key in params if key not in ["akita"]}
+    return AsyncConsumer(queue=params["akita"].queue, **kwargs)
+
+
 # TODO: uncomment this when celery pipeline is ready
 # def celery_pipeline_constructor(
 #     loader: yaml.SafeLoader, node: yaml.nodes.MappingNode
@@ -145,6 +175,9 @@ constructors_dict = {
     "!Akita": akita_constructor,
     "!ConsumerSerial": consumer_serial_constructor,
     "!ConsumerParallel": consumer_parallel_constructor,
+    "!ConsumerThreaded": consumer_threaded_constructor,
+    "!ConsumerProcessPool": consumer_process_pool_constructor,
+    "!AsyncConsumer": async_consumer_constructor,
     "!BasicPipeline": basic_pipeline_constructor,
     "!ThreadPipeline": thread_pipeline_constructor,
     # "!CeleryPipeline": celery_pipeline_constructor,
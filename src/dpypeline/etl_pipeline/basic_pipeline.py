@@ -32,3 +32,22 @@ class BasicPipeline(ETLPipeline):
         logger.debug(f"Jobs for event {event} have been produced successfully.")
 
         return results
+
+    async def aproduce_jobs(self, event: Any) -> list[Any]:
+        """
+        Produce jobs to be run sequentially, awaiting asynchronous tasks.
+
+        Parameters
+        ----------
+        event
+            Triggering event.
+
+        Returns
+        -------
+            List of results of the jobs.
+        """
+        logger.debug(f"Producing jobs for event {event}.")
+        results = [await job.arun(event) for job in self.jobs]
+        logger.debug(f"Jobs for event {event} have been produced successfully.")
+
+        return results
@@ -1,4 +1,6 @@
 """ETL pipeline definitions."""
+import asyncio
+import inspect
 import logging
 from dataclasses import dataclass, field
 from typing import Any
@@ -25,6 +27,11 @@ class Task:
     args: tuple = field(default_factory=tuple)
     kwargs: dict = field(default_factory=dict)
 
+    @property
+    def is_async(self) -> bool:
+        """Whether the task function is a coroutine function."""
+        return inspect.iscoroutinefunction(self.function)
+
     def run(self, *args, **kwargs) -> Any:
         """
         Run the task.
@@ -32,6 +39,8 @@ class Task:
         Notes
         -----
         Args passed upon instantiation are passed first to the function.
+        If the function is a coroutine function, it is run to completion
+        in a new event loop.
 
         Parameters
         ----------
@@ -50,6 +59,42 @@ class Task:
         new_args = self.args + args
         new_kwargs = {**self.kwargs, **kwargs}
         result = self.function(*new_args, **new_kwargs)
+        if self.is_async:
+            result = asyncio.run(result)
+        logger.debug(f"Task {self.function} has been run successfully.")
+
+        return result
+
+    async def arun(self, *args, **kwargs) -> Any:
+        """
+        Run the task asynchronously.
+
+        Notes
+        -----
+        Args passed upon instantiation are passed first to the function.
+        If the function is a coroutine function, it is awaited; otherwise,
+        it is run in a separate thread so that the event loop is not blocked.
+
+        Parameters
+        ----------
+        args
+            Further arguments to be passed to the function.
+        kwargs
+            Furhter keyword arguments to be passed to the function.
+
+        Returns
+        -------
+            Result of the task.
+        """
+        logger.debug(
+            f"Running task {self.function} with args {args} and kwargs {kwargs}"
+        )
+        new_args = self.args + args
+        new_kwargs = {**self.kwargs, **kwargs}
+        if self.is_async:
+            result = await self.function(*new_args, **new_kwargs)
+        else:
+            result = await asyncio.to_thread(self.function, *new_args, **new_kwargs)
         logger.debug(f"Task {self.function} has been run successfully.")
 
         return result
@@ -122,6 +167,24 @@ class Job:
 
         return result
 
+    async def arun(self, *args, **kwargs) -> Any:
+        """
+        Run the job asynchronously.
+
+        Returns
+        -------
+            Result of the job.
+        """
+        logger.debug(f"Running job {self.name}.")
+
+        result = await self.tasks[0].arun(*args, **kwargs)
+        for task in self.tasks[1:]:
+            result = await task.arun(result)
+
+        logger.debug(f"Job {self.name} has run successfully.")
+
+        return result
+
 
 class ETLPipeline:
     """Base class for ETL pipelines."""
@@ -176,3 +239,13 @@ class ETLPipeline:
     def produce_jobs(self, event: Any) -> Any:
         """Produce jobs triggered by an event."""
         raise NotImplementedError("produce_jobs must be implemented.")
+
+    async def aproduce_jobs(self, event: Any) -> Any:
+        """
+        Produce jobs triggered by an event asynchronously.
+
+        Notes
+        -----
+        By default, `produce_jobs` is run in a separate thread.
+        """
+        return await asyncio.to_thread(self.produce_jobs, event)
@@ -1,2 +1,8 @@
 """Event consumer package."""
-__all__ = ["consumer_serial", "consumer_parallel"]
+__all__ = [
+    "consumer_serial",
+    "consumer_parallel",
+    "consumer_threaded",
+    "consumer_process_pool",
+    "consumer_async",
+]
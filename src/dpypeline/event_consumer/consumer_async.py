@@ -0,0 +1,121 @@
+"""AsyncConsumer. Acts as an interface between Akita and the ETL pipeline."""
+import asyncio
+import logging
+from concurrent.futures import Future
+from threading import Thread
+from typing import Any
+
+from .consumer_threaded import ConsumerThreaded
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncConsumer(ConsumerThreaded):
+    """
+    AsyncConsumer that runs on a thread as a daemon process.
+
+    This event consumer produce coroutines that are run concurrently
+        by an asyncio event loop in the current process.
+    Each coroutine corresponds to one or multiple jobs.
+
+    Notes
+    -----
+    Suitable for pipelines whose tasks spend most of their time waiting on
+    the network, e.g., uploads to an object store. Coroutine task functions
+    are awaited, so that thousands of them can be in flight from a single
+    thread, while synchronous task functions are run in the default executor
+    of the event loop. If the job producer does not implement `aproduce_jobs`,
+    `produce_jobs` is run in the default executor.
+
+    Attributes
+    ----------
+    _queue
+        Queue where events are placed.
+    _job_producer
+        Producer of jobs.
+    _worker, optional
+        Worker thread that consumes events from the and processes them to produce jobs.
+    _max_workers
+        Maximum number of coroutines in flight, which acts as the semaphore
+        that bounds the concurrency of the event loop.
+    _loop
+        Event loop that runs the coroutines.
+    _loop_thread
+        Thread that runs the event loop.
+    _finished
+        Queue of the futures that have finished.
+    """
+
+    def __init__(self, max_concurrency: int = 1000, *args, **kwargs) -> None:
+        """
+        Initialize the event consumer.
+
+        Parameters
+        ----------
+        max_concurrency, optional
+            Maximum number of coroutines in flight, by default 1000.
+        args
+            Arguments to pass to ConsumerThreaded.__init__.
+        kwargs
+            Keyword arguments to pass to ConsumerThreaded.__init__.
+        """
+        super().__init__(max_concurrency, *args, **kwargs)
+
+        self._loop: asyncio.AbstractEventLoop = None
+        self._loop_thread: Thread = None
+
+    def _start(self) -> None:
+        """Start the event loop in a separate thread."""
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = Thread(target=self._loop.run_forever, daemon=True)
+        self._loop_thread.start()
+
+    def _shutdown(self) -> None:
+        """Stop the event loop once the coroutines in flight have finished."""
+
+        async def _drain() -> None:
+            tasks = asyncio.all_tasks() - {asyncio.current_task()}
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self._loop.shutdown_default_executor()
+
+        asyncio.run_coroutine_threadsafe(_drain(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+        self._loop.close()
+
+    async def _produce_jobs(self, event: Any) -> Any:
+        """
+        Produce the jobs triggered by an event.
+
+        Parameters
+        ----------
+        event
+            Triggering event.
+
+        Returns
+        -------
+            Result of the job producer.
+        """
+        aproduce_jobs = getattr(self._job_producer, "aproduce_jobs", None)
+        if aproduce_jobs is not None:
+            return await aproduce_jobs(event)
+
+        return await asyncio.to_thread(self._job_producer.produce_jobs, event)
+
+    def _submit(self, event: Any) -> Future:
+        """
+        Submit an event to the event loop.
+
+        Parameters
+        ----------
+        event
+            Event to be submitted.
+
+        Returns
+        -------
+        Future
+        """
+        future = asyncio.run_coroutine_threadsafe(self._produce_jobs(event), self._loop)
+        future.add_done_callback(self._finished.put)
+
+        return future
@@ -1,17 +1,52 @@
 """ConsumerParallel. Acts as an interface between Akita and the ETL pipeline."""
+import heapq
 import logging
 import time
-from collections import OrderedDict
 from typing import Any
 
-from dask.distributed import Client, Future  # , as_completed
+from dask.distributed import Client, Future, as_completed
 
-from .core import EventConsumer
+from .core import FuturesConsumer
 
 logger = logging.getLogger(__name__)
 
 
-class ConsumerParallel(EventConsumer):
+def produce_jobs_batch(
+    job_producer: Any, events: list[Any]
+) -> list[BaseException | None]:
+    """
+    Produce the jobs of a batch of events.
+
+    Notes
+    -----
+    The jobs of each event are produced independently, so that the failure
+    of an event does not affect the others in the batch. Their results are
+    discarded, so that they are not gathered to the client.
+
+    Parameters
+    ----------
+    job_producer
+        Producer of jobs.
+    events
+        Batch of triggering events.
+
+    Returns
+    -------
+        List with the exception raised (or `None` if it succeeded) for each
+        event of the batch.
+    """
+    errors: list[BaseException | None] = []
+    for event in events:
+        try:
+            job_producer.produce_jobs(event)
+            errors.append(None)
+        except Exception as error:
+            errors.append(error)
+
+    return errors
+
+
+class ConsumerParallel(FuturesConsumer):
     """
     ConsumerParallel that runs on a thread as a daemon process.
 
@@ -31,14 +66,31 @@ class ConsumerParallel(EventConsumer):
         Dask client.
     _workers_per_event
         Number of Dask workers per future.
-    _futures
-        List of Dask futures.
-    _max_futures
-        Maximum number of simultaneous Dask futures.
+    _completed
+        Iterator over the futures as they complete.
+    _workers_refresh_interval
+        Minimum time in seconds between requests of the number of workers
+        to the scheduler, when the client is not bound to a cluster object.
+    _batch_size
+        Maximum number of events per future.
+    _batch_linger
+        Maximum time in seconds for which a batch that is not full waits
+        for further events before being submitted.
+    _batch
+        Claimed events waiting to be submitted as a batch.
+    _batch_started
+        Time at which the first event of the pending batch was claimed.
     """
 
     def __init__(
-        self, cluster_client: Client, workers_per_event: int = 1, *args, **kwargs
+        self,
+        cluster_client: Client,
+        workers_per_event: int = 1,
+        *args,
+        workers_refresh_interval: float = 5.0,
+        batch_size: int = 1,
+        batch_linger: float = 0.0,
+        **kwargs,
     ) -> None:
         """
         Initialize the event consumer.
@@ -47,29 +99,81 @@ class ConsumerParallel(EventConsumer):
         ----------
         client
             Dask client.
+        workers_per_event
+            Number of Dask workers per future.
         args
-            Arguments to pass to EventConsumer.__init__.
+            Arguments to pass to FuturesConsumer.__init__.
+        workers_refresh_interval, optional
+            Minimum time in seconds between requests of the number of workers
+            to the scheduler, when the client is not bound to a cluster object,
+            by default 5.
+        batch_size, optional
+            Maximum number of events per future, by default 1. If greater
+            than 1, queued events are packed into futures that produce the
+            jobs of each event of the batch in turn.
+        batch_linger, optional
+            Maximum time in seconds for which a batch that is not full waits
+            for further events before being submitted, by default 0.
         kwargs
-            Keyword arguments to pass to EventConsumer.__init__.
+            Keyword arguments to pass to FuturesConsumer.__init__.
         """
         super().__init__(*args, **kwargs)
 
         self._client = cluster_client
         self._workers_per_event = workers_per_event
-        self._max_futures: int = None
-        self._futures: OrderedDict[str, Any] = None
+        self._workers_refresh_interval = workers_refresh_interval
+        self._completed: as_completed = None
+        self._n_workers: int = 0
+        self._workers_checked_at: float = None
+        self._batch_size = batch_size
+        self._batch_linger = batch_linger
+        self._batch: list[Any] = []
+        self._batch_started: float = None
+
+    def _count_workers(self) -> int:
+        """
+        Count the number of workers in the cluster.
 
-    def _purge_future(self, future: Future) -> None:
-        """Purge a future.
+        Notes
+        -----
+        If the client is bound to a cluster object (e.g., LocalCluster or
+        the dask-jobqueue clusters), the workers are tracked by the cluster
+        from the scheduler's worker events and no request is made. Otherwise,
+        the scheduler is asked at most every `workers_refresh_interval` seconds.
 
-        Parameters
-        ----------
-        future
-            Future that has succeeded.
+        Returns
+        -------
+            Number of workers in the cluster.
+        """
+        cluster = getattr(self._client, "cluster", None)
+        if cluster is not None:
+            return len(cluster.scheduler_info.get("workers", {}))
+
+        now = time.monotonic()
+        if (
+            self._workers_checked_at is None
+            or now - self._workers_checked_at >= self._workers_refresh_interval
+        ):
+            self._n_workers = len(self._client.scheduler_info()["workers"])
+            self._workers_checked_at = now
+
+        return self._n_workers
+
+    def _start(self) -> None:
+        """Start tracking the futures as they complete."""
+        self._completed = as_completed(raise_errors=False)
+
+    def _get_max_futures(self) -> int:
         """
-        del self._futures[future], future
+        Calculate maximum number of futures given the number of workers.
 
-    def _submit_future(self, event: Any) -> Future:
+        Returns
+        -------
+            Maximum number of simultaneous Dask futures.
+        """
+        return self._count_workers() // self._workers_per_event
+
+    def _submit(self, event: Any) -> Future:
         """
         Submit a future to the Dask cluster.
 
@@ -82,60 +186,128 @@ class ConsumerParallel(EventConsumer):
         -------
         Future
         """
-        logger.info(f"Submitting future for: {event}")
+        # Futures are not pure, so that retries of an event
+        # do not share the key of the failed one.
+        future = self._client.submit(self._job_producer.produce_jobs, event, pure=False)
+        self._completed.add(future)
 
-        # Submit the future to the Dask cluster
-        future = self._client.submit(self._job_producer.produce_jobs, event)
+        return future
 
-        # Add the future to the list of futures and to the events dictionary
-        self._futures[future] = event
+    def _submit_batch(self) -> Future:
+        """
+        Submit the pending batch of events to the Dask cluster.
+
+        Returns
+        -------
+        Future
+        """
+        events, self._batch = tuple(self._batch), []
+        logger.info(f"Submitting future for a batch of {len(events)} events.")
+
+        future = self._client.submit(
+            produce_jobs_batch, self._job_producer, list(events), pure=False
+        )
+        self._completed.add(future)
+        self._futures[future] = events
 
         return future
 
+    def _is_batch_due(self) -> bool:
+        """Return whether the pending batch must be submitted."""
+        if not self._batch:
+            return False
+
+        return (
+            len(self._batch) >= self._batch_size
+            or time.monotonic() - self._batch_started >= self._batch_linger
+            or (self._is_sentinel_active() and not self._queue.get_queue_size())
+        )
+
     def _create_futures(self) -> None:
-        """Create futures."""
-        # Get the events from the queue for which a future has not yet been created
-        if self._futures is None:
-            self._futures = OrderedDict()
+        """Create futures, packing the events into batches if enabled."""
+        if self._batch_size <= 1:
+            return super()._create_futures()
+
+        while len(self._futures) < self._max_futures:
+            # Fill the pending batch with the retries due first
+            # and then with the events claimed from the queue
+            while len(self._batch) < self._batch_size:
+                if self._retries and self._retries[0][0] <= time.monotonic():
+                    _, _, event = heapq.heappop(self._retries)
+                    logger.info(
+                        f"Retrying event {event} (attempt {self._attempts[event]})."
+                    )
+                else:
+                    event = self._queue.claim()
+                    if event is None:
+                        break
+
+                if not self._batch:
+                    self._batch_started = time.monotonic()
+                self._batch.append(event)
+
+            if not self._is_batch_due():
+                break
 
-        diff = set(self._queue.queue_list) - set(self._futures.values())
-        for event in diff:
-            if len(self._futures) < self._max_futures:
-                self._submit_future(event)
+            self._submit_batch()
 
-    def _process_succeeded_future(self, future: Future) -> None:
+    def _get_retry_timeout(self) -> float | None:
         """
-        Process a future that has succeeded.
+        Get the time until the next retry or the pending batch is due.
+
+        Returns
+        -------
+            Time in seconds until the next retry or the pending batch is due,
+            or `None` if there are neither retries scheduled nor a batch pending.
+        """
+        timeout = super()._get_retry_timeout()
+        if not self._batch:
+            return timeout
+
+        linger = max(0.0, self._batch_started + self._batch_linger - time.monotonic())
+        return linger if timeout is None else min(timeout, linger)
+
+    def _process_finished_batch(self, future: Future) -> None:
+        """
+        Process a future of a batch of events that has finished.
 
         Parameters
         ----------
         future
-            Future that has succeeded.
+            Future that has finished.
         """
-        event = self._futures[future]
-        logger.info(f"Event consumed: {event}")
-
-        # Remove event from the queue and purge the future
-        self._queue.remove(event)
+        events = self._futures[future]
+        if future.status == "finished":
+            errors = future.result()
+        else:
+            # The whole batch failed, e.g., because the worker died
+            errors = [future.exception()] * len(events)
         self._purge_future(future)
 
-    def _process_failed_future(self, future: Future) -> None:
+        for event, error in zip(events, errors):
+            if error is None:
+                self._process_succeeded_event(event)
+            else:
+                self._process_failed_event(event, error)
+
+    def _get_finished_futures(self, block: bool = False) -> list[Future]:
         """
-        Process a future that has failed.
+        Return the futures that have finished since the last call.
 
         Parameters
         ----------
-        future
-            Future that has failed.
+        block
+            If `True`, blocks until at least one future has finished.
+
+        Returns
+        -------
+            List of finished futures.
         """
-        event = self._futures[future]
-        logger.warning(
-            f"Event {event} finished with an error: {future.exception()}."
-            + " Future will be retried.."
-        )
-        # Wait 1 second before retrying the future
-        time.sleep(1)
-        future.retry()
+        return self._completed.next_batch(block=block)
+
+    def _has_finished_futures(self) -> bool:
+        """Return whether there are finished futures yet to be processed."""
+        return self._completed.has_ready()
 
     def _process_finished_future(self, future: Future) -> None:
         """
@@ -151,59 +323,13 @@ class ConsumerParallel(EventConsumer):
         ValueError
             If the status of the future is not "finished" or "error".
         """
-        if future.status == "finished":
+        if future.status in ["finished", "error"] and self._batch_size > 1:
+            self._process_finished_batch(future)
+        elif future.status == "finished":
             self._process_succeeded_future(future)
         elif future.status == "error":
-            self._process_failed_future(future)
+            self._process_failed_future(future, future.exception())
         elif future.status == "pending":
             pass
         else:
             raise ValueError(f"Invalid future status: {future.status}")
-
-    def _process_futures(self) -> None:
-        """Process futures as they finish."""
-        # Alternative loop to process futures
-        # completed_futures = as_completed(
-        #     self._futures, with_results=True, raise_errors=False
-        # )
-        # for future, result in completed_futures:
-        #     self._process_finished_future(future)
-
-        for future in self._futures.copy():
-            self._process_finished_future(future)
-
-    def _run_event_loop(self, sleep_time: int = 5) -> None:
-        """
-        Run the worker thread.
-
-        Callback function to be used as a target by Thread.
-
-        Parameters
-        ----------
-        sleep_time
-            Sleep time in seconds for which the thread is idle.
-        """
-        while True:
-            if self._queue.get_queue_size():
-                # Calculate maximum number of futures given the
-                # number of workers currently running
-                self._max_futures = (
-                    len(self._client.scheduler_info()["workers"])
-                    // self._workers_per_event
-                )
-
-                # Create futures if there are events in the queue
-                # that have not been 'futurized' yet and if the current number of futures
-                # is less than the maximum number of futures
-                self._create_futures()
-
-                # Process the futures when they are finished
-                self._process_futures()
-
-                time.sleep(sleep_time)
-            elif self._is_sentinel_active():
-                logger.info("The queue is empty and got an end-of-queue sentinel")
-                logger.info("The event consumer is exiting...")
-                break
-            else:
-                time.sleep(sleep_time)
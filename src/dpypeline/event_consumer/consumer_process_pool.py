@@ -0,0 +1,235 @@
+"""ConsumerProcessPool. Acts as an interface between Akita and the ETL pipeline."""
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+
+from .consumer_threaded import ConsumerThreaded
+
+logger = logging.getLogger(__name__)
+
+# Job producer of the worker process, built once by the pool initializer
+_job_producer = None
+
+
+def _init_worker(job_producer: Any) -> None:
+    """
+    Initialize a worker process.
+
+    Parameters
+    ----------
+    job_producer
+        Producer of jobs, unpickled once in the worker process.
+    """
+    global _job_producer
+    _job_producer = job_producer
+
+
+def _produce_jobs(event: Any) -> None:
+    """
+    Produce the jobs triggered by an event in a worker process.
+
+    Notes
+    -----
+    The result of the job producer is discarded, so that it is not pickled
+    back to the consumer. Exceptions are still raised through the future.
+
+    Parameters
+    ----------
+    event
+        Triggering event.
+    """
+    _job_producer.produce_jobs(event)
+
+
+class ConsumerProcessPool(ConsumerThreaded):
+    """
+    ConsumerProcessPool that runs on a thread as a daemon process.
+
+    This event consumer produce futures that are consumed in parallel
+        by a pool of processes in the current node.
+    Each future corresponds to one or multiple jobs.
+
+    Notes
+    -----
+    Suitable for CPU-bound pipelines, which do not scale with threads because
+    of the GIL, when a Dask cluster is not needed. The job producer is sent
+    once to each worker process by the pool initializer, so that only the
+    event is pickled on every submission. When the "forkserver" start method
+    is available, the modules of the task functions are preloaded by the
+    fork server, so that worker processes do not import them again.
+
+    If a worker process dies (e.g., it is killed for running out of memory),
+    the pool breaks and all the events in flight fail with `BrokenProcessPool`.
+    The pool is restarted before the next event is submitted, and those events
+    are run again one at a time before any other event, without counting an
+    attempt. Only an event that breaks the pool while running alone is charged
+    an attempt, so that it is retried or dead-lettered like any other failure,
+    while the events that were in flight beside it are not.
+
+    Attributes
+    ----------
+    _queue
+        Queue where events are placed.
+    _job_producer
+        Producer of jobs.
+    _worker, optional
+        Worker thread that consumes events from the and processes them to produce jobs.
+    _max_workers
+        Maximum number of processes.
+    _start_method
+        Start method of the worker processes.
+    _executor
+        Pool of processes that run the futures.
+    _finished
+        Queue of the futures that have finished.
+    _suspects
+        Events in flight when a worker process died, to be run one at a time.
+    _isolated
+        Future of the suspect event running alone, if any.
+    """
+
+    def __init__(
+        self, max_workers: int = None, *args, start_method: str = None, **kwargs
+    ) -> None:
+        """
+        Initialize the event consumer.
+
+        Parameters
+        ----------
+        max_workers, optional
+            Maximum number of processes, by default the number of CPUs.
+        args
+            Arguments to pass to ConsumerThreaded.__init__.
+        start_method, optional
+            Start method of the worker processes, by default "forkserver"
+            if available and "spawn" otherwise.
+        kwargs
+            Keyword arguments to pass to ConsumerThreaded.__init__.
+        """
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+
+        super().__init__(max_workers, *args, **kwargs)
+
+        if start_method is None:
+            start_method = (
+                "forkserver"
+                if "forkserver" in multiprocessing.get_all_start_methods()
+                else "spawn"
+            )
+
+        self._start_method = start_method
+        self._suspects: deque = deque()
+        self._isolated: Future = None
+
+    def _get_task_modules(self) -> list[str]:
+        """
+        Get the modules of the task functions of the pipeline.
+
+        Returns
+        -------
+            Sorted list of the names of the modules.
+        """
+        modules = set()
+        for job in getattr(self._job_producer, "jobs", []):
+            for task in job.tasks:
+                module = getattr(task.function, "__module__", None)
+                if module is not None and module != "__main__":
+                    modules.add(module)
+
+        return sorted(modules)
+
+    def _start(self) -> None:
+        """Start the pool of processes."""
+        context = multiprocessing.get_context(self._start_method)
+
+        if self._start_method == "forkserver":
+            modules = self._get_task_modules()
+            logger.info(f"Preloading task modules in the fork server: {modules}")
+            context.set_forkserver_preload(modules)
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=self._max_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self._job_producer,),
+        )
+
+    def _submit(self, event: Any) -> Future:
+        """
+        Submit an event to the pool of processes.
+
+        Parameters
+        ----------
+        event
+            Event to be submitted.
+
+        Returns
+        -------
+        Future
+        """
+        try:
+            future = self._executor.submit(_produce_jobs, event)
+        except BrokenProcessPool:
+            # The events in flight have failed with the same error
+            logger.error("A worker process died. Restarting the pool of processes.")
+            self._executor.shutdown(wait=True)
+            self._start()
+            future = self._executor.submit(_produce_jobs, event)
+        future.add_done_callback(self._finished.put)
+
+        return future
+
+    def _create_futures(self) -> None:
+        """Create futures, running the suspect events alone first."""
+        if not self._suspects:
+            super()._create_futures()
+        elif not self._futures:
+            event = self._suspects.popleft()
+            logger.info(f"Running event {event} alone after a worker process died.")
+            self._isolated = self._submit_future(event)
+
+    def _process_failed_future(self, future: Future, error: BaseException) -> None:
+        """
+        Process a future that has failed.
+
+        Notes
+        -----
+        Events that fail with `BrokenProcessPool` while other events were in
+        flight are not charged an attempt, since any of them may have killed
+        the worker process, but become suspects to be run alone.
+
+        Parameters
+        ----------
+        future
+            Future that has failed.
+        error
+            Exception raised by the future.
+        """
+        if future is self._isolated:
+            self._isolated = None
+        elif isinstance(error, BrokenProcessPool):
+            event = self._futures[future]
+            self._purge_future(future)
+            self._suspects.append(event)
+            return
+
+        super()._process_failed_future(future, error)
+
+    def _process_succeeded_future(self, future: Future) -> None:
+        """
+        Process a future that has succeeded.
+
+        Parameters
+        ----------
+        future
+            Future that has succeeded.
+        """
+        if future is self._isolated:
+            self._isolated = None
+
+        super()._process_succeeded_future(future)
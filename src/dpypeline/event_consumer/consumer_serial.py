@@ -1,6 +1,5 @@
 """ConsumerSerial. Acts as an interface between Akita and the ETL pipeline."""
 import logging
-import time
 
 from .core import EventConsumer
 
@@ -38,17 +37,16 @@ class ConsumerSerial(EventConsumer):
         Parameters
         ----------
         sleep_time
-            Sleep time in seconds for which the thread is idle.
+            Maximum time in seconds for which the thread waits for events
+            before checking the sentinel again.
         """
         while True:
-            if self._queue.get_queue_size():
-                event = self._queue.peek()
+            event = self._queue.claim(block=True, timeout=sleep_time)
+            if event is not None:
                 logger.info("-" * 79)
                 self._consume_event(event)
-                self._queue.dequeue()
+                self._queue.ack(event)
             elif self._is_sentinel_active():
                 logger.info("The queue is empty and got an end-of-queue sentinel")
                 logger.info("The event consumer is exiting...")
                 break
-            else:
-                time.sleep(sleep_time)
@@ -0,0 +1,116 @@
+"""ConsumerThreaded. Acts as an interface between Akita and the ETL pipeline."""
+import logging
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from queue import Empty, SimpleQueue
+from typing import Any
+
+from .core import FuturesConsumer
+
+logger = logging.getLogger(__name__)
+
+
+class ConsumerThreaded(FuturesConsumer):
+    """
+    ConsumerThreaded that runs on a thread as a daemon process.
+
+    This event consumer produce futures that are consumed concurrently
+        by a pool of threads in the current process.
+    Each future corresponds to one or multiple jobs.
+
+    Notes
+    -----
+    Suitable for I/O-bound pipelines (e.g., uploads to an object store),
+    for which the GIL is not the bottleneck. Since the threads share the
+    pipeline, its tasks share any resources passed to them, e.g., a single
+    `ObjectStoreS3` instance and its connection pool.
+
+    Attributes
+    ----------
+    _queue
+        Queue where events are placed.
+    _job_producer
+        Producer of jobs.
+    _worker, optional
+        Worker thread that consumes events from the and processes them to produce jobs.
+    _max_workers
+        Maximum number of threads.
+    _executor
+        Pool of threads that run the futures.
+    _finished
+        Queue of the futures that have finished.
+    """
+
+    def __init__(self, max_workers: int = 8, *args, **kwargs) -> None:
+        """
+        Initialize the event consumer.
+
+        Parameters
+        ----------
+        max_workers, optional
+            Maximum number of threads, by default 8.
+        args
+            Arguments to pass to FuturesConsumer.__init__.
+        kwargs
+            Keyword arguments to pass to FuturesConsumer.__init__.
+        """
+        super().__init__(*args, **kwargs)
+
+        self._max_workers = max_workers
+        self._executor: Executor = None
+        self._finished: SimpleQueue = SimpleQueue()
+
+    def _start(self) -> None:
+        """Start the pool of threads."""
+        self._executor = ThreadPoolExecutor(
+            max_workers=self._max_workers, thread_name_prefix="dpypeline"
+        )
+
+    def _shutdown(self) -> None:
+        """Shut down the pool of threads."""
+        self._executor.shutdown(wait=True)
+
+    def _get_max_futures(self) -> int:
+        """Return the maximum number of simultaneous futures."""
+        return self._max_workers
+
+    def _submit(self, event: Any) -> Future:
+        """
+        Submit an event to the pool of threads.
+
+        Parameters
+        ----------
+        event
+            Event to be submitted.
+
+        Returns
+        -------
+        Future
+        """
+        future = self._executor.submit(self._job_producer.produce_jobs, event)
+        future.add_done_callback(self._finished.put)
+
+        return future
+
+    def _get_finished_futures(self, block: bool = False) -> list[Future]:
+        """
+        Return the futures that have finished since the last call.
+
+        Parameters
+        ----------
+        block
+            If `True`, blocks until at least one future has finished.
+
+        Returns
+        -------
+            List of finished futures.
+        """
+        futures = [self._finished.get()] if block else []
+        while True:
+            try:
+                futures.append(self._finished.get_nowait())
+            except Empty:
+                return futures
+
+    def _has_finished_futures(self) -> bool:
+        """Return whether there are finished futures yet to be processed."""
+        return not self._finished.empty()
@@ -1,7 +1,15 @@
 """Event consumer. Acts as an interface between Akita and the ETL pipeline."""
+import heapq
+import logging
+import random
+import time
+from collections import OrderedDict
+from itertools import count
 from threading import Thread
 from typing import Any, Protocol
 
+logger = logging.getLogger(__name__)
+
 
 class JobProducer(Protocol):
     """Job producer interface."""
@@ -24,10 +32,14 @@ class Queue(Protocol):
         """Return the sentinel value."""
         ...
 
-    def dequeue(self) -> Any:
+    def dequeue(self, block: bool = False, timeout: float | None = None) -> Any:
         """Remove and return an event from the queue."""
         ...
 
+    def wait_for_events(self, timeout: float | None = None) -> bool:
+        """Block until there are events in the queue or the sentinel is active."""
+        ...
+
     def peek(self) -> Any:
         """Peek first item in the queue withou removing it."""
         ...
@@ -44,6 +56,22 @@ class Queue(Protocol):
         """Remove an event from the queue."""
         ...
 
+    def claim(self, block: bool = False, timeout: float | None = None) -> Any:
+        """Claim the first event in the queue."""
+        ...
+
+    def ack(self, event: Any) -> bool:
+        """Acknowledge that a leased event has been processed."""
+        ...
+
+    def nack(self, event: Any) -> bool:
+        """Negatively acknowledge a leased event, putting it back in the queue."""
+        ...
+
+    def dead_letter(self, event: Any, attempts: int, error: str) -> bool:
+        """Move a leased event to the dead-letter queue."""
+        ...
+
 
 class EventConsumer:
     """
@@ -128,3 +156,376 @@ class EventConsumer:
             raise RuntimeError(f"Error while running event consumer: {excpt}")
 
         self._worker.join()
+
+
+class FuturesConsumer(EventConsumer):
+    """
+    Base class for event consumers that run events concurrently as futures.
+
+    Events are claimed from the queue while there are free slots and
+    submitted as futures. Events whose future succeeds are acknowledged.
+    Events whose future fails are retried with exponential backoff and
+    jitter and, after the maximum number of retries, moved to the
+    dead-letter queue.
+
+    Attributes
+    ----------
+    _queue
+        Queue where events are placed.
+    _job_producer
+        Producer of jobs.
+    _worker, optional
+        Worker thread that consumes events from the and processes them to produce jobs.
+    _futures
+        Dictionary mapping the running futures to their events.
+    _max_futures
+        Maximum number of simultaneous futures.
+    _poll_interval
+        Maximum time in seconds for which the thread waits for new events
+        while there are free slots and futures running.
+    _max_retries
+        Maximum number of retries of a failed event before it is moved to
+        the dead-letter queue.
+    _retry_backoff
+        Delay in seconds before the first retry of a failed event.
+    _max_retry_backoff
+        Maximum delay in seconds before retrying a failed event.
+    _attempts
+        Number of failed attempts of each event.
+    _retries
+        Heap of the events scheduled to be retried, ordered by due time.
+    """
+
+    def __init__(
+        self,
+        *args,
+        poll_interval: float = 0.1,
+        max_retries: int = 3,
+        retry_backoff: float = 1.0,
+        max_retry_backoff: float = 60.0,
+        **kwargs,
+    ) -> None:
+        """
+        Initialize the event consumer.
+
+        Parameters
+        ----------
+        args
+            Arguments to pass to EventConsumer.__init__.
+        poll_interval, optional
+            Maximum time in seconds for which the thread waits for new events
+            while there are free slots and futures running, by default 0.1.
+        max_retries, optional
+            Maximum number of retries of a failed event before it is moved to
+            the dead-letter queue, by default 3.
+        retry_backoff, optional
+            Delay in seconds before the first retry of a failed event, which is
+            doubled on every further retry, by default 1.
+        max_retry_backoff, optional
+            Maximum delay in seconds before retrying a failed event, by default 60.
+        kwargs
+            Keyword arguments to pass to EventConsumer.__init__.
+        """
+        super().__init__(*args, **kwargs)
+
+        self._poll_interval = poll_interval
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff
+        self._max_retry_backoff = max_retry_backoff
+        self._max_futures: int = None
+        self._futures: OrderedDict[Any, Any] = None
+        self._attempts: dict[Any, int] = {}
+        self._retries: list[tuple[float, int, Any]] = []
+        self._retries_counter = count()
+
+    def _start(self) -> None:
+        """Start the resources used to run the futures."""
+        pass
+
+    def _shutdown(self) -> None:
+        """Shut down the resources used to run the futures."""
+        pass
+
+    def _get_max_futures(self) -> int:
+        """Return the maximum number of simultaneous futures."""
+        raise NotImplementedError("_get_max_futures not implemented.")
+
+    def _submit(self, event: Any) -> Any:
+        """
+        Submit an event to be run as a future.
+
+        Parameters
+        ----------
+        event
+            Event to be submitted.
+
+        Returns
+        -------
+            Future of the jobs produced by the event.
+        """
+        raise NotImplementedError("_submit not implemented.")
+
+    def _get_finished_futures(self, block: bool = False) -> list[Any]:
+        """
+        Return the futures that have finished since the last call.
+
+        Parameters
+        ----------
+        block
+            If `True`, blocks until at least one future has finished.
+
+        Returns
+        -------
+            List of finished futures.
+        """
+        raise NotImplementedError("_get_finished_futures not implemented.")
+
+    def _has_finished_futures(self) -> bool:
+        """Return whether there are finished futures yet to be processed."""
+        raise NotImplementedError("_has_finished_futures not implemented.")
+
+    def _get_future_exception(self, future: Any) -> BaseException | None:
+        """
+        Return the exception raised by a finished future.
+
+        Parameters
+        ----------
+        future
+            Finished future.
+
+        Returns
+        -------
+            Exception raised by the future or `None` if it succeeded.
+        """
+        return future.exception()
+
+    def _purge_future(self, future: Any) -> None:
+        """Purge a future.
+
+        Parameters
+        ----------
+        future
+            Future that has finished.
+        """
+        del self._futures[future], future
+
+    def _submit_future(self, event: Any) -> Any:
+        """
+        Submit a future for an event.
+
+        Parameters
+        ----------
+        event
+            Event to be submitted.
+
+        Returns
+        -------
+            Future of the jobs produced by the event.
+        """
+        logger.info(f"Submitting future for: {event}")
+        future = self._submit(event)
+        self._futures[future] = event
+
+        return future
+
+    def _get_retry_timeout(self) -> float | None:
+        """
+        Get the time until the next retry is due.
+
+        Returns
+        -------
+            Time in seconds until the next retry is due, or `None` if
+            there are no retries scheduled.
+        """
+        if not self._retries:
+            return None
+
+        return max(0.0, self._retries[0][0] - time.monotonic())
+
+    def _create_futures(self) -> None:
+        """Create futures."""
+        # Retry the failed events that are due first
+        while (
+            len(self._futures) < self._max_futures
+            and self._retries
+            and self._retries[0][0] <= time.monotonic()
+        ):
+            _, _, event = heapq.heappop(self._retries)
+            logger.info(f"Retrying event {event} (attempt {self._attempts[event]}).")
+            self._submit_future(event)
+
+        # Claim events from the queue while there are free slots
+        while len(self._futures) < self._max_futures:
+            event = self._queue.claim()
+            if event is None:
+                break
+
+            self._submit_future(event)
+
+    def _process_succeeded_event(self, event: Any) -> None:
+        """
+        Process an event whose jobs have succeeded.
+
+        Parameters
+        ----------
+        event
+            Event that has been consumed.
+        """
+        logger.info(f"Event consumed: {event}")
+
+        # Acknowledge the event
+        self._queue.ack(event)
+        self._attempts.pop(event, None)
+
+    def _process_failed_event(self, event: Any, error: BaseException) -> None:
+        """
+        Process an event whose jobs have failed.
+
+        Parameters
+        ----------
+        event
+            Event that has failed.
+        error
+            Exception raised by the jobs of the event.
+        """
+        attempts = self._attempts.get(event, 0) + 1
+        if attempts > self._max_retries:
+            logger.error(
+                f"Event {event} finished with an error: {error}."
+                + f" Giving up after {attempts} attempts."
+            )
+            self._attempts.pop(event, None)
+            self._queue.dead_letter(event, attempts=attempts, error=repr(error))
+            return
+
+        # Exponential backoff with jitter. The event keeps its lease
+        # until it is retried, so that it is re-delivered after a crash.
+        self._attempts[event] = attempts
+        delay = min(self._max_retry_backoff, self._retry_backoff * 2 ** (attempts - 1))
+        delay = random.uniform(delay / 2, delay)
+        logger.warning(
+            f"Event {event} finished with an error: {error}."
+            + f" Event will be retried in {delay:.1f} seconds."
+        )
+        heapq.heappush(
+            self._retries,
+            (time.monotonic() + delay, next(self._retries_counter), event),
+        )
+
+    def _process_succeeded_future(self, future: Any) -> None:
+        """
+        Process a future that has succeeded.
+
+        Parameters
+        ----------
+        future
+            Future that has succeeded.
+        """
+        event = self._futures[future]
+        self._purge_future(future)
+        self._process_succeeded_event(event)
+
+    def _process_failed_future(self, future: Any, error: BaseException) -> None:
+        """
+        Process a future that has failed.
+
+        Parameters
+        ----------
+        future
+            Future that has failed.
+        error
+            Exception raised by the future.
+        """
+        event = self._futures[future]
+        self._purge_future(future)
+        self._process_failed_event(event, error)
+
+    def _process_finished_future(self, future: Any) -> None:
+        """
+        Process a future that has finished.
+
+        Parameters
+        ----------
+        future
+            Future that has finished.
+        """
+        error = self._get_future_exception(future)
+        if error is None:
+            self._process_succeeded_future(future)
+        else:
+            self._process_failed_future(future, error)
+
+    def _process_futures(self, block: bool = False) -> None:
+        """
+        Process futures as they finish.
+
+        Parameters
+        ----------
+        block
+            If `True`, blocks until at least one future has finished.
+        """
+        for future in self._get_finished_futures(block=block):
+            self._process_finished_future(future)
+
+    def _run_event_loop(self, sleep_time: int = 5) -> None:
+        """
+        Run the worker thread.
+
+        Callback function to be used as a target by Thread.
+
+        Notes
+        -----
+        New futures are submitted as soon as a slot is freed by a finished
+        future or an event is enqueued while there are free slots.
+
+        Parameters
+        ----------
+        sleep_time
+            Maximum time in seconds for which the thread waits for events
+            before checking the sentinel again, when no futures are running.
+        """
+        self._futures = OrderedDict()
+        self._start()
+
+        try:
+            while True:
+                self._max_futures = self._get_max_futures()
+
+                # Create futures while there are retries due or events in the
+                # queue, and free slots
+                self._create_futures()
+                retry_timeout = self._get_retry_timeout()
+
+                if self._futures and (
+                    len(self._futures) >= self._max_futures
+                    or (self._is_sentinel_active() and retry_timeout is None)
+                ):
+                    # Wait until a slot is freed or, if no more events are
+                    # expected, until the remaining futures finish
+                    self._process_futures(block=True)
+                elif self._futures or retry_timeout is not None:
+                    # Wait for new events, finished futures or retries due
+                    timeout = (
+                        self._poll_interval
+                        if retry_timeout is None
+                        else min(self._poll_interval, retry_timeout)
+                    )
+                    if self._has_finished_futures():
+                        pass
+                    elif self._is_sentinel_active() or self._queue.get_queue_size():
+                        time.sleep(timeout)
+                    else:
+                        self._queue.wait_for_events(timeout=timeout)
+                    self._process_futures(block=False)
+                elif self._queue.get_queue_size():
+                    # There are events but no slots to run them yet
+                    time.sleep(self._poll_interval)
+                elif not self._queue.wait_for_events(timeout=sleep_time):
+                    if self._is_sentinel_active():
+                        logger.info(
+                            "The queue is empty and got an end-of-queue sentinel"
+                        )
+                        logger.info("The event consumer is exiting...")
+                        break
+        finally:
+            self._shutdown()
@@ -1,2 +1,2 @@
 """Filesystems package."""
-__all__ = ["object_store"]
+__all__ = ["object_store", "buffer_pool", "upload_state", "remote_inventory"]
@@ -0,0 +1,173 @@
+"""Pool of reusable buffers for uploads."""
+import asyncio
+import io
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+
+class BufferPool:
+    """
+    Fixed-size pool of reusable buffers.
+
+    Buffers are allocated on demand, up to the size of the pool, and reused
+    once released, so that the memory used by the pool is bounded by
+    `n_buffers * buffer_size` however many times buffers are acquired.
+    Acquiring a buffer waits until one is released if all are in use.
+
+    Notes
+    -----
+    The pool is meant to be used from a single event loop.
+
+    Attributes
+    ----------
+    _n_buffers
+        Maximum number of buffers.
+    _buffer_size
+        Size of the buffers (in bytes).
+    _free
+        Buffers that have been released.
+    _available
+        Semaphore that counts the buffers that can be acquired.
+    _n_allocated
+        Number of buffers allocated.
+    """
+
+    def __init__(self, n_buffers: int, buffer_size: int) -> None:
+        """
+        Initialize the pool.
+
+        Parameters
+        ----------
+        n_buffers
+            Maximum number of buffers.
+        buffer_size
+            Size of the buffers (in bytes).
+        """
+        self._n_buffers = n_buffers
+        self._buffer_size = buffer_size
+        self._free: list[bytearray] = []
+        self._available = asyncio.Semaphore(n_buffers)
+        self._n_allocated = 0
+
+    @property
+    def n_allocated(self) -> int:
+        """Return the number of buffers allocated."""
+        return self._n_allocated
+
+    async def acquire(self) -> bytearray:
+        """
+        Acquire a buffer, waiting for one to be released if all are in use.
+
+        Returns
+        -------
+            Buffer of `buffer_size` bytes, whose content is undefined.
+        """
+        await self._available.acquire()
+        if self._free:
+            return self._free.pop()
+
+        self._n_allocated += 1
+        return bytearray(self._buffer_size)
+
+    def release(self, buffer: bytearray) -> None:
+        """
+        Release a buffer back to the pool.
+
+        Parameters
+        ----------
+        buffer
+            Buffer acquired from the pool.
+        """
+        self._free.append(buffer)
+        self._available.release()
+
+    @asynccontextmanager
+    async def buffer(self) -> AsyncIterator[bytearray]:
+        """Acquire a buffer and release it on exit."""
+        buffer = await self.acquire()
+        try:
+            yield buffer
+        finally:
+            self.release(buffer)
+
+
+class BufferReader(io.RawIOBase):
+    """
+    Read-only, seekable file-like view of a buffer.
+
+    Notes
+    -----
+    Used as the body of requests, so that the HTTP client streams the buffer
+    in small blocks rather than copying it whole into its send buffers.
+    Closing the reader releases its view, which memory maps require before
+    they can be closed.
+
+    Attributes
+    ----------
+    _view
+        View of the buffer.
+    _pos
+        Current position.
+    """
+
+    def __init__(self, buffer: bytes | bytearray | memoryview) -> None:
+        """
+        Initialize the reader.
+
+        Parameters
+        ----------
+        buffer
+            Buffer to read from, which is not copied.
+        """
+        super().__init__()
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def __len__(self) -> int:
+        """Return the length of the buffer."""
+        return len(self._view)
+
+    def close(self) -> None:
+        """Close the reader and release its view of the buffer."""
+        super().close()
+        self._view.release()
+
+    def readable(self) -> bool:
+        """Return whether the reader is readable."""
+        return True
+
+    def seekable(self) -> bool:
+        """Return whether the reader is seekable."""
+        return True
+
+    def tell(self) -> int:
+        """Return the current position."""
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        """Change the current position."""
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+
+        return self._pos
+
+    def readinto(self, b: Any) -> int:
+        """Read bytes into a pre-allocated, writable buffer."""
+        view = memoryview(b).cast("B")
+        data = self._view[self._pos : self._pos + len(view)]
+        view[: len(data)] = data
+        self._pos += len(data)
+
+        return len(data)
+
+    def read(self, size: int = -1) -> bytes:
+        """Read up to `size` bytes, or until the end if `size` is negative."""
+        end = len(self._view) if size is None or size < 0 else self._pos + size
+        data = self._view[self._pos : end].tobytes()
+        self._pos += len(data)
+
+        return data
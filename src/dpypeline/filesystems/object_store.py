@@ -1,13 +1,25 @@
 """S3 object store class."""
+import asyncio
+import hashlib
 import io
 import json
 import logging
+import mmap
 import os
-from typing import IO
+import stat
+import time
+from contextlib import asynccontextmanager
+from threading import Lock
+from typing import IO, Any, AsyncContextManager, AsyncIterator, Callable
 
 import fsspec
 import numpy as np
 import s3fs
+from fsspec.asyn import sync
+
+from .buffer_pool import BufferPool, BufferReader
+from .remote_inventory import RemoteInventory, RemoteObject
+from .upload_state import UploadStateStore
 
 
 class ObjectStoreS3(s3fs.S3FileSystem):
@@ -20,6 +32,15 @@ class ObjectStoreS3(s3fs.S3FileSystem):
         _description_
     """
 
+    # Limits of the multipart upload API of S3
+    _min_part_size: int = 5 * 2**20
+    _max_part_size: int = 5 * 2**30
+    _max_parts: int = 10000
+    # Size of the parts of files too large to be uploaded at once
+    _default_part_size: int = 64 * 2**20
+    _upload_states_dir_suffix: str = "uploads"
+    _remote_inventory_db_suffix: str = "remote_inventory.db"
+
     def __init__(
         self,
         anon: bool = False,
@@ -28,6 +49,11 @@ class ObjectStoreS3(s3fs.S3FileSystem):
         key: str | None = None,
         endpoint_url: str | None = None,
         *fs_args,
+        resumable: bool = False,
+        stale_upload_age: float | None = 7 * 24 * 3600,
+        sync: bool = False,
+        inventory_max_age: float = 3600,
+        memory_map: bool = True,
         **fs_kwargs,
     ) -> None:
         """
@@ -45,8 +71,50 @@ class ObjectStoreS3(s3fs.S3FileSystem):
             _description_, by default None
         endpoint_url, optional
             _description_, by default None
+        resumable, optional
+            If `True`, the progress of multipart uploads is persisted in
+            `CACHE_DIR`, so that an interrupted upload of a file resumes from
+            the parts missing when the file is written again, by default False.
+        stale_upload_age, optional
+            Age (in seconds) after which the multipart uploads left in progress
+            by the store are aborted, by default 7 days. Stale uploads are
+            aborted when a file is first written to a bucket if `resumable` is
+            True, since only then are their upload ids persisted. If `None`,
+            they are never aborted.
+        sync, optional
+            If `True`, files already present in the object store with the same
+            size and ETag are not uploaded again, by default False. The objects
+            present are looked up in an inventory cached in `CACHE_DIR`, built
+            from a listing of the prefix of the objects written.
+        inventory_max_age, optional
+            Age (in seconds) after which the listing of a prefix cached in the
+            inventory is refreshed, by default 3600.
+        memory_map, optional
+            If `True` (default), regular files are memory-mapped and their
+            parts are sent without being copied. If `False`, files are always
+            read into buffers, which is safer for files that other processes
+            may truncate while they are uploaded.
         """
         self._anon = anon
+        self._memory_map = memory_map
+        self._stale_upload_age = stale_upload_age
+        self._cleaned_buckets: set[str] = set()
+        self._inventory_max_age = inventory_max_age
+        self._upload_states: UploadStateStore | None = None
+        self._inventory: RemoteInventory | None = None
+        if resumable or sync:
+            assert (
+                os.getenv("CACHE_DIR") is not None
+            ), "CACHE_DIR environmental variable is not set."
+        if resumable:
+            self._upload_states = UploadStateStore(
+                os.path.join(os.getenv("CACHE_DIR"), self._upload_states_dir_suffix)
+            )
+        if sync:
+            self._inventory = RemoteInventory(
+                os.path.join(os.getenv("CACHE_DIR"), self._remote_inventory_db_suffix)
+            )
+
         logging.info("-" * 79)
         if store_credentials_json is None:
             logging.info(
@@ -191,10 +259,32 @@ class ObjectStoreS3(s3fs.S3FileSystem):
         file_name: str,
         chunk_size: int = -1,
         parallel: bool = False,
+        max_concurrency: int = 8,
     ) -> None:
         """
         Write to a bucket of the object store.
 
+        Notes
+        -----
+        Files of more than one chunk are uploaded with a multipart upload,
+        in which each chunk is uploaded as a part. Chunks are enlarged to
+        the minimum part size of S3 (5 MiB) and, for very large files, so
+        that there are at most 10000 parts. The parts are read into a pool
+        of reusable buffers, one per part in flight, so that the peak memory
+        used is about `max_concurrency * chunk_size` whatever the file size.
+
+        If the store is `resumable`, the upload id and the parts uploaded are
+        persisted, and an interrupted upload is not aborted, so that writing
+        the same, unmodified file again only uploads the missing parts.
+
+        If the store is in `sync` mode, the file is not uploaded if an object
+        of the same size and ETag is already present. The ETag of the file is
+        computed as S3 does for uploads in parts of `chunk_size`, i.e., the MD5
+        of the file or, for multipart uploads, the MD5 of the MD5s of the parts
+        followed by the number of parts, so that objects uploaded with other
+        part sizes, or whose ETag is not an MD5 (e.g., encrypted with SSE-KMS),
+        are uploaded again.
+
         Parameters
         ----------
         path
@@ -206,14 +296,73 @@ class ObjectStoreS3(s3fs.S3FileSystem):
             Name that will be used to identify the file in the bucket.
         chunk_size
             Size of the chunk (in bytes) to read/write at once.
-            If the chunk size is -1, the file will be read/written at once.
+            If the chunk size is -1, the file will be read/written at once,
+            unless it exceeds the maximum part size of S3 (5 GiB), in which
+            case it is uploaded in chunks of 64 MiB.
         parallel
             Flag to enable parallel writing (True) or not (False).
+        max_concurrency, optional
+            Maximum number of parts in flight if `parallel` is True,
+            by default 8.
+        """
+        prepared = self._prepare_write(path, bucket, file_name, chunk_size)
+        if prepared is None:
+            return
+
+        # write the file to the bucket
+        dest_path, file_size, chks = prepared
+        etag = self._write_to_bucket(
+            path, dest_path, chks, parallel, max_concurrency=max_concurrency
+        )
+        if self._inventory is not None:
+            self._inventory.put(dest_path, file_size, etag)
+
+    def _prepare_write(
+        self,
+        path: str | os.PathLike | IO,
+        bucket: str,
+        file_name: str,
+        chunk_size: int,
+    ) -> tuple[str, int, dict] | None:
+        """
+        Prepare the write of a file to a bucket of the object store.
+
+        Notes
+        -----
+        Shared by `write_file_to_bucket` and `write_file_to_bucket_async`, so
+        that both clean up stale uploads of resumable stores, split the file
+        into the same parts and, in `sync` mode, skip unchanged files.
+
+        Parameters
+        ----------
+        path
+            Absolute or relative filepath of the file to be written to the object store,
+            or file-like object to be written to the object store.
+        bucket
+            Name of the bucket to place the file in.
+        file_name
+            Name that will be used to identify the file in the bucket.
+        chunk_size
+            Size of the chunk (in bytes) to read/write at once, or -1.
+
+        Returns
+        -------
+            Path of the object, size of the file and chunk offsets and lengths,
+            or `None` if the file is already up to date in the object store.
         """
         assert (
             bucket.split(os.path.sep, 1)[0] in self.get_bucket_list()
         ), f'Bucket "{bucket}" does not exist.'
 
+        bucket_name = bucket.split(os.path.sep, 1)[0]
+        if (
+            self._upload_states is not None
+            and self._stale_upload_age is not None
+            and bucket_name not in self._cleaned_buckets
+        ):
+            self.abort_stale_uploads(bucket_name, self._stale_upload_age)
+            self._cleaned_buckets.add(bucket_name)
+
         if isinstance(path, str) or isinstance(path, os.PathLike):
             assert os.path.isfile(path), f'"{path}" is not a file.'
             file_size = os.path.getsize(path)
@@ -222,15 +371,131 @@ class ObjectStoreS3(s3fs.S3FileSystem):
         else:
             raise ValueError(f'"{path}" is not file-like, path-like or a string.')
 
-        # create the empty file
         dest_path = os.path.join(bucket, file_name)
-        self.open(dest_path, mode="wb", s3=dict(profile="default")).close()
 
         # create the chunks offsets and lengths
+        chunk_size = self._get_part_size(file_size, chunk_size)
         chks = self._create_chunks_offsets_lengths(file_size, chunk_size)
 
-        # write the file to the bucket
-        self._write_to_bucket(path, dest_path, chks, parallel)
+        if self._inventory is not None and self._is_unchanged(
+            path, dest_path, file_size, chks
+        ):
+            logging.info(f"Skipping {dest_path}, which is already up to date.")
+            return None
+
+        return dest_path, file_size, chks
+
+    def _get_part_size(self, file_size: int, chunk_size: int) -> int:
+        """
+        Get the size of the parts of a multipart upload.
+
+        Parameters
+        ----------
+        file_size
+            Size of the file (in bytes).
+        chunk_size
+            Requested size of the chunks (in bytes), or -1 for a single chunk.
+
+        Returns
+        -------
+            Size of the chunks (in bytes), within the limits of S3.
+        """
+        if chunk_size == -1:
+            if file_size <= self._max_part_size:
+                return max(file_size, 1)
+            chunk_size = self._default_part_size
+
+        if chunk_size >= file_size:
+            return max(file_size, 1)
+
+        part_size = max(
+            chunk_size, self._min_part_size, -(-file_size // self._max_parts)
+        )
+        if part_size != chunk_size:
+            logging.info(
+                f"Chunk size of {chunk_size} bytes enlarged to {part_size} "
+                + "bytes to comply with the limits of S3 multipart uploads."
+            )
+
+        return part_size
+
+    async def _run_in_loop(self, coroutine: Any) -> Any:
+        """
+        Await a coroutine of the file system from any event loop.
+
+        Notes
+        -----
+        The coroutines of the file system are bound to its own event loop,
+        which runs in the fsspec IO thread, so they are scheduled on it and
+        awaited from the calling loop without blocking it.
+
+        Parameters
+        ----------
+        coroutine
+            Coroutine of the file system, e.g., `self._put_file(...)`.
+
+        Returns
+        -------
+            Result of the coroutine.
+        """
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        )
+
+    async def write_file_to_bucket_async(
+        self,
+        path: str | os.PathLike | IO,
+        bucket: str,
+        file_name: str,
+        chunk_size: int = -1,
+        max_concurrency: int = 8,
+    ) -> None:
+        """
+        Write to a bucket of the object store asynchronously.
+
+        Notes
+        -----
+        The file is uploaded as by `write_file_to_bucket`, honouring the
+        `sync` and `resumable` modes of the store, but the upload runs on the
+        event loop of the file system and is awaited without blocking the
+        calling loop, so that many uploads can be in flight from a single
+        event loop (e.g., from `AsyncConsumer`). The blocking preparation of
+        the upload (e.g., computing the ETag of the file) runs in a thread.
+
+        Parameters
+        ----------
+        path
+            Absolute or relative filepath of the file to be written to the object store,
+            or file-like object to be written to the object store.
+        bucket
+            Name of the bucket to place the file in.
+        file_name
+            Name that will be used to identify the file in the bucket.
+        chunk_size, optional
+            Size of the chunk (in bytes) to read/write at once, by default -1
+            (see `write_file_to_bucket`).
+        max_concurrency, optional
+            Maximum number of parts in flight, by default 8.
+        """
+        prepared = await asyncio.to_thread(
+            self._prepare_write, path, bucket, file_name, chunk_size
+        )
+        if prepared is None:
+            return
+
+        dest_path, file_size, chks = prepared
+        f = await asyncio.to_thread(self.__open, path, "rb")
+        try:
+            etag = await self._run_in_loop(
+                self._upload(f, dest_path, chks, max_concurrency)
+            )
+        finally:
+            # File-like objects are left open for the caller
+            if f is not path:
+                f.close()
+
+        if self._inventory is not None:
+            await asyncio.to_thread(self._inventory.put, dest_path, file_size, etag)
 
     def _write_to_bucket(
         self,
@@ -238,7 +503,8 @@ class ObjectStoreS3(s3fs.S3FileSystem):
         dest_path: str,
         chunks_offsets_lengths: dict,
         parallel: bool,
-    ) -> None:
+        max_concurrency: int = 8,
+    ) -> str:
         """
         Write to a bucket of the object store.
 
@@ -254,50 +520,651 @@ class ObjectStoreS3(s3fs.S3FileSystem):
             of the file to be written to the object store.
         parallel
             Flag to enable parallel writing (True) or not (False).
+        max_concurrency, optional
+            Maximum number of parts in flight if `parallel` is True,
+            by default 8.
+
+        Returns
+        -------
+            ETag of the object written.
+        """
+        f = self.__open(path, mode="rb")
+        try:
+            return sync(
+                self.loop,
+                self._upload,
+                f,
+                dest_path,
+                chunks_offsets_lengths,
+                max_concurrency if parallel else 1,
+            )
+        finally:
+            # File-like objects are left open for the caller
+            if f is not path:
+                f.close()
+
+    async def _upload(
+        self,
+        f: IO,
+        dest_path: str,
+        chunks_offsets_lengths: dict,
+        max_concurrency: int,
+    ) -> str:
         """
-        n_chunks = len(chunks_offsets_lengths)
-
-        # Arguments to be fed to the map
-        multi_part_files = [f"{dest_path}.part{i}" for i in range(n_chunks)]
-        chks_offsets = [
-            chunks_offsets_lengths[chk]["offset"] for chk in chunks_offsets_lengths
-        ]
-        chks_lengths = [
-            chunks_offsets_lengths[chk]["length"] for chk in chunks_offsets_lengths
-        ]
-        paths = [path] * n_chunks
-
-        if parallel:
-            import dask
-
-            dask.compute(
-                list(
-                    map(
-                        dask.delayed(self._write_chunk),
-                        paths,
-                        multi_part_files,
-                        chks_offsets,
-                        chks_lengths,
+        Upload a file, with a multipart upload if it has several chunks.
+
+        Notes
+        -----
+        Regular files are memory-mapped once and the parts are sent as views
+        of the map, so that they are not copied before the HTTP client reads
+        them. Other file-like objects are read into a pool of buffers. Since
+        accessing the map of a truncated file raises SIGBUS, the size and
+        modification time of the file are checked before each part is sent,
+        and once the file has changed the remaining parts are read into
+        buffers instead, which fails cleanly if the file is too short.
+
+        Parameters
+        ----------
+        f
+            File-like object to be written to the object store.
+        dest_path
+            Path of the object in the object store.
+        chunks_offsets_lengths
+            Dictionary containing the chunk offsets and lengths
+            of the file to be written to the object store.
+        max_concurrency
+            Maximum number of parts in flight.
+
+        Returns
+        -------
+            ETag of the object written.
+        """
+        bucket, key, _ = self.split_path(dest_path)
+        chunks = list(chunks_offsets_lengths.values())
+        n_workers = max(1, min(max_concurrency, len(chunks)))
+
+        # Parts of regular files are sent straight from the map, while other
+        # files are read into a pool of buffers, so that at most one part per
+        # worker is held in memory
+        mapping = self._map_file(f)
+        mapped_file = mapping[0] if mapping is not None else None
+        lock = Lock()
+        pool: BufferPool | None = None
+
+        @asynccontextmanager
+        async def read_part(chunk: dict) -> AsyncIterator[BufferReader]:
+            nonlocal mapping, pool
+            offset, length = chunk["offset"], chunk["length"]
+            if mapping is not None and self._has_changed(f, mapping[1]):
+                logging.warning(
+                    f"{dest_path} changed while uploaded, "
+                    + "reading the remaining parts into buffers."
+                )
+                mapping = None
+
+            if mapping is not None:
+                mapped = mapping[0]
+                if offset + length > len(mapped):
+                    raise EOFError(
+                        f"File ended at offset {len(mapped)} "
+                        + f"while reading a chunk of {length} bytes."
+                    )
+                with memoryview(mapped)[offset : offset + length] as view:
+                    with BufferReader(view) as body:
+                        yield body
+            else:
+                if pool is None:
+                    pool = BufferPool(
+                        n_workers, max((c["length"] for c in chunks), default=0)
                     )
+                async with pool.buffer() as buffer:
+                    with memoryview(buffer)[:length] as view:
+                        await asyncio.to_thread(self._read_chunk, f, lock, view, offset)
+                        with BufferReader(view) as body:
+                            yield body
+
+        try:
+            if len(chunks) <= 1:
+                if chunks:
+                    async with read_part(chunks[0]) as body:
+                        out = await self._call_s3(
+                            "put_object", Bucket=bucket, Key=key, Body=body
+                        )
+                else:
+                    out = await self._call_s3(
+                        "put_object", Bucket=bucket, Key=key, Body=b""
+                    )
+                return out["ETag"]
+            else:
+                return await self._upload_parts(
+                    bucket,
+                    key,
+                    chunks,
+                    n_workers,
+                    read_part,
+                    self._get_fingerprint(f, chunks),
                 )
+        finally:
+            self.invalidate_cache(dest_path)
+            if mapped_file is not None:
+                mapped_file.close()
+
+    async def _upload_parts(
+        self,
+        bucket: str,
+        key: str,
+        chunks: list[dict],
+        n_workers: int,
+        read_part: Callable[[dict], AsyncContextManager[BufferReader]],
+        fingerprint: dict[str, int] | None = None,
+    ) -> str:
+        """
+        Upload the chunks of a file as the parts of a multipart upload.
+
+        Parameters
+        ----------
+        bucket
+            Name of the bucket.
+        key
+            Key of the object.
+        chunks
+            Offsets and lengths of the chunks, in order.
+        n_workers
+            Number of parts in flight.
+        read_part
+            Function that returns a context manager that reads a chunk as the
+            body of a request.
+        fingerprint, optional
+            Size, modification time, inode and part size of the file, which identify
+            the file whose upload can be resumed. If `None` (default), or if the
+            store is not resumable, the upload is aborted if it fails.
+
+        Returns
+        -------
+            ETag of the object written.
+        """
+        dest_path = f"{bucket}/{key}"
+        states = self._upload_states if fingerprint is not None else None
+
+        upload_id: str | None = None
+        parts: dict[int, str] = {}
+        if states is not None:
+            upload_id, parts = await self._resume_upload(dest_path, fingerprint, chunks)
+        if upload_id is None:
+            mpu = await self._call_s3("create_multipart_upload", Bucket=bucket, Key=key)
+            upload_id = mpu["UploadId"]
+            if states is not None:
+                states.start(dest_path, upload_id, fingerprint)
+
+        # Each worker uploads the next missing part not taken by the others
+        pending = (
+            (part_number, chunk)
+            for part_number, chunk in enumerate(chunks, start=1)
+            if part_number not in parts
+        )
+
+        async def upload_parts() -> None:
+            for part_number, chunk in pending:
+                async with read_part(chunk) as body:
+                    out = await self._call_s3(
+                        "upload_part",
+                        Bucket=bucket,
+                        Key=key,
+                        UploadId=upload_id,
+                        PartNumber=part_number,
+                        Body=body,
+                    )
+                parts[part_number] = out["ETag"]
+                if states is not None:
+                    states.add_part(dest_path, part_number, out["ETag"])
+
+        workers = [asyncio.ensure_future(upload_parts()) for _ in range(n_workers)]
+        try:
+            await asyncio.gather(*workers)
+            out = await self._call_s3(
+                "complete_multipart_upload",
+                Bucket=bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={
+                    "Parts": [
+                        {"PartNumber": part_number, "ETag": parts[part_number]}
+                        for part_number in sorted(parts)
+                    ]
+                },
             )
-        else:
-            list(
-                map(
-                    self._write_chunk,
-                    paths,
-                    multi_part_files,
-                    chks_offsets,
-                    chks_lengths,
+        except BaseException:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+            if states is not None:
+                logging.warning(
+                    f"Interrupted the multipart upload of {dest_path} with "
+                    + f"{len(parts)} of {len(chunks)} parts uploaded, "
+                    + "which will be resumed when the file is written again."
+                )
+            else:
+                logging.warning(f"Aborting the multipart upload of {dest_path}.")
+                await self._call_s3(
+                    "abort_multipart_upload",
+                    Bucket=bucket,
+                    Key=key,
+                    UploadId=upload_id,
+                )
+            raise
+
+        if states is not None:
+            states.remove(dest_path)
+
+        return out["ETag"]
+
+    async def _resume_upload(
+        self, dest_path: str, fingerprint: dict[str, int], chunks: list[dict]
+    ) -> tuple[str | None, dict[int, str]]:
+        """
+        Find the parts of an interrupted upload of a file that can be reused.
+
+        Notes
+        -----
+        The parts recorded are checked against those listed by the object store,
+        so that parts whose upload was not recorded before the interruption are
+        reused, and parts that are missing or differ are uploaded again.
+
+        Parameters
+        ----------
+        dest_path
+            Path of the object in the object store.
+        fingerprint
+            Size, modification time, inode and part size of the file.
+        chunks
+            Offsets and lengths of the chunks, in order.
+
+        Returns
+        -------
+            Identifier of the upload, or `None` if there is no upload of the same
+            file to resume, and dictionary mapping the numbers of the parts that
+            can be reused to their ETags.
+        """
+        record = self._upload_states.get(dest_path)
+        if record is None:
+            return None, {}
+
+        bucket, key, _ = self.split_path(dest_path)
+        if record.fingerprint != fingerprint:
+            logging.info(
+                f"The file uploaded to {dest_path} has changed since the upload "
+                + f"{record.upload_id} was interrupted. Starting a new upload."
+            )
+            await self._abort_upload(bucket, key, record.upload_id)
+            self._upload_states.remove(dest_path)
+            return None, {}
+
+        try:
+            listed = await self._list_parts(bucket, key, record.upload_id)
+        except FileNotFoundError:
+            logging.info(
+                f"The upload {record.upload_id} of {dest_path} no longer exists. "
+                + "Starting a new upload."
+            )
+            self._upload_states.remove(dest_path)
+            return None, {}
+
+        parts = {
+            part_number: etag
+            for part_number, (etag, size) in listed.items()
+            if part_number <= len(chunks)
+            and size == chunks[part_number - 1]["length"]
+            and record.parts.get(part_number, etag) == etag
+        }
+        logging.info(
+            f"Resuming the upload {record.upload_id} of {dest_path} with "
+            + f"{len(parts)} of {len(chunks)} parts already uploaded."
+        )
+
+        return record.upload_id, parts
+
+    async def _list_parts(
+        self, bucket: str, key: str, upload_id: str
+    ) -> dict[int, tuple[str, int]]:
+        """
+        List the parts uploaded in a multipart upload.
+
+        Parameters
+        ----------
+        bucket
+            Name of the bucket.
+        key
+            Key of the object.
+        upload_id
+            Identifier of the multipart upload.
+
+        Returns
+        -------
+            Dictionary mapping the numbers of the parts to their ETags and sizes.
+        """
+        parts: dict[int, tuple[str, int]] = {}
+        marker: dict[str, Any] = {}
+        while True:
+            out = await self._call_s3(
+                "list_parts", Bucket=bucket, Key=key, UploadId=upload_id, **marker
+            )
+            for part in out.get("Parts", []):
+                parts[part["PartNumber"]] = (part["ETag"], part["Size"])
+            if not out.get("IsTruncated"):
+                return parts
+            marker = {"PartNumberMarker": out["NextPartNumberMarker"]}
+
+    async def _abort_upload(self, bucket: str, key: str, upload_id: str) -> None:
+        """Abort a multipart upload, ignoring uploads that no longer exist."""
+        try:
+            await self._call_s3(
+                "abort_multipart_upload", Bucket=bucket, Key=key, UploadId=upload_id
+            )
+        except FileNotFoundError:
+            pass
+
+    def abort_stale_uploads(self, bucket: str, max_age: float) -> int:
+        """
+        Abort the multipart uploads of a bucket started too long ago.
+
+        Notes
+        -----
+        The parts of multipart uploads that are neither completed nor aborted
+        (e.g., because the process was killed) are kept, and billed, by the
+        object store until the upload is aborted. Only the uploads whose state
+        is persisted by this store (i.e., if it is `resumable`) are aborted,
+        so that the uploads of other clients of the bucket are left alone, and
+        their persisted states are removed.
+
+        Parameters
+        ----------
+        bucket
+            Name of the bucket.
+        max_age
+            Age (in seconds) after which uploads in progress are aborted.
+
+        Returns
+        -------
+            Number of uploads aborted.
+        """
+        return sync(self.loop, self._abort_stale_uploads, bucket, max_age)
+
+    async def _abort_stale_uploads(self, bucket: str, max_age: float) -> int:
+        """Abort the multipart uploads of a bucket started too long ago."""
+        if self._upload_states is None:
+            return 0
+
+        records = self._upload_states.remove_stale(max_age, prefix=f"{bucket}/")
+        for record in records:
+            _, key, _ = self.split_path(record.dest_path)
+            logging.info(
+                f"Aborting the stale multipart upload {record.upload_id} "
+                + f"of {record.dest_path}."
+            )
+            await self._abort_upload(bucket, key, record.upload_id)
+
+        return len(records)
+
+    def _is_unchanged(
+        self,
+        path: str | os.PathLike | IO,
+        dest_path: str,
+        file_size: int,
+        chunks_offsets_lengths: dict,
+    ) -> bool:
+        """
+        Check whether an object with the size and ETag of a file is present.
+
+        Notes
+        -----
+        The ETag of the file is only computed if an object of the same size
+        is present, and is cached for files backed by a file descriptor.
+
+        Parameters
+        ----------
+        path
+            Absolute or relative filepath of the file to be written to the object store,
+            or file-like object to be written to the object store.
+        dest_path
+            Path of the object in the object store.
+        file_size
+            Size of the file (in bytes).
+        chunks_offsets_lengths
+            Dictionary containing the chunk offsets and lengths
+            of the file to be written to the object store.
+
+        Returns
+        -------
+            Whether the object is already up to date.
+        """
+        remote = self._get_remote_object(dest_path)
+        if remote is None or remote.size != file_size:
+            return False
+
+        chunks = list(chunks_offsets_lengths.values())
+        f = self.__open(path, mode="rb")
+        try:
+            # Only the ETags of files with a path and a fingerprint are cached
+            fingerprint = self._get_fingerprint(f, chunks)
+            name = getattr(f, "name", None)
+            cached = fingerprint is not None and isinstance(name, str)
+            etag = None
+            if cached:
+                etag = self._inventory.get_local_etag(
+                    os.path.realpath(name), fingerprint
                 )
+            if etag is None:
+                etag = self._compute_etag(f, chunks)
+                if cached:
+                    self._inventory.put_local_etag(
+                        os.path.realpath(name), fingerprint, etag
+                    )
+        finally:
+            if f is not path:
+                f.close()
+
+        return remote.etag.strip('"') == etag
+
+    def _get_remote_object(self, dest_path: str) -> RemoteObject | None:
+        """
+        Get the size and ETag of an object from the inventory.
+
+        Notes
+        -----
+        The objects directly under the prefix of the object are listed if the
+        prefix has not been listed within `inventory_max_age` seconds.
+
+        Parameters
+        ----------
+        dest_path
+            Path of the object in the object store.
+
+        Returns
+        -------
+            Size and ETag of the object, or `None` if it is not present.
+        """
+        bucket, key, _ = self.split_path(dest_path)
+        prefix = key.rsplit("/", 1)[0] + "/" if "/" in key else ""
+
+        listed_at = self._inventory.listed_at(f"{bucket}/{prefix}")
+        if listed_at is None or time.time() - listed_at > self._inventory_max_age:
+            objects = sync(self.loop, self._list_prefix, bucket, prefix)
+            self._inventory.replace_prefix(f"{bucket}/{prefix}", objects)
+            logging.info(f"Listed {len(objects)} objects in {bucket}/{prefix}.")
+
+        return self._inventory.get(f"{bucket}/{key}")
+
+    async def _list_prefix(
+        self, bucket: str, prefix: str
+    ) -> list[tuple[str, int, str]]:
+        """
+        List the objects directly under a prefix.
+
+        Parameters
+        ----------
+        bucket
+            Name of the bucket.
+        prefix
+            Prefix of the objects, empty or ending with a separator.
+
+        Returns
+        -------
+            Paths, sizes and ETags of the objects.
+        """
+        objects: list[tuple[str, int, str]] = []
+        token: dict[str, Any] = {}
+        while True:
+            out = await self._call_s3(
+                "list_objects_v2", Bucket=bucket, Prefix=prefix, Delimiter="/", **token
             )
+            for obj in out.get("Contents", []):
+                objects.append((f"{bucket}/{obj['Key']}", obj["Size"], obj["ETag"]))
+            if not out.get("IsTruncated"):
+                return objects
+            token = {"ContinuationToken": out["NextContinuationToken"]}
+
+    def _compute_etag(self, f: IO, chunks: list[dict]) -> str:
+        """
+        Compute the ETag of a file as S3 does for an upload in chunks.
 
-        if n_chunks > 1:
-            # Remove any partial uploads in the bucket associated with the file
-            # Create single S3 file from list of S3 files
-            self.merge(dest_path, multi_part_files)
-            # Remove any partial uploads in the bucket associated with the file
-            self.rm(multi_part_files)
+        Parameters
+        ----------
+        f
+            File to be uploaded.
+        chunks
+            Offsets and lengths of the chunks, in order.
+
+        Returns
+        -------
+            MD5 of the file if it has at most one chunk, or else the MD5 of the
+            MD5s of the chunks followed by the number of chunks.
+        """
+        digests = []
+        mapping = self._map_file(f)
+        try:
+            for chunk in chunks:
+                offset, length = chunk["offset"], chunk["length"]
+                md5 = hashlib.md5(usedforsecurity=False)
+                if (
+                    mapping is not None
+                    and offset + length <= len(mapping[0])
+                    and not self._has_changed(f, mapping[1])
+                ):
+                    with memoryview(mapping[0])[offset : offset + length] as view:
+                        md5.update(view)
+                else:
+                    f.seek(offset, 0)
+                    while length > 0:
+                        data = f.read(min(length, 8 * 2**20))
+                        if not data:
+                            raise EOFError(f"File ended at offset {f.tell()}.")
+                        md5.update(data)
+                        length -= len(data)
+                digests.append(md5)
+        finally:
+            if mapping is not None:
+                mapping[0].close()
+
+        if len(digests) <= 1:
+            return (
+                digests[0] if digests else hashlib.md5(usedforsecurity=False)
+            ).hexdigest()
+
+        etag = hashlib.md5(
+            b"".join(md5.digest() for md5 in digests), usedforsecurity=False
+        )
+        return f"{etag.hexdigest()}-{len(digests)}"
+
+    @staticmethod
+    def _get_fingerprint(f: IO, chunks: list[dict]) -> dict[str, int] | None:
+        """
+        Get the fingerprint of a file whose upload can be resumed.
+
+        Parameters
+        ----------
+        f
+            File to be uploaded.
+        chunks
+            Offsets and lengths of the chunks, in order.
+
+        Returns
+        -------
+            Size and modification time of the file and size of the parts, or
+            `None` if the file is not backed by a file descriptor, in which case
+            it cannot be identified and its upload is not resumable.
+        """
+        try:
+            st = os.fstat(f.fileno())
+        except (AttributeError, OSError, ValueError):
+            return None
+
+        return {
+            "size": sum(chunk["length"] for chunk in chunks),
+            "mtime_ns": st.st_mtime_ns,
+            "ino": st.st_ino,
+            "part_size": chunks[0]["length"] if chunks else 0,
+        }
+
+    def _map_file(self, f: IO) -> tuple[mmap.mmap, os.stat_result] | None:
+        """
+        Memory-map an open file for reading.
+
+        Notes
+        -----
+        Only regular files opened in binary mode are mapped, since the
+        descriptor of other file-like objects (e.g., compressed streams)
+        may not hold the bytes they read. Accessing the map of a file
+        truncated by another process raises SIGBUS and kills the uploader,
+        so the readers of the map check the file with `_has_changed` before
+        each access, and files are never mapped if `memory_map` is `False`.
+
+        Parameters
+        ----------
+        f
+            File to map.
+
+        Returns
+        -------
+            Memory map of the whole file and the stat of the file when mapped,
+            or `None` if the file cannot be mapped, e.g., if it is empty, not
+            backed by a file or not a regular file.
+        """
+        if not self._memory_map or not isinstance(getattr(f, "raw", f), io.FileIO):
+            return None
+
+        try:
+            st = os.fstat(f.fileno())
+            if not stat.S_ISREG(st.st_mode):
+                return None
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+            # The parts are mostly read in order
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+
+        return mapped, st
+
+    @staticmethod
+    def _has_changed(f: IO, st: os.stat_result) -> bool:
+        """
+        Return whether an open file has changed since it was stat'ed.
+
+        Parameters
+        ----------
+        f
+            Open file.
+        st
+            Previous stat of the file.
+
+        Returns
+        -------
+            Whether the size or the modification time of the file differ.
+        """
+        current = os.fstat(f.fileno())
+        return (current.st_size, current.st_mtime_ns) != (st.st_size, st.st_mtime_ns)
 
     def __open(self, path: str | os.PathLike | IO, mode: str = "rb") -> IO:
         """
@@ -323,31 +1190,44 @@ class ObjectStoreS3(s3fs.S3FileSystem):
         else:
             raise ValueError(f"Unsupported file type: {type(path)}")
 
-    def _write_chunk(
-        self, path_read, path_write, chunk_offset: int, chunk_length: int
-    ) -> None:
+    @staticmethod
+    def _read_chunk(f: IO, lock: Lock, buffer: memoryview, chunk_offset: int) -> None:
         """
-        Write a chunk to an open file.
+        Read a chunk of an open file into a buffer.
 
         Parameters
         ----------
-        path_read
+        f
             File to read from.
-        path_write
-            File to write to.
+        lock
+            Lock that serialises the reads of the file, which share its position.
+        buffer
+            Buffer to read into, of the length of the chunk.
         chunk_offset
             Offset of the chunk (in bytes).
-        chunk_length
-            Length of the chunk (in bytes).
+
+        Raises
+        ------
+        EOFError
+            If the file ends before the chunk.
         """
-        # Read the chunk
-        with self.__open(path_read, mode="rb") as f:
+        buffer = memoryview(buffer)
+        with lock:
             f.seek(chunk_offset, 0)
-            bytechunk = f.read(chunk_length)
-
-        # Write the chunk
-        with self.open(path_write, mode="wb", s3=dict(profile="default")) as f:
-            f.write(bytechunk)
+            n_read = 0
+            while n_read < len(buffer):
+                if hasattr(f, "readinto"):
+                    n = f.readinto(buffer[n_read:])
+                else:
+                    data = f.read(len(buffer) - n_read)
+                    n = len(data)
+                    buffer[n_read : n_read + n] = data
+                if not n:
+                    raise EOFError(
+                        f"File ended at offset {chunk_offset + n_read} "
+                        + f"while reading a chunk of {len(buffer)} bytes."
+                    )
+                n_read += n
 
     def _create_chunks_offsets_lengths(self, nbytes, chunk_size: int) -> dict:
         """
@@ -377,7 +1257,7 @@ class ObjectStoreS3(s3fs.S3FileSystem):
         for i in range(nchunks):
             chunks_offsets_lengths[i] = {
                 "offset": i * chunk_size,
-                "length": chunk_size,
+                "length": min(chunk_size, nbytes - i * chunk_size),
             }
 
         return chunks_offsets_lengths
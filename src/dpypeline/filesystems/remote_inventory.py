@@ -0,0 +1,215 @@
+"""Disk-backed inventory of the objects of an object store."""
+import sqlite3
+import time
+from threading import Lock
+from typing import Iterable, NamedTuple
+
+
+class RemoteObject(NamedTuple):
+    """Size and ETag of an object of the object store."""
+
+    size: int
+    etag: str
+
+
+class RemoteInventory:
+    """
+    Indexed, disk-backed inventory of the objects of an object store.
+
+    The objects found under a prefix by a listing of the object store are
+    stored in a SQLite table whose primary key is the path of the object,
+    together with the time at which the prefix was listed, so that whether
+    an object is present, and its size and ETag, can be looked up without
+    a request per object. The ETags computed for local files are cached as
+    well, keyed by the size, modification time and inode of the files, so
+    that unchanged files are not read again to be compared.
+
+    Attributes
+    ----------
+    _db_file
+        File where the SQLite database is stored.
+    _connection
+        Connection to the SQLite database.
+    _lock
+        Lock that serialises the access to the connection.
+    """
+
+    def __init__(self, db_file: str) -> None:
+        """
+        Initialize the inventory.
+
+        Parameters
+        ----------
+        db_file
+            File where the SQLite database is stored.
+        """
+        self._db_file = db_file
+        self._lock = Lock()
+
+        self._connection = sqlite3.connect(db_file, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS objects "
+            + "(path TEXT PRIMARY KEY, size INTEGER, etag TEXT) WITHOUT ROWID"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS prefixes "
+            + "(prefix TEXT PRIMARY KEY, listed_at REAL) WITHOUT ROWID"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS local_etags "
+            + "(path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+            + "ino INTEGER, part_size INTEGER, etag TEXT) WITHOUT ROWID"
+        )
+        self._connection.commit()
+
+    def listed_at(self, prefix: str) -> float | None:
+        """
+        Get the time at which a prefix was last listed.
+
+        Parameters
+        ----------
+        prefix
+            Prefix, including the bucket and ending with a separator.
+
+        Returns
+        -------
+            Time of the last listing, or `None` if it has never been listed.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT listed_at FROM prefixes WHERE prefix = ?", (prefix,)
+            ).fetchone()
+
+        return None if row is None else row[0]
+
+    def replace_prefix(
+        self, prefix: str, objects: Iterable[tuple[str, int, str]]
+    ) -> None:
+        """
+        Replace the objects directly under a prefix with those of a listing.
+
+        Parameters
+        ----------
+        prefix
+            Prefix listed, including the bucket and ending with a separator.
+        objects
+            Paths, sizes and ETags of the objects found directly under the prefix.
+        """
+        with self._lock:
+            # Objects under the prefix, whose rest has no separator
+            self._connection.execute(
+                "DELETE FROM objects WHERE path > ? AND path < ? "
+                + "AND instr(substr(path, ?), '/') = 0",
+                (prefix, prefix + "\U0010ffff", len(prefix) + 1),
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO objects VALUES (?, ?, ?)", objects
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO prefixes VALUES (?, ?)", (prefix, time.time())
+            )
+            self._connection.commit()
+
+    def get(self, path: str) -> RemoteObject | None:
+        """
+        Get the size and ETag of an object.
+
+        Parameters
+        ----------
+        path
+            Path of the object, including the bucket.
+
+        Returns
+        -------
+            Size and ETag of the object, or `None` if it is not in the inventory.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT size, etag FROM objects WHERE path = ?", (path,)
+            ).fetchone()
+
+        return None if row is None else RemoteObject(*row)
+
+    def put(self, path: str, size: int, etag: str) -> None:
+        """
+        Add or update an object, e.g., after it has been uploaded.
+
+        Parameters
+        ----------
+        path
+            Path of the object, including the bucket.
+        size
+            Size of the object (in bytes).
+        etag
+            ETag of the object.
+        """
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO objects VALUES (?, ?, ?)", (path, size, etag)
+            )
+            self._connection.commit()
+
+    def get_local_etag(self, path: str, fingerprint: dict[str, int]) -> str | None:
+        """
+        Get the ETag computed for a local file, if the file has not changed.
+
+        Parameters
+        ----------
+        path
+            Path of the local file.
+        fingerprint
+            Size, modification time, inode and part size of the file.
+
+        Returns
+        -------
+            ETag of the file, or `None` if it has not been computed for the file
+            as it currently is.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT etag FROM local_etags WHERE path = ? AND size = ? "
+                + "AND mtime_ns = ? AND ino = ? AND part_size = ?",
+                (
+                    path,
+                    fingerprint["size"],
+                    fingerprint["mtime_ns"],
+                    fingerprint["ino"],
+                    fingerprint["part_size"],
+                ),
+            ).fetchone()
+
+        return None if row is None else row[0]
+
+    def put_local_etag(self, path: str, fingerprint: dict[str, int], etag: str) -> None:
+        """
+        Cache the ETag computed for a local file.
+
+        Parameters
+        ----------
+        path
+            Path of the local file.
+        fingerprint
+            Size, modification time, inode and part size of the file.
+        etag
+            ETag of the file.
+        """
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO local_etags VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    path,
+                    fingerprint["size"],
+                    fingerprint["mtime_ns"],
+                    fingerprint["ino"],
+                    fingerprint["part_size"],
+                    etag,
+                ),
+            )
+            self._connection.commit()
+
+    def close(self) -> None:
+        """Close the connection to the SQLite database."""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,205 @@
+"""Persisted state of the multipart uploads in progress."""
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, NamedTuple
+
+
+class UploadRecord(NamedTuple):
+    """
+    State of a multipart upload in progress.
+
+    Attributes
+    ----------
+    dest_path
+        Path of the object in the object store.
+    upload_id
+        Identifier of the multipart upload.
+    fingerprint
+        Size, modification time, inode and part size of the source file, which must
+        match for the upload to be resumed.
+    parts
+        Dictionary mapping the numbers of the parts uploaded to their ETags.
+    created_at
+        Time at which the upload was started.
+    """
+
+    dest_path: str
+    upload_id: str
+    fingerprint: dict[str, int]
+    parts: dict[int, str]
+    created_at: float
+
+
+class UploadStateStore:
+    """
+    Directory of the states of the multipart uploads in progress.
+
+    The state of each upload is stored in its own file as JSON lines: a header
+    with the upload id and the fingerprint of the source file, followed by one
+    line per part uploaded. Parts are appended as they complete, so that
+    recording a part does not rewrite the whole state, and a line torn by a
+    crash only loses that part.
+
+    Attributes
+    ----------
+    _state_dir
+        Directory where the states are stored.
+    """
+
+    def __init__(self, state_dir: str) -> None:
+        """
+        Initialize the store.
+
+        Parameters
+        ----------
+        state_dir
+            Directory where the states are stored, created if needed.
+        """
+        self._state_dir = state_dir
+        os.makedirs(state_dir, exist_ok=True)
+
+    def _state_file(self, dest_path: str) -> str:
+        """Return the file where the state of the upload of an object is stored."""
+        digest = hashlib.sha1(dest_path.encode()).hexdigest()
+        return os.path.join(self._state_dir, f"{digest}.json")
+
+    def _append(self, dest_path: str, record: dict[str, Any], mode: str = "a") -> None:
+        """Append a line to the state of an upload."""
+        with open(self._state_file(dest_path), mode) as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _read(self, state_file: str) -> UploadRecord | None:
+        """Read the state of an upload, or return `None` if it is unreadable."""
+        try:
+            with open(state_file) as f:
+                header = json.loads(f.readline())
+                parts = {}
+                for line in f:
+                    try:
+                        part = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn by a crash while it was being appended
+                        break
+                    parts[part["part"]] = part["etag"]
+        except (OSError, ValueError, KeyError) as error:
+            logging.warning(f"Could not read the upload state {state_file}: {error}")
+            return None
+
+        return UploadRecord(
+            header["dest_path"],
+            header["upload_id"],
+            header["fingerprint"],
+            parts,
+            header["created_at"],
+        )
+
+    def start(
+        self, dest_path: str, upload_id: str, fingerprint: dict[str, int]
+    ) -> None:
+        """
+        Record the start of an upload, replacing any previous state of the object.
+
+        Parameters
+        ----------
+        dest_path
+            Path of the object in the object store.
+        upload_id
+            Identifier of the multipart upload.
+        fingerprint
+            Size, modification time, inode and part size of the source file.
+        """
+        header = {
+            "dest_path": dest_path,
+            "upload_id": upload_id,
+            "fingerprint": fingerprint,
+            "created_at": time.time(),
+        }
+        self._append(dest_path, header, mode="w")
+
+    def add_part(self, dest_path: str, part_number: int, etag: str) -> None:
+        """
+        Record a part uploaded.
+
+        Parameters
+        ----------
+        dest_path
+            Path of the object in the object store.
+        part_number
+            Number of the part.
+        etag
+            ETag of the part.
+        """
+        self._append(dest_path, {"part": part_number, "etag": etag})
+
+    def get(self, dest_path: str) -> UploadRecord | None:
+        """
+        Get the state of the upload of an object.
+
+        Parameters
+        ----------
+        dest_path
+            Path of the object in the object store.
+
+        Returns
+        -------
+            State of the upload, or `None` if there is no upload in progress.
+        """
+        state_file = self._state_file(dest_path)
+        if not os.path.isfile(state_file):
+            return None
+
+        return self._read(state_file)
+
+    def remove(self, dest_path: str) -> None:
+        """
+        Remove the state of the upload of an object, if any.
+
+        Parameters
+        ----------
+        dest_path
+            Path of the object in the object store.
+        """
+        try:
+            os.remove(self._state_file(dest_path))
+        except FileNotFoundError:
+            pass
+
+    def remove_stale(self, max_age: float, prefix: str = "") -> list[UploadRecord]:
+        """
+        Remove the states of the uploads started more than `max_age` seconds ago.
+
+        Parameters
+        ----------
+        max_age
+            Age (in seconds) after which the states are removed.
+        prefix, optional
+            Prefix of the paths of the objects whose states are removed, by
+            default all. States that cannot be read are removed whatever the
+            prefix.
+
+        Returns
+        -------
+            States removed that could be read.
+        """
+        removed = []
+        now = time.time()
+        for name in os.listdir(self._state_dir):
+            state_file = os.path.join(self._state_dir, name)
+            record = self._read(state_file)
+            if record is not None and not record.dest_path.startswith(prefix):
+                continue
+
+            created_at = (
+                os.path.getmtime(state_file) if record is None else record.created_at
+            )
+            if now - created_at > max_age:
+                os.remove(state_file)
+                if record is not None:
+                    removed.append(record)
+
+        return removed
@@ -0,0 +1,140 @@
+"""Test suite for the dpypeline.akita.core module."""
+import os
+import tempfile
+import time
+from typing import Any, Iterable
+
+from dpypeline.akita.core import Akita
+from dpypeline.akita.stat_cache import StateDiff
+
+
+class FakeQueue:
+    """Queue with queued, processed and dead-lettered events."""
+
+    def __init__(
+        self,
+        queued: list[str],
+        processed: set[str],
+        dead_lettered: set[str],
+        processed_at: dict[str, float] = None,
+    ) -> None:
+        """Initialize the queue."""
+        self.queue_list = queued
+        self.processed_events = processed
+        self.processed_times = processed_at if processed_at is not None else {}
+        self.dead_lettered = dead_lettered
+        self.batches: list[list[Any]] = []
+
+    def enqueue(self, event: Any) -> bool:
+        """Record the event as a batch of one."""
+        return self.enqueue_many([event]) == 1
+
+    def enqueue_many(self, events: Iterable[Any]) -> int:
+        """Record the batch of events."""
+        self.batches.append(list(events))
+        return len(self.batches[-1])
+
+    def is_processed(self, event: Any) -> bool:
+        """Return whether an event has been processed."""
+        return event in self.processed_events
+
+    def processed_at(self, event: Any) -> float | None:
+        """Return the time at which an event was processed, if known."""
+        return self.processed_times.get(event)
+
+    def is_dead_lettered(self, event: Any) -> bool:
+        """Return whether an event is in the dead-letter queue."""
+        return event in self.dead_lettered
+
+    def set_sentinel_state(self, active: bool) -> bool:
+        """Ignore the end-of-queue sentinel."""
+        return active
+
+
+class FakeDirectoryState:
+    """Directory state that records the accesses to the stored state."""
+
+    def __init__(self, current_state: list[str], diff: StateDiff) -> None:
+        """Initialize the directory state."""
+        self.current_state = current_state
+        self.diff = diff
+        self.saved = False
+
+    @property
+    def stored_state(self) -> list[str]:
+        """Fail, since the stored state is not needed."""
+        raise AssertionError("The stored state should not be loaded.")
+
+    def save_stat_cache(self) -> None:
+        """Record that the stat cache was saved."""
+        self.saved = True
+
+
+def test_enqueue_new_files() -> None:
+    """Test that only the unenqueued files are enqueued, in batches."""
+    files = [f"/data/dir_{i % 3}/file_{i:03d}.nc" for i in range(100)]
+    queue = FakeQueue(
+        queued=files[:10],
+        processed=set(files[10:50]),
+        dead_lettered={files[50]},
+    )
+    directory_state = FakeDirectoryState(
+        files, StateDiff(added=[], modified=[files[20]], removed=[])
+    )
+    akita = Akita(
+        "/data",
+        queue,
+        None,
+        directory_state,
+        None,
+        monitor=False,
+        enqueue_batch_size=16,
+        log_sample_size=3,
+    )
+
+    akita.enqueue_new_files()
+
+    expected = sorted([files[20]] + files[51:], key=lambda f: f.rsplit("/", 1)[-1])
+    assert [len(batch) for batch in queue.batches] == [16, 16, 16, 2]
+    assert [event for batch in queue.batches for event in batch] == expected
+    assert directory_state.saved
+
+
+def test_enqueue_modified_since_processed() -> None:
+    """Test that modified files are enqueued again only if written after processed."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        files = [os.path.join(temp_dir, f"file_{i}.nc") for i in range(3)]
+        for path in files:
+            open(path, "w").close()
+        now = time.time()
+        os.utime(files[0], (now - 60, now - 60))
+
+        # Written after the previous scan, but before it was processed
+        queue = FakeQueue(
+            queued=[],
+            processed=set(files),
+            dead_lettered=set(),
+            processed_at={files[0]: now - 30, files[1]: now - 30},
+        )
+        directory_state = FakeDirectoryState(
+            files, StateDiff(added=[], modified=files, removed=[])
+        )
+        akita = Akita("/data", queue, None, directory_state, None, monitor=False)
+
+        akita.enqueue_new_files()
+
+    assert queue.batches == [files[1:]]
+
+
+def test_enqueue_duplicates_once() -> None:
+    """Test that files found by several patterns are enqueued once."""
+    files = [f"/data/file_{i}.nc" for i in range(3)]
+    queue = FakeQueue(queued=[], processed=set(), dead_lettered=set())
+    directory_state = FakeDirectoryState(
+        files + files[1:], StateDiff(added=[], modified=[], removed=[])
+    )
+    akita = Akita("/data", queue, None, directory_state, None, monitor=False)
+
+    akita.enqueue_new_files()
+
+    assert queue.batches == [files]
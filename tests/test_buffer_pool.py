@@ -0,0 +1,49 @@
+"""Test suite for the dpypeline.filesystems.buffer_pool module."""
+import asyncio
+
+from dpypeline.filesystems.buffer_pool import BufferPool, BufferReader
+
+
+def test_buffer_pool() -> None:
+    """Test that buffers are reused and their number is bounded."""
+
+    async def run() -> None:
+        pool = BufferPool(n_buffers=2, buffer_size=16)
+        in_use, max_in_use, buffers = 0, 0, set()
+
+        async def use_buffer() -> None:
+            nonlocal in_use, max_in_use
+            async with pool.buffer() as buffer:
+                assert len(buffer) == 16
+                buffers.add(id(buffer))
+                in_use += 1
+                max_in_use = max(max_in_use, in_use)
+                await asyncio.sleep(0.01)
+                in_use -= 1
+
+        await asyncio.gather(*[use_buffer() for _ in range(10)])
+
+        assert max_in_use == 2
+        assert pool.n_allocated == 2
+        assert len(buffers) == 2
+
+    asyncio.run(run())
+
+
+def test_buffer_reader() -> None:
+    """Test that the reader reads and seeks through the buffer."""
+    buffer = bytearray(b"0123456789")
+    reader = BufferReader(memoryview(buffer)[2:8])
+
+    assert len(reader) == 6
+    assert reader.read(4) == b"2345"
+    assert reader.read() == b"67"
+    assert reader.read() == b""
+
+    reader.seek(-3, 2)
+    chunk = bytearray(8)
+    assert reader.readinto(chunk) == 3
+    assert chunk[:3] == b"567"
+
+    reader.seek(0)
+    assert reader.read(-1) == b"234567"
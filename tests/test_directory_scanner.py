@@ -0,0 +1,138 @@
+"""Test suite for the dpypeline.akita.directory_scanner module."""
+import glob
+import os
+import tempfile
+from typing import Generator
+
+import pytest
+
+from dpypeline.akita.directory_scanner import DirectoryScanner
+
+DIRECTORIES = ["", "a", "a/b", "a/b/c", ".hidden", "a/.hidden", "c/nested/deep"]
+FILENAMES = ["file.nc", "file.txt", ".file.nc", "FILE.NC", "data_1.nc"]
+PATTERNS = [
+    "*.nc",
+    "**/*.nc",
+    "*/*.nc",
+    "a/**",
+    "**",
+    "a/b/*.txt",
+    "**/b/**/*.nc",
+    ".*/*.nc",
+    "**/.f*",
+    "data_?.nc",
+    "c/*/deep/*",
+    "*/",
+    "**/",
+    "a/**/",
+    "**/*/",
+    ".*/",
+]
+
+
+@pytest.fixture(scope="module")
+def temp_tree() -> Generator[str, None, None]:
+    """Create a temporary directory tree with files."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for directory in DIRECTORIES:
+            os.makedirs(os.path.join(temp_dir, directory), exist_ok=True)
+            for filename in FILENAMES:
+                open(os.path.join(temp_dir, directory, filename), "w").close()
+
+        yield temp_dir
+
+
+@pytest.mark.parametrize("recursive", [True, False])
+@pytest.mark.parametrize("include_hidden", [True, False])
+def test_glob_semantics(temp_tree: str, recursive: bool, include_hidden: bool) -> None:
+    """Test that each pattern matches the same paths as glob."""
+    for pattern in PATTERNS:
+        expected = glob.glob(
+            os.path.join(temp_tree, pattern),
+            recursive=recursive,
+            include_hidden=include_hidden,
+        )
+
+        scanner = DirectoryScanner(
+            temp_tree, pattern, recursive=recursive, include_hidden=include_hidden
+        )
+        assert sorted(scanner.scan()) == sorted(expected), pattern
+
+
+def test_normalised_patterns(temp_tree: str) -> None:
+    """Test that empty and dot segments are dropped and parent segments rejected."""
+    scanner = DirectoryScanner(temp_tree, ["./a//b/*.txt", "a/./file.nc"])
+
+    assert sorted(scanner.scan()) == [
+        os.path.join(temp_tree, "a", "b", "file.txt"),
+        os.path.join(temp_tree, "a", "file.nc"),
+    ]
+
+    with pytest.raises(ValueError):
+        DirectoryScanner(temp_tree, "a/../*.nc")
+
+
+def test_multiple_patterns(temp_tree: str) -> None:
+    """Test that several patterns are matched in a single walk, without duplicates."""
+    scanner = DirectoryScanner(
+        temp_tree, ["**/*.nc", "a/**/*.txt", "a/b/*.nc"], recursive=True
+    )
+    paths = list(scanner.scan())
+
+    expected = set(glob.glob(os.path.join(temp_tree, "**/*.nc"), recursive=True))
+    expected.update(glob.glob(os.path.join(temp_tree, "a/**/*.txt"), recursive=True))
+    assert len(paths) == len(set(paths))
+    assert set(paths) == expected
+
+    # The files of a directory are yielded in sorted order before
+    # its subdirectories are walked
+    assert paths[:3] == [
+        os.path.join(temp_tree, "data_1.nc"),
+        os.path.join(temp_tree, "file.nc"),
+        os.path.join(temp_tree, "a", "data_1.nc"),
+    ]
+
+
+def test_ignore_patterns(temp_tree: str) -> None:
+    """Test that ignored files are skipped and ignored directories are not walked."""
+    scanner = DirectoryScanner(
+        temp_tree,
+        "**/*.nc",
+        ignore_patterns=["*/a/b", "*/data_*"],
+        recursive=True,
+    )
+    paths = list(scanner.scan())
+
+    assert os.path.join(temp_tree, "a", "file.nc") in paths
+    assert not any(os.path.basename(path).startswith("data_") for path in paths)
+    assert not any(
+        path.startswith(os.path.join(temp_tree, "a", "b") + os.path.sep)
+        for path in paths
+    )
+
+
+def test_case_insensitive(temp_tree: str) -> None:
+    """Test that names are matched insensitive to case."""
+    scanner = DirectoryScanner(temp_tree, ["A/file.nc", "*.NC"], case_sensitive=False)
+
+    assert sorted(scanner.scan()) == sorted(
+        [
+            os.path.join(temp_tree, "a", "FILE.NC"),
+            os.path.join(temp_tree, "a", "file.nc"),
+            os.path.join(temp_tree, "FILE.NC"),
+            os.path.join(temp_tree, "data_1.nc"),
+            os.path.join(temp_tree, "file.nc"),
+        ]
+    )
+
+
+@pytest.mark.parametrize("workers", [2, 8])
+def test_parallel_scan(temp_tree: str, workers: int) -> None:
+    """Test that the parallel walk yields the same paths in the same order."""
+    patterns = ["**/*.nc", "a/**/*.txt", "c/*/deep/*"]
+    serial = list(DirectoryScanner(temp_tree, patterns, recursive=True).scan())
+    parallel = list(
+        DirectoryScanner(temp_tree, patterns, recursive=True, workers=workers).scan()
+    )
+
+    assert parallel == serial
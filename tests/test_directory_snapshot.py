@@ -0,0 +1,90 @@
+"""Test suite for the dpypeline.akita.directory_snapshot module."""
+import os
+import tempfile
+from typing import Generator
+
+import pytest
+
+from dpypeline.akita.directory_snapshot import (
+    DirectorySnapshot,
+    is_snapshot,
+    write_snapshot,
+)
+
+PATHS = [
+    f"/gws/nopw/j04/model/run{run}/output/{year}/file_{i:04d}.nc"
+    for run in range(3)
+    for year in range(1990, 1995)
+    for i in range(50)
+] + [
+    "/gws/nopw/j04/model/\udcff.nc",
+    "/gws/nopw/j04/model/\udc80.nc",
+    "/gws/nopw/j04/model/\u4e00.nc",
+    "/gws/nopw/j04/model/" + "long_name_" * 30 + "a.nc",
+    "/gws/nopw/j04/model/" + "long_name_" * 30 + "b.nc",
+]
+
+
+@pytest.fixture
+def snapshot_file() -> Generator[str, None, None]:
+    """Create a temporary file for the snapshot."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        yield os.path.join(temp_dir, "directory_state.snapshot")
+
+
+@pytest.mark.parametrize("codec", ["none", "zlib", "zstd"])
+def test_write_read_snapshot(snapshot_file: str, codec: str) -> None:
+    """Test that the paths written are read back in sorted order."""
+    if codec == "zstd":
+        pytest.importorskip("zstandard")
+
+    assert write_snapshot(snapshot_file, PATHS + PATHS[:10], codec=codec) == len(PATHS)
+    assert is_snapshot(snapshot_file)
+
+    snapshot = DirectorySnapshot(snapshot_file)
+    expected = sorted(PATHS, key=lambda path: path.encode("utf-8", "surrogateescape"))
+
+    assert len(snapshot) == len(PATHS)
+    assert list(snapshot) == expected
+    assert snapshot == expected
+    assert snapshot[0] == expected[0]
+    assert snapshot[-1] == expected[-1]
+    assert snapshot[100:110] == expected[100:110]
+    with pytest.raises(IndexError):
+        snapshot[len(PATHS)]
+
+    snapshot.close()
+
+
+def test_membership(snapshot_file: str) -> None:
+    """Test the membership of paths in the snapshot."""
+    write_snapshot(snapshot_file, PATHS, block_size=16)
+    snapshot = DirectorySnapshot(snapshot_file)
+
+    for path in PATHS:
+        assert path in snapshot, f"{path} not in the snapshot"
+    for path in ["/", "/gws", PATHS[0][:-1], PATHS[0] + "x", "/zzz", None]:
+        assert path not in snapshot, f"{path} in the snapshot"
+
+    snapshot.close()
+
+
+def test_empty_snapshot(snapshot_file: str) -> None:
+    """Test a snapshot without paths."""
+    write_snapshot(snapshot_file, [])
+    with DirectorySnapshot(snapshot_file) as snapshot:
+        assert len(snapshot) == 0
+        assert snapshot == []
+        assert PATHS[0] not in snapshot
+
+    assert snapshot._mmap.closed
+
+
+def test_invalid_snapshot(snapshot_file: str) -> None:
+    """Test that files that are not snapshots are rejected."""
+    with open(snapshot_file, "wb") as f:
+        f.write(b"\x80\x04" + b"\x00" * 64)
+
+    assert not is_snapshot(snapshot_file)
+    with pytest.raises(ValueError):
+        DirectorySnapshot(snapshot_file)
@@ -5,6 +5,7 @@ from typing import Generator, List
 
 import pytest
 
+from dpypeline.akita.directory_snapshot import DirectorySnapshot
 from dpypeline.akita.directory_state import DirectoryState
 
 FILENAMES: List[str] = ["file1.txt", "file2.txt", "file3.txt", "file4.txt"]
@@ -173,3 +174,42 @@ def test_save_load_state(
     assert (
         len(directory_state._stored_state) == 5
     ), "Wrong number of files in the stored state of the directory."
+
+
+def test_save_state_background(
+    temp_directory_with_files: str,
+    cache_dir: str,
+) -> None:
+    """Test that the state saved in the background is waited for when loaded."""
+    directory_state = DirectoryState(path=temp_directory_with_files, patterns=["*.txt"])
+    if os.path.isfile(directory_state._state_file):
+        os.remove(directory_state._state_file)
+
+    dir_state = directory_state.current_state
+    assert directory_state._save_thread is not None
+
+    assert directory_state.stored_state == sorted(dir_state)
+    assert directory_state._save_thread is None
+
+
+def test_stored_state_closed_when_replaced(
+    temp_directory_with_files: str,
+    cache_dir: str,
+) -> None:
+    """Test that the stored state is reused until replaced, and then closed."""
+    directory_state = DirectoryState(path=temp_directory_with_files, patterns=["*.txt"])
+    directory_state._get_current_directory_state()
+    directory_state._save_state()
+
+    snapshot = directory_state.stored_state
+    assert isinstance(snapshot, DirectorySnapshot)
+    assert directory_state.stored_state is snapshot
+
+    directory_state._save_state()
+    assert directory_state.stored_state is not snapshot
+    assert snapshot._mmap.closed
+
+    snapshot = directory_state.stored_state
+    assert isinstance(snapshot, DirectorySnapshot)
+    directory_state.close()
+    assert snapshot._mmap.closed
@@ -82,3 +82,28 @@ def test_etl_pipeline() -> None:
     # Remove a job
     etl_pipeline.remove_job(0)
     assert len(etl_pipeline.jobs) == 0
+
+
+def test_async_task_job() -> None:
+    """Test that coroutine task functions are awaited."""
+    import asyncio
+
+    from dpypeline.etl_pipeline.basic_pipeline import BasicPipeline
+
+    async def async_double(x):
+        await asyncio.sleep(0)
+        return 2 * x
+
+    task = Task(function=async_double)
+    assert task.is_async
+    assert not Task(function=sum).is_async
+    assert task.run(3) == 6
+    assert asyncio.run(task.arun(3)) == 6
+
+    job = Job(name="async_job", tasks=[Task(function=sum), task])
+    assert job.run([1, 2]) == 6
+    assert asyncio.run(job.arun([1, 2])) == 6
+
+    pipeline = BasicPipeline(jobs=[job])
+    assert asyncio.run(pipeline.aproduce_jobs([1, 2])) == [6]
+    assert asyncio.run(ETLPipeline.aproduce_jobs(pipeline, [1, 2])) == [6]
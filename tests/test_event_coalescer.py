@@ -0,0 +1,57 @@
+"""Test suite for the dpypeline.akita.event_coalescer module."""
+import time
+from typing import Any, Iterable
+
+from dpypeline.akita.event_coalescer import EventCoalescer
+
+
+class BatchQueue:
+    """Queue that records the batches of events."""
+
+    def __init__(self) -> None:
+        """Initialize the queue."""
+        self.batches: list[list[Any]] = []
+
+    def enqueue_many(self, events: Iterable[Any]) -> int:
+        """Record the batch of events."""
+        events = list(events)
+        self.batches.append(events)
+        return len(events)
+
+
+def test_window() -> None:
+    """Test that events are deduplicated and flushed as one batch after the window."""
+    queue = BatchQueue()
+    coalescer = EventCoalescer(queue, window=0.1, max_batch=1000)
+
+    assert coalescer.enqueue("a.nc")
+    assert coalescer.enqueue_many(["b.nc", "a.nc", "c.nc", "b.nc"]) == 2
+    assert not coalescer.enqueue("c.nc")
+    assert coalescer.pending == ["a.nc", "b.nc", "c.nc"]
+    assert queue.batches == []
+
+    start = time.monotonic()
+    while not queue.batches and time.monotonic() - start < 2:
+        time.sleep(0.01)
+
+    assert queue.batches == [["a.nc", "b.nc", "c.nc"]]
+    assert coalescer.pending == []
+
+    # A new window starts with the next event
+    coalescer.enqueue("a.nc")
+    coalescer.stop()
+    assert queue.batches == [["a.nc", "b.nc", "c.nc"], ["a.nc"]]
+
+
+def test_max_batch() -> None:
+    """Test that the buffer is flushed as soon as it holds the maximum batch."""
+    queue = BatchQueue()
+    coalescer = EventCoalescer(queue, window=60, max_batch=100)
+
+    coalescer.enqueue_many(f"file_{i}.nc" for i in range(250))
+    assert [len(batch) for batch in queue.batches] == [100, 100]
+    assert len(coalescer.pending) == 50
+
+    coalescer.stop()
+    assert [len(batch) for batch in queue.batches] == [100, 100, 50]
+    assert not coalescer._worker.is_alive()
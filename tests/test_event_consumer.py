@@ -0,0 +1,385 @@
+"""Test suite for the dpypeline.event_consumer package."""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import pytest
+
+from dpypeline.akita.queue_events import EventsQueue
+from dpypeline.event_consumer.consumer_serial import ConsumerSerial
+
+
+class DummyJobProducer:
+    """Job producer that records the events it is given."""
+
+    def __init__(self) -> None:
+        """Initialize the job producer."""
+        self.events: list[Any] = []
+
+    def produce_jobs(self, event: Any) -> Any:
+        """Record the event."""
+        self.events.append(event)
+        return event
+
+
+def get_empty_queue() -> EventsQueue:
+    """Return an empty queue."""
+    EventsQueue.clear_instance()
+    for file_suffix in ["queue_state.pickle", "queue_state.journal"]:
+        state_file = os.path.join(os.getenv("CACHE_DIR"), file_suffix)
+        if os.path.isfile(state_file):
+            os.remove(state_file)
+
+    return EventsQueue()
+
+
+def test_consumer_serial(cache_dir: str) -> None:
+    """Test that ConsumerSerial consumes all events and exits on the sentinel."""
+    queue = get_empty_queue()
+    queue.set_sentinel_state(active=False)
+    queue.enqueue_many([f"serial_{i}" for i in range(5)])
+
+    job_producer = DummyJobProducer()
+    consumer = ConsumerSerial(queue=queue, job_producer=job_producer)
+    consumer._create_worker(daemon=True).start()
+
+    # Events enqueued while the consumer is idle are consumed promptly
+    time.sleep(0.1)
+    queue.enqueue("serial_5")
+    start = time.monotonic()
+    while len(job_producer.events) < 6 and time.monotonic() - start < 1:
+        time.sleep(0.01)
+
+    assert job_producer.events == [f"serial_{i}" for i in range(6)]
+
+    queue.set_sentinel_state(active=True)
+    consumer._worker.join(timeout=1)
+    assert not consumer._worker.is_alive()
+    assert queue.get_queue_size() == 0
+
+    queue.clear_instance()
+
+
+def test_consumer_parallel(cache_dir: str) -> None:
+    """Test that ConsumerParallel consumes all events and exits on the sentinel."""
+    distributed = pytest.importorskip("distributed")
+    from dpypeline.event_consumer.consumer_parallel import ConsumerParallel
+
+    queue = get_empty_queue()
+    queue.set_sentinel_state(active=False)
+    events = [f"parallel_{i}" for i in range(10)]
+    queue.enqueue_many(events)
+
+    with distributed.LocalCluster(
+        n_workers=2, threads_per_worker=1, processes=False
+    ) as cluster, distributed.Client(cluster) as client:
+        consumer = ConsumerParallel(
+            cluster_client=client, queue=queue, job_producer=DummyJobProducer()
+        )
+        consumer._create_worker(daemon=True).start()
+
+        start = time.monotonic()
+        while (
+            not all(queue.is_processed(event) for event in events)
+            and time.monotonic() - start < 10
+        ):
+            time.sleep(0.05)
+
+        assert all(queue.is_processed(event) for event in events)
+
+        queue.set_sentinel_state(active=True)
+        consumer._worker.join(timeout=10)
+        assert not consumer._worker.is_alive()
+        assert queue.leased_events == []
+
+    queue.clear_instance()
+
+
+class FailingJobProducer:
+    """Job producer that fails for a given event."""
+
+    def __init__(self, failing_event: Any) -> None:
+        """Initialize the job producer."""
+        self.failing_event = failing_event
+
+    def produce_jobs(self, event: Any) -> Any:
+        """Raise an error for the failing event."""
+        if event == self.failing_event:
+            raise ValueError(f"Cannot process {event}")
+        return event
+
+
+def test_consumer_parallel_dead_letters(cache_dir: str) -> None:
+    """Test that ConsumerParallel dead-letters events after the maximum retries."""
+    distributed = pytest.importorskip("distributed")
+    from dpypeline.event_consumer.consumer_parallel import ConsumerParallel
+
+    queue = get_empty_queue()
+    queue.set_sentinel_state(active=True)
+    events = [f"retry_{i}" for i in range(4)]
+    queue.enqueue_many(events)
+
+    with distributed.LocalCluster(
+        n_workers=2, threads_per_worker=1, processes=False
+    ) as cluster, distributed.Client(cluster) as client:
+        consumer = ConsumerParallel(
+            cluster_client=client,
+            queue=queue,
+            job_producer=FailingJobProducer("retry_1"),
+            max_retries=2,
+            retry_backoff=0.01,
+        )
+        consumer._create_worker(daemon=True).start()
+        consumer._worker.join(timeout=10)
+        assert not consumer._worker.is_alive()
+
+    assert queue.is_dead_lettered("retry_1")
+    assert queue.dead_letters.items()[0][1] == 3
+    assert all(queue.is_processed(event) for event in events if event != "retry_1")
+    assert queue.leased_events == []
+
+    queue.clear_instance()
+
+
+def test_consumer_parallel_batches(
+    cache_dir: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that ConsumerParallel packs events into batches and retries failed ones."""
+    distributed = pytest.importorskip("distributed")
+    from dpypeline.event_consumer.consumer_parallel import (
+        ConsumerParallel,
+        produce_jobs_batch,
+    )
+
+    # Only the errors of the events are returned, not the results of their jobs
+    errors = produce_jobs_batch(FailingJobProducer("bad"), ["good", "bad"])
+    assert errors[0] is None and isinstance(errors[1], Exception)
+
+    queue = get_empty_queue()
+    queue.set_sentinel_state(active=True)
+    events = [f"batch_{i}" for i in range(10)]
+    queue.enqueue_many(events)
+
+    with distributed.LocalCluster(
+        n_workers=2, threads_per_worker=1, processes=False
+    ) as cluster, distributed.Client(cluster) as client:
+        consumer = ConsumerParallel(
+            cluster_client=client,
+            queue=queue,
+            job_producer=FailingJobProducer("batch_2"),
+            max_retries=1,
+            retry_backoff=0.01,
+            batch_size=4,
+            batch_linger=0.05,
+        )
+
+        batches = []
+        submit_batch = consumer._submit_batch
+
+        def record_batch():
+            batches.append(list(consumer._batch))
+            return submit_batch()
+
+        monkeypatch.setattr(consumer, "_submit_batch", record_batch)
+        consumer._create_worker(daemon=True).start()
+        consumer._worker.join(timeout=10)
+        assert not consumer._worker.is_alive()
+
+    assert batches[:3] == [events[:4], events[4:8], events[8:]]
+    assert batches[3:] == [["batch_2"]]
+    assert queue.is_dead_lettered("batch_2")
+    assert all(queue.is_processed(event) for event in events if event != "batch_2")
+    assert queue.leased_events == []
+
+    queue.clear_instance()
+
+
+def test_consumer_threaded(cache_dir: str) -> None:
+    """Test that ConsumerThreaded consumes all events and dead-letters failures."""
+    from dpypeline.event_consumer.consumer_threaded import ConsumerThreaded
+
+    queue = get_empty_queue()
+    queue.set_sentinel_state(active=True)
+    events = [f"threaded_{i}" for i in range(10)]
+    queue.enqueue_many(events)
+
+    consumer = ConsumerThreaded(
+        max_workers=4,
+        queue=queue,
+        job_producer=FailingJobProducer("threaded_3"),
+        max_retries=1,
+        retry_backoff=0.01,
+    )
+    consumer._create_worker(daemon=True).start()
+    consumer._worker.join(timeout=10)
+    assert not consumer._worker.is_alive()
+
+    assert queue.is_dead_lettered("threaded_3")
+    assert dict((e, a) for e, a, _, _ in queue.dead_letters.items())["threaded_3"] == 2
+    assert all(queue.is_processed(event) for event in events if event != "threaded_3")
+    assert queue.leased_events == []
+    assert isinstance(consumer._executor, ThreadPoolExecutor)
+    assert consumer._executor._shutdown
+
+    queue.clear_instance()
+
+
+def test_consumer_process_pool(cache_dir: str) -> None:
+    """Test that ConsumerProcessPool consumes all events and dead-letters failures."""
+    from dpypeline.etl_pipeline.basic_pipeline import BasicPipeline
+    from dpypeline.etl_pipeline.core import Job, Task
+    from dpypeline.event_consumer.consumer_process_pool import ConsumerProcessPool
+
+    queue = get_empty_queue()
+    queue.set_sentinel_state(active=True)
+    events = ["0.25", "1.25", "process_pool_bad", "2.25"]
+    queue.enqueue_many(events)
+
+    pipeline = BasicPipeline(jobs=[Job(name="to_float", tasks=[Task(float)])])
+    consumer = ConsumerProcessPool(
+        max_workers=2,
+        queue=queue,
+        job_producer=pipeline,
+        max_retries=1,
+        retry_backoff=0.01,
+    )
+    assert consumer._get_task_modules() == ["builtins"]
+
+    consumer._create_worker(daemon=True).start()
+    consumer._worker.join(timeout=30)
+    assert not consumer._worker.is_alive()
+
+    assert queue.is_dead_lettered("process_pool_bad")
+    assert all(
+        queue.is_processed(event) for event in events if event != "process_pool_bad"
+    )
+    assert queue.leased_events == []
+
+    queue.clear_instance()
+
+
+def exit_on_crash(event: str) -> str:
+    """Exit the process without cleaning up for the crashing event."""
+    if event == "crash":
+        os._exit(1)
+    return event
+
+
+def test_consumer_process_pool_worker_died(cache_dir: str) -> None:
+    """Test that events killing their worker process are dead-lettered."""
+    from dpypeline.etl_pipeline.basic_pipeline import BasicPipeline
+    from dpypeline.etl_pipeline.core import Job, Task
+    from dpypeline.event_consumer.consumer_process_pool import ConsumerProcessPool
+
+    queue = get_empty_queue()
+    queue.set_sentinel_state(active=True)
+    events = ["a", "crash", "b"]
+    queue.enqueue_many(events)
+
+    pipeline = BasicPipeline(jobs=[Job(name="exit", tasks=[Task(exit_on_crash)])])
+    consumer = ConsumerProcessPool(
+        max_workers=1,
+        queue=queue,
+        job_producer=pipeline,
+        max_retries=1,
+        retry_backoff=0.01,
+    )
+
+    consumer._create_worker(daemon=True).start()
+    consumer._worker.join(timeout=60)
+    assert not consumer._worker.is_alive()
+
+    assert queue.is_dead_lettered("crash")
+    assert queue.is_processed("a") and queue.is_processed("b")
+    assert queue.leased_events == []
+
+    queue.clear_instance()
+
+
+def sleep_or_exit(event: str) -> str:
+    """Exit the process for the crashing event, once the others are in flight."""
+    time.sleep(0.5)
+    if event.startswith("crash"):
+        os._exit(1)
+    return event
+
+
+def test_consumer_process_pool_bystanders(cache_dir: str) -> None:
+    """Test that the events in flight beside a dying worker are not dead-lettered."""
+    from dpypeline.etl_pipeline.basic_pipeline import BasicPipeline
+    from dpypeline.etl_pipeline.core import Job, Task
+    from dpypeline.event_consumer.consumer_process_pool import ConsumerProcessPool
+
+    queue = get_empty_queue()
+    queue.set_sentinel_state(active=True)
+    events = ["bystander_a", "crash_bystanders", "bystander_b"]
+    queue.enqueue_many(events)
+
+    pipeline = BasicPipeline(jobs=[Job(name="exit", tasks=[Task(sleep_or_exit)])])
+    consumer = ConsumerProcessPool(
+        max_workers=3, queue=queue, job_producer=pipeline, max_retries=0
+    )
+
+    consumer._create_worker(daemon=True).start()
+    consumer._worker.join(timeout=60)
+    assert not consumer._worker.is_alive()
+
+    assert queue.is_dead_lettered("crash_bystanders")
+    for event in ["bystander_a", "bystander_b"]:
+        assert queue.is_processed(event) and not queue.is_dead_lettered(event)
+    assert queue.leased_events == []
+
+    queue.clear_instance()
+
+
+class AsyncJobProducer:
+    """Job producer with coroutines that fail for a given event."""
+
+    def __init__(self, failing_event: Any) -> None:
+        """Initialize the job producer."""
+        self.failing_event = failing_event
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def aproduce_jobs(self, event: Any) -> Any:
+        """Wait on a simulated upload and raise an error for the failing event."""
+        import asyncio
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.05)
+        self.in_flight -= 1
+        if event == self.failing_event:
+            raise ValueError(f"Cannot process {event}")
+        return event
+
+
+def test_consumer_async(cache_dir: str) -> None:
+    """Test that AsyncConsumer runs events concurrently and dead-letters failures."""
+    from dpypeline.event_consumer.consumer_async import AsyncConsumer
+
+    queue = get_empty_queue()
+    queue.set_sentinel_state(active=True)
+    events = [f"async_{i}" for i in range(50)]
+    queue.enqueue_many(events)
+
+    job_producer = AsyncJobProducer("async_7")
+    consumer = AsyncConsumer(
+        max_concurrency=20,
+        queue=queue,
+        job_producer=job_producer,
+        max_retries=1,
+        retry_backoff=0.01,
+    )
+    consumer._create_worker(daemon=True).start()
+    consumer._worker.join(timeout=10)
+    assert not consumer._worker.is_alive()
+
+    assert 1 < job_producer.max_in_flight <= 20
+    assert queue.is_dead_lettered("async_7")
+    assert all(queue.is_processed(event) for event in events if event != "async_7")
+    assert queue.leased_events == []
+    assert consumer._loop.is_closed()
+
+    queue.clear_instance()
@@ -0,0 +1,162 @@
+"""Test suite for the dpypeline.akita.event_handler module."""
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Iterable
+
+import pytest
+
+pytest.importorskip("watchdog")
+
+from watchdog.events import (  # noqa: E402
+    FileClosedEvent,
+    FileCreatedEvent,
+    FileMovedEvent,
+)
+
+from dpypeline.akita.event_handler import EventHandler  # noqa: E402
+from dpypeline.akita.settle_scheduler import SettleScheduler  # noqa: E402
+
+
+class ListQueue:
+    """Queue that records the enqueued events."""
+
+    def __init__(self) -> None:
+        """Initialize the queue."""
+        self.events: list[Any] = []
+
+    def enqueue(self, event: Any) -> bool:
+        """Record the event."""
+        self.events.append(event)
+        return True
+
+    def enqueue_many(self, events: Iterable[Any]) -> int:
+        """Record the events."""
+        events = list(events)
+        self.events.extend(events)
+        return len(events)
+
+
+def get_event_handler(queue: ListQueue, close_events: bool) -> EventHandler:
+    """Create an event handler matching NetCDF files."""
+    return EventHandler(
+        queue,
+        patterns=["*.nc"],
+        ignore_directories=True,
+        settle_scheduler=SettleScheduler(queue, quiet_period=60),
+        close_events=close_events,
+    )
+
+
+def test_close_events() -> None:
+    """Test that files are enqueued when closed if the observer delivers close events."""
+    queue = ListQueue()
+    event_handler = get_event_handler(queue, close_events=True)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "file.nc")
+        open(path, "w").close()
+        event_handler.dispatch(FileCreatedEvent(path))
+        assert queue.events == []
+        assert event_handler._settle_scheduler.pending == [path]
+
+        event_handler.dispatch(FileClosedEvent(path))
+        event_handler.dispatch(FileClosedEvent(os.path.join(temp_dir, "file.txt")))
+        assert queue.events == [path]
+        assert event_handler._settle_scheduler.pending == []
+
+    event_handler._settle_scheduler.stop()
+
+
+def test_created_fallback() -> None:
+    """Test that created files are tracked if the observer cannot deliver close events."""
+    queue = ListQueue()
+    event_handler = get_event_handler(queue, close_events=False)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "file.nc")
+        open(path, "w").close()
+        event_handler.dispatch(FileCreatedEvent(path))
+
+        assert queue.events == []
+        assert event_handler._settle_scheduler.pending == [path]
+
+    event_handler._settle_scheduler.stop()
+
+
+def test_moved_into_pattern() -> None:
+    """Test that files moved into a path matching the patterns are enqueued."""
+    queue = ListQueue()
+    event_handler = get_event_handler(queue, close_events=False)
+
+    event_handler.dispatch(FileMovedEvent("/data/file.nc.tmp", "/data/file.nc"))
+    event_handler.dispatch(FileMovedEvent("/data/other.nc", "/data/other.nc.bak"))
+    assert queue.events == ["/data/file.nc"]
+
+
+def test_inotify_readiness() -> None:
+    """Test that inotify close and rename events enqueue files with no delay."""
+    inotify = pytest.importorskip("watchdog.observers.inotify")
+
+    queue = ListQueue()
+    event_handler = get_event_handler(queue, close_events=True)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        observer = inotify.InotifyObserver()
+        observer.schedule(event_handler, temp_dir, recursive=True)
+        observer.start()
+
+        written = os.path.join(temp_dir, "written.nc")
+        with open(written, "wb") as f:
+            f.write(b"0" * 1024)
+
+        renamed = os.path.join(temp_dir, "renamed.nc")
+        with open(renamed + ".tmp", "wb") as f:
+            f.write(b"0" * 1024)
+        os.rename(renamed + ".tmp", renamed)
+
+        start = time.monotonic()
+        while len(queue.events) < 2 and time.monotonic() - start < 5:
+            time.sleep(0.01)
+
+        observer.stop()
+        observer.join()
+
+    assert queue.events == [written, renamed]
+
+
+def test_inotify_moved_in() -> None:
+    """Test that files moved in from outside the watched path are enqueued."""
+    inotify = pytest.importorskip("watchdog.observers.inotify")
+
+    queue = ListQueue()
+    event_handler = EventHandler(
+        queue,
+        patterns=["*.nc"],
+        ignore_directories=True,
+        settle_scheduler=SettleScheduler(queue, quiet_period=0.1),
+        close_events=True,
+    )
+
+    with tempfile.TemporaryDirectory() as staging_dir, tempfile.TemporaryDirectory() as temp_dir:
+        observer = inotify.InotifyObserver()
+        observer.schedule(event_handler, temp_dir, recursive=True)
+        observer.start()
+
+        staged = os.path.join(staging_dir, "moved.nc")
+        with open(staged, "wb") as f:
+            f.write(b"0" * 1024)
+
+        moved = os.path.join(temp_dir, "moved.nc")
+        shutil.move(staged, moved)
+
+        start = time.monotonic()
+        while not queue.events and time.monotonic() - start < 5:
+            time.sleep(0.01)
+
+        observer.stop()
+        observer.join()
+        event_handler._settle_scheduler.stop()
+
+    assert queue.events == [moved]
@@ -0,0 +1,73 @@
+"""Test suite for the dpypeline.akita.factory module."""
+import os
+import tempfile
+
+import pytest
+
+pytest.importorskip("watchdog")
+
+from dpypeline.akita.factory import AkitaFactory, CachedListdir  # noqa: E402
+
+# Modification time of the directories, old enough to trust their listings
+PAST_NS = 1_000_000_000_000_000_000
+
+
+def test_cached_listdir() -> None:
+    """Test that listings are reused until the directory changes."""
+    listdir = CachedListdir(maxsize=1)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        other_dir = os.path.join(temp_dir, "other")
+        os.mkdir(other_dir)
+        os.utime(temp_dir, ns=(PAST_NS, PAST_NS))
+
+        entries = listdir(temp_dir)
+        assert [entry.name for entry in entries] == ["other"]
+        assert listdir(temp_dir) is entries
+
+        # Adding an entry changes the modification time of the directory
+        open(os.path.join(temp_dir, "file.nc"), "w").close()
+        entries = listdir(temp_dir)
+        assert sorted(entry.name for entry in entries) == ["file.nc", "other"]
+
+        # The least recently used listing is evicted
+        listdir(other_dir)
+        assert list(listdir._cache) == [other_dir]
+
+
+def test_cached_listdir_racy() -> None:
+    """Test that listings of recently modified directories are not reused."""
+    listdir = CachedListdir()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        open(os.path.join(temp_dir, "0.nc"), "w").close()
+        mtime_ns = os.stat(temp_dir).st_mtime_ns
+        entries = listdir(temp_dir)
+
+        # A file created within the resolution of the modification time
+        open(os.path.join(temp_dir, "1.nc"), "w").close()
+        os.utime(temp_dir, ns=(mtime_ns, mtime_ns))
+
+        entries = listdir(temp_dir)
+        assert sorted(entry.name for entry in entries) == ["0.nc", "1.nc"]
+
+
+def test_get_observer() -> None:
+    """Test the selection of the observer."""
+    from watchdog.observers.polling import PollingObserver, PollingObserverVFS
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        observer = AkitaFactory(temp_dir, observer="polling").get_observer()
+        assert isinstance(observer, PollingObserverVFS)
+
+        observer = AkitaFactory(
+            temp_dir, observer="polling", listdir_cache_size=0, polling_interval=0.5
+        ).get_observer()
+        assert isinstance(observer, PollingObserver)
+        assert observer.timeout == 0.5
+
+        observer = AkitaFactory(temp_dir, observer="auto").get_observer()
+        assert observer is not None
+
+        with pytest.raises(AssertionError):
+            AkitaFactory(temp_dir, observer="fsevents")
@@ -0,0 +1,396 @@
+"""Test suite for the dpypeline.filesystems.object_store module."""
+import asyncio
+import io
+import os
+import socket
+import tempfile
+from contextlib import contextmanager
+from typing import IO, Callable, Generator, Iterator
+
+import pytest
+
+pytest.importorskip("s3fs")
+moto_server = pytest.importorskip("moto.server")
+
+from dpypeline.filesystems import object_store as object_store_module  # noqa: E402
+from dpypeline.filesystems.object_store import ObjectStoreS3  # noqa: E402
+
+BUCKET = "bucket-test"
+MiB = 2**20
+
+
+def get_free_port() -> int:
+    """Return a free local port."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def object_store() -> Generator[ObjectStoreS3, None, None]:
+    """Start a local S3 server and create a bucket."""
+    port = get_free_port()
+    server = moto_server.ThreadedMotoServer(ip_address="127.0.0.1", port=port)
+    server.start()
+
+    store = ObjectStoreS3(
+        key="testing",
+        secret="testing",
+        endpoint_url=f"http://127.0.0.1:{port}",
+        skip_instance_cache=True,
+    )
+    store.create_bucket(BUCKET)
+
+    yield store
+
+    server.stop()
+
+
+@pytest.fixture
+def data() -> bytes:
+    """Return random data spanning several parts."""
+    return os.urandom(11 * MiB + 123)
+
+
+@pytest.fixture
+def buffer_pools(
+    monkeypatch: pytest.MonkeyPatch,
+) -> list[object_store_module.BufferPool]:
+    """Record the buffer pools created by the uploads."""
+    pools: list[object_store_module.BufferPool] = []
+
+    class RecordingBufferPool(object_store_module.BufferPool):
+        def __init__(self, *args, **kwargs) -> None:
+            super().__init__(*args, **kwargs)
+            pools.append(self)
+
+    monkeypatch.setattr(object_store_module, "BufferPool", RecordingBufferPool)
+
+    return pools
+
+
+@contextmanager
+def record_calls(
+    store: ObjectStoreS3, fail: Callable[[list[str]], bool] | None = None
+) -> Iterator[list[str]]:
+    """
+    Record the methods of the S3 requests sent by a store.
+
+    Parameters
+    ----------
+    store
+        Store whose requests are recorded.
+    fail, optional
+        Function of the methods recorded so far that returns whether the
+        request fails with a `ConnectionError`.
+
+    Yields
+    ------
+        Methods of the requests sent, in order.
+    """
+    calls: list[str] = []
+    call_s3 = store._call_s3
+
+    async def recording_call_s3(method, *args, **kwargs):
+        calls.append(method)
+        if fail is not None and fail(calls):
+            raise ConnectionError("Interrupted.")
+        return await call_s3(method, *args, **kwargs)
+
+    store._call_s3 = recording_call_s3
+    try:
+        yield calls
+    finally:
+        del store._call_s3
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_multipart_upload(object_store: ObjectStoreS3, data: bytes, parallel: bool):
+    """Test that a file is uploaded as a multipart upload."""
+    with tempfile.NamedTemporaryFile() as f:
+        f.write(data)
+        f.flush()
+
+        # The listing of the buckets is cached before counting the requests
+        object_store.get_bucket_list()
+        with record_calls(object_store) as calls:
+            object_store.write_file_to_bucket(
+                f.name, BUCKET, f"multipart_{parallel}.bin", 5 * MiB, parallel
+            )
+
+    assert object_store.cat(f"{BUCKET}/multipart_{parallel}.bin") == data
+    assert sorted(calls) == [
+        "complete_multipart_upload",
+        "create_multipart_upload",
+        "upload_part",
+        "upload_part",
+        "upload_part",
+    ]
+    # No part objects are left in the bucket
+    assert not any(".part" in name for name in object_store.ls(BUCKET, refresh=True))
+
+
+def test_bounded_buffers(
+    object_store: ObjectStoreS3,
+    data: bytes,
+    buffer_pools: list[object_store_module.BufferPool],
+) -> None:
+    """Test that at most one buffer per part in flight is allocated."""
+    object_store.write_file_to_bucket(
+        io.BytesIO(data), BUCKET, "bounded.bin", 5 * MiB, True, max_concurrency=2
+    )
+
+    assert object_store.cat(f"{BUCKET}/bounded.bin") == data
+    assert [pool.n_allocated for pool in buffer_pools] == [2]
+
+
+@pytest.mark.parametrize("as_file", [False, True])
+def test_mapped_upload(
+    object_store: ObjectStoreS3,
+    data: bytes,
+    as_file: bool,
+    buffer_pools: list[object_store_module.BufferPool],
+) -> None:
+    """Test that regular files are sent from a memory map, without buffers."""
+    with tempfile.NamedTemporaryFile() as f:
+        f.write(data)
+        f.flush()
+        f.seek(0)
+
+        source: str | IO = f.file if as_file else f.name
+        object_store.write_file_to_bucket(
+            source, BUCKET, f"mapped_{as_file}.bin", 5 * MiB, True
+        )
+        assert not f.closed
+
+    assert object_store.cat(f"{BUCKET}/mapped_{as_file}.bin") == data
+    assert buffer_pools == []
+
+
+def test_changed_file_read_into_buffers(
+    object_store: ObjectStoreS3,
+    data: bytes,
+    buffer_pools: list[object_store_module.BufferPool],
+) -> None:
+    """Test that the parts of a file changed while uploaded are read into buffers."""
+    with tempfile.NamedTemporaryFile() as f:
+        f.write(data)
+        f.flush()
+
+        # The file is touched once the first part is sent from the map
+        def touch(calls: list[str]) -> bool:
+            if calls.count("upload_part") == 1:
+                os.utime(f.name, ns=(0, 0))
+            return False
+
+        with record_calls(object_store, fail=touch):
+            object_store.write_file_to_bucket(
+                f.name, BUCKET, "changed.bin", 5 * MiB, max_concurrency=1
+            )
+        assert object_store.cat(f"{BUCKET}/changed.bin") == data
+        assert [pool.n_allocated for pool in buffer_pools] == [1]
+
+        # The file is truncated before any part is read, which fails cleanly
+        # rather than raising SIGBUS
+        def truncate(calls: list[str]) -> bool:
+            if calls[-1] == "create_multipart_upload":
+                os.truncate(f.name, 6 * MiB)
+            return False
+
+        with record_calls(object_store, fail=truncate), pytest.raises(EOFError):
+            object_store.write_file_to_bucket(f.name, BUCKET, "truncated.bin", 5 * MiB)
+
+
+def test_memory_map_disabled(
+    object_store: ObjectStoreS3,
+    data: bytes,
+    buffer_pools: list[object_store_module.BufferPool],
+) -> None:
+    """Test that files are read into buffers if memory maps are disabled."""
+    store = ObjectStoreS3(
+        key="testing",
+        secret="testing",
+        endpoint_url=object_store._store_credentials["endpoint_url"],
+        skip_instance_cache=True,
+        memory_map=False,
+    )
+    with tempfile.NamedTemporaryFile() as f:
+        f.write(data)
+        f.flush()
+
+        with open(f.name, "rb") as source:
+            assert store._map_file(source) is None
+        store.write_file_to_bucket(f.name, BUCKET, "unmapped.bin", 5 * MiB)
+
+    assert object_store.cat(f"{BUCKET}/unmapped.bin") == data
+    assert len(buffer_pools) == 1
+
+
+def test_small_chunks_enlarged(object_store: ObjectStoreS3, data: bytes) -> None:
+    """Test that chunks smaller than the minimum part size are enlarged."""
+    file = io.BytesIO(data)
+    object_store.write_file_to_bucket(file, BUCKET, "small_chunks.bin", MiB, True)
+
+    assert object_store.cat(f"{BUCKET}/small_chunks.bin") == data
+    assert not file.closed
+
+
+@pytest.mark.parametrize("size", [0, 1000])
+def test_single_part_upload(object_store: ObjectStoreS3, size: int) -> None:
+    """Test that files of a single chunk are uploaded with a single request."""
+    file = io.BytesIO(os.urandom(size))
+    object_store.write_file_to_bucket(file, BUCKET, f"single_{size}.bin")
+
+    assert object_store.cat(f"{BUCKET}/single_{size}.bin") == file.getvalue()
+
+
+@pytest.fixture
+def resumable_store(
+    object_store: ObjectStoreS3, cache_dir: str
+) -> Generator[ObjectStoreS3, None, None]:
+    """Return a store, on the same server, that persists the state of uploads."""
+    store = ObjectStoreS3(
+        key="testing",
+        secret="testing",
+        endpoint_url=object_store._store_credentials["endpoint_url"],
+        skip_instance_cache=True,
+        resumable=True,
+    )
+
+    yield store
+
+    store.abort_stale_uploads(BUCKET, max_age=0)
+
+
+def test_resume_interrupted_upload(
+    resumable_store: ObjectStoreS3, data: bytes, cache_dir: str
+) -> None:
+    """Test that an interrupted upload only uploads the missing parts again."""
+    with tempfile.NamedTemporaryFile() as f:
+        f.write(data)
+        f.flush()
+
+        with record_calls(
+            resumable_store, fail=lambda calls: calls.count("upload_part") == 2
+        ) as calls, pytest.raises(ConnectionError):
+            resumable_store.write_file_to_bucket(f.name, BUCKET, "resumed.bin", 5 * MiB)
+        assert "abort_multipart_upload" not in calls
+        assert len(os.listdir(os.path.join(cache_dir, "uploads"))) == 1
+
+        with record_calls(resumable_store) as calls:
+            resumable_store.write_file_to_bucket(f.name, BUCKET, "resumed.bin", 5 * MiB)
+
+    assert resumable_store.cat(f"{BUCKET}/resumed.bin") == data
+    assert sorted(calls) == [
+        "complete_multipart_upload",
+        "list_parts",
+        "upload_part",
+        "upload_part",
+    ]
+    assert os.listdir(os.path.join(cache_dir, "uploads")) == []
+
+
+def test_abort_stale_uploads(resumable_store: ObjectStoreS3, cache_dir: str) -> None:
+    """Test that the uploads left in progress by the store are aborted once old enough."""
+    upload = resumable_store.call_s3(
+        "create_multipart_upload", Bucket=BUCKET, Key="stale.bin"
+    )
+    resumable_store._upload_states.start(
+        f"{BUCKET}/stale.bin", upload["UploadId"], fingerprint={}
+    )
+    # Uploads of other clients of the bucket are not recorded
+    foreign = resumable_store.call_s3(
+        "create_multipart_upload", Bucket=BUCKET, Key="foreign.bin"
+    )
+
+    assert resumable_store.abort_stale_uploads(BUCKET, max_age=100 * 365 * 86400) == 0
+    assert resumable_store.abort_stale_uploads(BUCKET, max_age=0) == 1
+    uploads = resumable_store.call_s3("list_multipart_uploads", Bucket=BUCKET)
+    assert [u["UploadId"] for u in uploads.get("Uploads", [])] == [foreign["UploadId"]]
+    assert os.listdir(os.path.join(cache_dir, "uploads")) == []
+
+    resumable_store.call_s3(
+        "abort_multipart_upload",
+        Bucket=BUCKET,
+        Key="foreign.bin",
+        UploadId=foreign["UploadId"],
+    )
+
+
+@pytest.fixture
+def sync_store(object_store: ObjectStoreS3) -> ObjectStoreS3:
+    """Return a store, on the same server, that skips the files already uploaded."""
+    store = ObjectStoreS3(
+        key="testing",
+        secret="testing",
+        endpoint_url=object_store._store_credentials["endpoint_url"],
+        skip_instance_cache=True,
+        sync=True,
+    )
+    # The listing of the buckets is cached before counting the requests
+    store.get_bucket_list()
+
+    return store
+
+
+@pytest.mark.parametrize("chunk_size", [-1, 5 * MiB])
+def test_sync_skips_unchanged(
+    object_store: ObjectStoreS3, sync_store: ObjectStoreS3, data: bytes, chunk_size: int
+) -> None:
+    """Test that files already present with the same content are not uploaded."""
+    file_name = f"sync_{chunk_size}/data.bin"
+    with tempfile.NamedTemporaryFile() as f:
+        f.write(data)
+        f.flush()
+        object_store.write_file_to_bucket(f.name, BUCKET, file_name, chunk_size)
+
+        # The object uploaded by another store is found by listing the prefix
+        with record_calls(sync_store) as calls:
+            sync_store.write_file_to_bucket(f.name, BUCKET, file_name, chunk_size)
+            assert calls == ["list_objects_v2"]
+
+            # The listing is cached, and a file of the same size but another
+            # content is uploaded
+            calls.clear()
+            f.seek(0)
+            f.write(os.urandom(16))
+            f.flush()
+            sync_store.write_file_to_bucket(f.name, BUCKET, file_name, chunk_size)
+            assert "list_objects_v2" not in calls and calls
+
+            # The inventory is updated with the object uploaded
+            calls.clear()
+            sync_store.write_file_to_bucket(f.name, BUCKET, file_name, chunk_size)
+            assert calls == []
+
+        f.seek(0)
+        assert object_store.cat(f"{BUCKET}/{file_name}") == f.read()
+
+
+def test_async_sync_skips_unchanged(
+    object_store: ObjectStoreS3, sync_store: ObjectStoreS3, data: bytes
+) -> None:
+    """Test that asynchronous writes also skip files already present."""
+    file_name = "sync_async/data.bin"
+    with tempfile.NamedTemporaryFile() as f:
+        f.write(data)
+        f.flush()
+        object_store.write_file_to_bucket(f.name, BUCKET, file_name)
+
+        with record_calls(sync_store) as calls:
+            asyncio.run(
+                sync_store.write_file_to_bucket_async(f.name, BUCKET, file_name)
+            )
+            assert calls == ["list_objects_v2"]
+
+            calls.clear()
+            f.seek(0)
+            f.write(os.urandom(16))
+            f.flush()
+            asyncio.run(
+                sync_store.write_file_to_bucket_async(f.name, BUCKET, file_name)
+            )
+            assert "list_objects_v2" not in calls and calls
+
+        f.seek(0)
+        assert object_store.cat(f"{BUCKET}/{file_name}") == f.read()
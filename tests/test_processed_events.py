@@ -0,0 +1,115 @@
+"""Test suite for the dpypeline.akita.processed_events module."""
+import os
+import pickle
+import sqlite3
+import time
+
+from dpypeline.akita.processed_events import ProcessedEventsStore
+
+
+def delete_store_files(cache_dir: str, file_name: str) -> None:
+    """Delete the files of the store."""
+    for suffix in ["", "-wal", "-shm"]:
+        if os.path.isfile(os.path.join(cache_dir, file_name + suffix)):
+            os.remove(os.path.join(cache_dir, file_name + suffix))
+
+
+def test_add_contains(cache_dir: str) -> None:
+    """Test adding events and testing their membership."""
+    delete_store_files(cache_dir, "processed_test.db")
+    store = ProcessedEventsStore(os.path.join(cache_dir, "processed_test.db"))
+
+    assert len(store) == 0
+    assert "file1.nc" not in store
+
+    store.add("file1.nc")
+    store.add("file1.nc")
+    store.add_many(["file2.nc", "file3.nc"])
+
+    assert len(store) == 3
+    assert "file1.nc" in store
+    assert "file4.nc" not in store
+    assert sorted(store) == ["file1.nc", "file2.nc", "file3.nc"]
+
+    store.close()
+
+
+def test_persistence(cache_dir: str) -> None:
+    """Test that events are persisted between instances."""
+    delete_store_files(cache_dir, "processed_test.db")
+    store = ProcessedEventsStore(os.path.join(cache_dir, "processed_test.db"))
+    store.add_many(range(100))
+    store.close()
+
+    store = ProcessedEventsStore(os.path.join(cache_dir, "processed_test.db"))
+    assert len(store) == 100
+    assert 42 in store
+    assert 100 not in store
+
+    store.close()
+
+
+def test_import_legacy_file(cache_dir: str) -> None:
+    """Test that a pickled list of processed events is imported."""
+    delete_store_files(cache_dir, "processed_test.db")
+    legacy_file = os.path.join(cache_dir, "processed_test.pickle")
+    with open(legacy_file, "wb") as f:
+        pickle.dump(["file1.nc", "file2.nc"], f)
+
+    store = ProcessedEventsStore(
+        os.path.join(cache_dir, "processed_test.db"), legacy_file=legacy_file
+    )
+    assert len(store) == 2
+    assert "file2.nc" in store
+    store.close()
+
+    # The legacy file is only imported when the database is created
+    with open(legacy_file, "wb") as f:
+        pickle.dump(["file3.nc"], f)
+
+    store = ProcessedEventsStore(
+        os.path.join(cache_dir, "processed_test.db"), legacy_file=legacy_file
+    )
+    assert len(store) == 2
+    assert "file3.nc" not in store
+    store.close()
+
+
+def test_processed_at(cache_dir: str) -> None:
+    """Test that the time at which events were last processed is recorded."""
+    delete_store_files(cache_dir, "processed_test.db")
+    store = ProcessedEventsStore(os.path.join(cache_dir, "processed_test.db"))
+
+    before = time.time()
+    store.add("file1.nc")
+    assert store.processed_at("file2.nc") is None
+    assert before <= store.processed_at("file1.nc") <= time.time()
+
+    # Processed again, e.g., after it was modified
+    time.sleep(0.01)
+    processed_at = store.processed_at("file1.nc")
+    store.add_many(["file1.nc"])
+    assert store.processed_at("file1.nc") > processed_at
+    assert len(store) == 1
+    store.close()
+
+
+def test_processed_at_unknown(cache_dir: str) -> None:
+    """Test that stores created before the processing times were recorded are read."""
+    delete_store_files(cache_dir, "processed_test.db")
+    db_file = os.path.join(cache_dir, "processed_test.db")
+    connection = sqlite3.connect(db_file)
+    connection.execute(
+        "CREATE TABLE processed_events (event PRIMARY KEY) WITHOUT ROWID"
+    )
+    connection.execute("INSERT INTO processed_events VALUES ('file1.nc')")
+    connection.commit()
+    connection.close()
+
+    store = ProcessedEventsStore(db_file)
+    assert "file1.nc" in store
+    assert store.processed_at("file1.nc") is None
+
+    store.add("file2.nc")
+    assert store.processed_at("file2.nc") is not None
+    store.close()
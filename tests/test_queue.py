@@ -1,6 +1,11 @@
 """Test suite for the EventsQueue class."""
 import os
 import random
+import threading
+import time
+from queue import Full
+
+import pytest
 
 from dpypeline.akita.queue_events import EventsQueue
 
@@ -8,10 +13,11 @@ os.environ["CACHE_DIR"] = "tests/"
 
 
 def delete_cache_file() -> None:
-    """Delete the cache file containg the queue."""
-    state_file = os.path.join(os.getenv("CACHE_DIR"), "queue_state.pickle")
-    if os.path.isfile(state_file):
-        os.remove(state_file)
+    """Delete the cache files containg the queue."""
+    for file_suffix in ["queue_state.pickle", "queue_state.journal"]:
+        state_file = os.path.join(os.getenv("CACHE_DIR"), file_suffix)
+        if os.path.isfile(state_file):
+            os.remove(state_file)
 
 
 def add_elements_to_queue(
@@ -152,3 +158,240 @@ def test_clear_instance() -> None:
     queue_new = EventsQueue()
 
     assert queue is not queue_new
+
+    queue_new.clear_instance()
+
+
+def test_journal_replay() -> None:
+    """Test that dequeued and removed events are not recovered from the journal."""
+    delete_cache_file()
+
+    queue = EventsQueue()
+    queue, added_elements = add_elements_to_queue(queue, 10)
+    queue.dequeue()
+    queue.remove(5)
+    queue.clear_instance()
+
+    new_queue = EventsQueue()
+    assert list(new_queue.queue) == [x for x in added_elements[1:] if x != 5]
+
+    new_queue.clear_instance()
+
+
+def test_journal_compaction() -> None:
+    """Test that the state of the queue is recovered after compacting the journal."""
+    delete_cache_file()
+
+    queue = EventsQueue(compact_every=4)
+    queue, added_elements = add_elements_to_queue(queue, 50)
+    for _ in range(7):
+        queue.dequeue()
+
+    assert os.path.isfile(queue._state_file)
+    queue.clear_instance()
+
+    new_queue = EventsQueue()
+    assert list(new_queue.queue) == added_elements[7:]
+
+    new_queue.clear_instance()
+
+
+def test_processed_events() -> None:
+    """Test that dequeued and removed events are set as processed."""
+    delete_cache_file()
+
+    queue = EventsQueue()
+    for event in ["processed_0", "processed_1", "processed_2"]:
+        queue.enqueue(event)
+    queue.dequeue()
+    queue.remove("processed_2")
+
+    assert queue.is_processed("processed_0")
+    assert not queue.is_processed("processed_1")
+    assert queue.is_processed("processed_2")
+    assert "processed_2" in queue.processed_events
+
+    queue.clear_instance()
+
+
+def test_enqueue_many() -> None:
+    """Test the enqueue_many method."""
+    delete_cache_file()
+
+    queue = EventsQueue()
+    queue, added_elements = add_elements_to_queue(queue, 3)
+
+    assert queue.enqueue_many([]) == 0
+    assert queue.enqueue_many(range(3, 10)) == 7
+    assert list(queue.queue) == list(range(10))
+
+    queue.dequeue()
+    queue.clear_instance()
+
+    new_queue = EventsQueue()
+    assert list(new_queue.queue) == list(range(1, 10))
+
+    new_queue.clear_instance()
+
+
+def test_blocking_dequeue() -> None:
+    """Test that a blocking dequeue is woken up by an enqueue."""
+    delete_cache_file()
+    queue = EventsQueue()
+
+    # Times out when the queue is empty
+    start = time.monotonic()
+    assert queue.dequeue(block=True, timeout=0.1) is None
+    assert time.monotonic() - start >= 0.1
+
+    timer = threading.Timer(0.05, queue.enqueue, args=("blocking_event",))
+    timer.start()
+    start = time.monotonic()
+    assert queue.dequeue(block=True, timeout=5) == "blocking_event"
+    assert time.monotonic() - start < 1
+    timer.join()
+
+    queue.clear_instance()
+
+
+def test_sentinel_wakes_waiters() -> None:
+    """Test that activating the sentinel wakes up the waiting consumers."""
+    delete_cache_file()
+    queue = EventsQueue()
+    queue.set_sentinel_state(active=False)
+
+    timer = threading.Timer(0.05, queue.set_sentinel_state, args=(True,))
+    timer.start()
+    start = time.monotonic()
+    assert not queue.wait_for_events(timeout=5)
+    assert time.monotonic() - start < 1
+    timer.join()
+
+    # Waiting returns immediately if there are events in the queue
+    queue.enqueue("sentinel_event")
+    assert queue.wait_for_events(timeout=5)
+
+    queue.clear_instance()
+
+
+def test_claim_ack_nack() -> None:
+    """Test claiming events and releasing their leases."""
+    delete_cache_file()
+    queue = EventsQueue()
+    queue.enqueue_many(["lease_0", "lease_1", "lease_2"])
+
+    assert queue.claim() == "lease_0"
+    assert queue.claim() == "lease_1"
+    assert queue.queue_list == ["lease_2"]
+    assert queue.leased_events == ["lease_0", "lease_1"]
+
+    assert queue.ack("lease_0")
+    assert queue.is_processed("lease_0")
+    assert not queue.ack("lease_0")
+
+    assert queue.nack("lease_1")
+    assert not queue.is_processed("lease_1")
+    assert queue.queue_list == ["lease_2", "lease_1"]
+    assert queue.leased_events == []
+
+    assert queue.claim() == "lease_2"
+    assert queue.claim() == "lease_1"
+    assert queue.claim() is None
+
+    queue.clear_instance()
+
+
+def test_redeliver_leased_events() -> None:
+    """Test that only the leased events are re-delivered after a restart."""
+    delete_cache_file()
+    queue = EventsQueue()
+    queue.enqueue_many(["redeliver_0", "redeliver_1", "redeliver_2", "redeliver_3"])
+
+    queue.claim()
+    queue.claim()
+    queue.claim()
+    queue.ack("redeliver_1")
+    queue.clear_instance()
+
+    new_queue = EventsQueue()
+    assert new_queue.leased_events == []
+    assert new_queue.queue_list == ["redeliver_0", "redeliver_2", "redeliver_3"]
+
+    # The re-delivery survives a further restart
+    assert new_queue.claim() == "redeliver_0"
+    new_queue.clear_instance()
+
+    new_new_queue = EventsQueue()
+    assert new_new_queue.queue_list == ["redeliver_0", "redeliver_2", "redeliver_3"]
+
+    new_new_queue.clear_instance()
+
+
+def test_dead_letters() -> None:
+    """Test moving events to the dead-letter queue and re-queueing them."""
+    delete_cache_file()
+    queue = EventsQueue()
+    queue.enqueue_many(["dead_0", "dead_1"])
+
+    queue.claim()
+    assert queue.dead_letter("dead_0", attempts=4, error="ValueError()")
+    assert not queue.dead_letter("dead_0", attempts=4, error="ValueError()")
+    # Events that are not leased are not dead-lettered
+    assert not queue.dead_letter("dead_1", attempts=4, error="ValueError()")
+    assert not queue.is_dead_lettered("dead_1")
+    assert queue.is_dead_lettered("dead_0")
+    assert not queue.is_processed("dead_0")
+    assert queue.leased_events == []
+    assert "dead_0" in [event for event, *_ in queue.dead_letters.items()]
+
+    assert queue.requeue_dead_letters(["dead_0", "dead_1"]) == 1
+    assert not queue.is_dead_lettered("dead_0")
+    assert queue.queue_list == ["dead_1", "dead_0"]
+
+    queue.clear_instance()
+
+
+def test_requeue_dead_letters_full(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that dead-lettered events are kept if they cannot be re-queued."""
+    delete_cache_file()
+    queue = EventsQueue()
+    queue.enqueue("dead_full")
+    queue.claim()
+    queue.dead_letter("dead_full", attempts=4, error="ValueError()")
+
+    def enqueue_many(events: list) -> int:
+        raise Full("Queue is full.")
+
+    monkeypatch.setattr(queue, "enqueue_many", enqueue_many)
+    with pytest.raises(Full):
+        queue.requeue_dead_letters(["dead_full"])
+    assert queue.is_dead_lettered("dead_full")
+
+    monkeypatch.undo()
+    assert queue.requeue_dead_letters(["dead_full"]) == 1
+    assert not queue.is_dead_lettered("dead_full")
+
+    queue.clear_instance()
+
+
+def test_queue_locked() -> None:
+    """Test that a queue in use by another process cannot be opened."""
+    fcntl = pytest.importorskip("fcntl")
+    delete_cache_file()
+
+    lock_file = os.path.join(os.getenv("CACHE_DIR"), EventsQueue._lock_file_suffix)
+    with open(lock_file, "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        with pytest.raises(RuntimeError, match="in use by another process"):
+            EventsQueue()
+    EventsQueue.clear_instance()
+
+    queue = EventsQueue()
+    with open(lock_file, "a") as f:
+        with pytest.raises(BlockingIOError):
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    queue.clear_instance()
+
+    # The lock is released with the queue
+    with open(lock_file, "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
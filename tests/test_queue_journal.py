@@ -0,0 +1,109 @@
+"""Test suite for the dpypeline.akita.queue_journal module."""
+import os
+from collections import deque
+
+from dpypeline.akita.queue_journal import QueueJournal
+
+
+def get_journal(cache_dir: str, compact_every: int = 10000) -> QueueJournal:
+    """Create a journal whose files are stored in the cache directory."""
+    return QueueJournal(
+        snapshot_file=os.path.join(cache_dir, "journal_test.pickle"),
+        journal_file=os.path.join(cache_dir, "journal_test.journal"),
+        compact_every=compact_every,
+    )
+
+
+def delete_journal_files(cache_dir: str) -> None:
+    """Delete the files of the journal."""
+    for file_name in ["journal_test.pickle", "journal_test.journal"]:
+        if os.path.isfile(os.path.join(cache_dir, file_name)):
+            os.remove(os.path.join(cache_dir, file_name))
+
+
+def test_recover_empty(cache_dir: str) -> None:
+    """Test the recovery when neither the snapshot nor the journal exist."""
+    delete_journal_files(cache_dir)
+    journal = get_journal(cache_dir)
+
+    state, records = journal.recover()
+    assert state is None
+    assert records == []
+
+    journal.close()
+
+
+def test_append_recover(cache_dir: str) -> None:
+    """Test that appended records are replayed upon recovery."""
+    delete_journal_files(cache_dir)
+    journal = get_journal(cache_dir)
+    journal.recover()
+
+    journal.append("enqueue", "a")
+    journal.append("enqueue", "b")
+    journal.append("dequeue")
+    journal.close()
+
+    journal = get_journal(cache_dir)
+    state, records = journal.recover()
+    assert state is None
+    assert records == [("enqueue", ("a",)), ("enqueue", ("b",)), ("dequeue", ())]
+
+    journal.close()
+
+
+def test_compact(cache_dir: str) -> None:
+    """Test that compaction writes a snapshot and truncates the journal."""
+    delete_journal_files(cache_dir)
+    journal = get_journal(cache_dir, compact_every=2)
+    journal.recover()
+
+    journal.append("enqueue", "a")
+    assert not journal.needs_compaction(1)
+    journal.append("enqueue", "b")
+    assert journal.needs_compaction(2)
+    assert not journal.needs_compaction(3)
+
+    journal.compact(deque(["a", "b"]))
+    assert os.path.getsize(os.path.join(cache_dir, "journal_test.journal")) == 0
+    assert not journal.needs_compaction(2)
+
+    journal.append("enqueue", "c")
+    journal.close()
+
+    journal = get_journal(cache_dir)
+    state, records = journal.recover()
+    assert state == deque(["a", "b"])
+    assert records == [("enqueue", ("c",))]
+
+    journal.close()
+
+
+def test_torn_record(cache_dir: str) -> None:
+    """Test that a partially written record is discarded upon recovery."""
+    delete_journal_files(cache_dir)
+    journal = get_journal(cache_dir)
+    journal.recover()
+
+    journal.append("enqueue", "a")
+    journal.append("enqueue", "b")
+    journal.close()
+
+    # Simulate a crash while the last record was being written
+    journal_file = os.path.join(cache_dir, "journal_test.journal")
+    with open(journal_file, "rb+") as f:
+        f.truncate(os.path.getsize(journal_file) - 3)
+
+    journal = get_journal(cache_dir)
+    state, records = journal.recover()
+    assert records == [("enqueue", ("a",))]
+
+    # New records are appended after the last valid record
+    journal.append("enqueue", "c")
+    journal.close()
+
+    journal = get_journal(cache_dir)
+    state, records = journal.recover()
+    assert records == [("enqueue", ("a",)), ("enqueue", ("c",))]
+
+    journal.close()
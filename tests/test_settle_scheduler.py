@@ -0,0 +1,89 @@
+"""Test suite for the dpypeline.akita.settle_scheduler module."""
+import os
+import tempfile
+import time
+from typing import Any, Iterable
+
+from dpypeline.akita.settle_scheduler import SettleScheduler
+
+
+class ListQueue:
+    """Queue that records the enqueued events."""
+
+    def __init__(self) -> None:
+        """Initialize the queue."""
+        self.events: list[Any] = []
+
+    def enqueue_many(self, events: Iterable[Any]) -> int:
+        """Record the events."""
+        events = list(events)
+        self.events.extend(events)
+        return len(events)
+
+
+def test_sweep() -> None:
+    """Test that files are enqueued once they have been stable for the quiet period."""
+    queue = ListQueue()
+    scheduler = SettleScheduler(queue, quiet_period=0.2, sweep_interval=60)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        stable_file = os.path.join(temp_dir, "stable.nc")
+        growing_file = os.path.join(temp_dir, "growing.nc")
+        deleted_file = os.path.join(temp_dir, "deleted.nc")
+        for path in [stable_file, growing_file, deleted_file]:
+            with open(path, "wb") as f:
+                f.write(b"0")
+            scheduler.track(path)
+
+        assert scheduler.sweep() == []
+        assert sorted(scheduler.pending) == sorted(
+            [stable_file, growing_file, deleted_file]
+        )
+
+        time.sleep(0.25)
+        with open(growing_file, "ab") as f:
+            f.write(b"1")
+        os.remove(deleted_file)
+
+        # The stable file settles, the growing file is tracked again
+        # and the deleted file is dropped
+        assert scheduler.sweep() == [stable_file]
+        assert scheduler.pending == [growing_file]
+
+        time.sleep(0.25)
+        assert scheduler.sweep() == [growing_file]
+        assert scheduler.pending == []
+
+    assert queue.events == [stable_file, growing_file]
+    scheduler.stop()
+
+
+def test_concurrent_files() -> None:
+    """Test that files being written do not delay other files from being enqueued."""
+    queue = ListQueue()
+    scheduler = SettleScheduler(queue, quiet_period=0.1, sweep_interval=0.02)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        growing_file = os.path.join(temp_dir, "growing.nc")
+        with open(growing_file, "wb") as f:
+            f.write(b"0")
+        scheduler.track(growing_file)
+
+        paths = [os.path.join(temp_dir, f"file_{i}.nc") for i in range(100)]
+        for path in paths:
+            with open(path, "wb") as f:
+                f.write(b"0")
+            scheduler.track(path)
+
+        # Keep writing to one file while the others settle
+        start = time.monotonic()
+        while len(queue.events) < len(paths) and time.monotonic() - start < 2:
+            with open(growing_file, "ab") as f:
+                f.write(b"1")
+            time.sleep(0.01)
+
+        assert sorted(queue.events) == sorted(paths)
+        assert scheduler.pending == [growing_file]
+
+    scheduler.stop()
+    assert not scheduler._worker.is_alive()
@@ -0,0 +1,126 @@
+"""Test suite for the dpypeline.akita.stat_cache module."""
+import os
+import tempfile
+from typing import Generator
+
+import pytest
+
+from dpypeline.akita import stat_cache
+from dpypeline.akita.directory_state import DirectoryState
+from dpypeline.akita.stat_cache import StatCache
+
+# Modification time of the directories, old enough to trust their listings
+PAST_NS = 1_000_000_000_000_000_000
+
+
+@pytest.fixture
+def temp_tree() -> Generator[str, None, None]:
+    """Create a temporary tree of files whose directories were modified long ago."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for directory in ["a", "b"]:
+            os.makedirs(os.path.join(temp_dir, directory))
+            for i in range(3):
+                with open(os.path.join(temp_dir, directory, f"{i}.nc"), "w") as f:
+                    f.write("data")
+            os.utime(os.path.join(temp_dir, directory), ns=(PAST_NS, PAST_NS))
+        os.utime(temp_dir, ns=(PAST_NS, PAST_NS))
+
+        yield temp_dir
+
+
+def test_diff(temp_tree: str, cache_dir: str) -> None:
+    """Test that added, modified and removed files are found."""
+    cache_file = os.path.join(cache_dir, "test_diff.pickle")
+    directory_state = DirectoryState(temp_tree, ["**/*.nc"], {"recursive": True})
+    directory_state._stat_cache = StatCache(cache_file)
+
+    diff = directory_state.diff
+    assert sorted(diff.added) == sorted(directory_state._current_state)
+    assert diff.modified == [] and diff.removed == []
+    directory_state.save_stat_cache()
+
+    # Overwrite a file in place, add a file and remove another
+    with open(os.path.join(temp_tree, "a", "0.nc"), "w") as f:
+        f.write("more data")
+    with open(os.path.join(temp_tree, "a", "3.nc"), "w") as f:
+        f.write("data")
+    os.remove(os.path.join(temp_tree, "b", "2.nc"))
+
+    # The cache is reloaded from disk, as on restart
+    directory_state._stat_cache = StatCache(cache_file)
+    directory_state._get_current_directory_state()
+
+    assert directory_state.diff.added == [os.path.join(temp_tree, "a", "3.nc")]
+    assert directory_state.diff.modified == [os.path.join(temp_tree, "a", "0.nc")]
+    assert directory_state.diff.removed == [os.path.join(temp_tree, "b", "2.nc")]
+
+
+def test_diff_until_saved(temp_tree: str, cache_dir: str) -> None:
+    """Test that the changes are found again until the stat cache is saved."""
+    cache_file = os.path.join(cache_dir, "test_diff_until_saved.pickle")
+    directory_state = DirectoryState(temp_tree, ["**/*.nc"], {"recursive": True})
+    directory_state._stat_cache = StatCache(cache_file)
+    directory_state._get_current_directory_state()
+    directory_state.save_stat_cache()
+
+    with open(os.path.join(temp_tree, "a", "0.nc"), "w") as f:
+        f.write("more data")
+
+    # Stopped before the changes were handled, e.g., on a crash
+    for _ in range(2):
+        directory_state._stat_cache = StatCache(cache_file)
+        directory_state._get_current_directory_state()
+        assert directory_state.diff.modified == [os.path.join(temp_tree, "a", "0.nc")]
+
+    directory_state.save_stat_cache()
+    directory_state._stat_cache = StatCache(cache_file)
+    directory_state._get_current_directory_state()
+    assert directory_state.diff.modified == []
+
+
+def test_listings_reused(
+    temp_tree: str, cache_dir: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that only the directories that have changed are listed again."""
+    listed = []
+    original_list_directory = stat_cache.list_directory
+
+    def list_directory(directory: str) -> list[tuple[str, bool]]:
+        listed.append(directory)
+        return original_list_directory(directory)
+
+    monkeypatch.setattr(stat_cache, "list_directory", list_directory)
+
+    cache_file = os.path.join(cache_dir, "test_listings_reused.pickle")
+    directory_state = DirectoryState(temp_tree, ["**/*.nc"], {"recursive": True})
+    directory_state._stat_cache = StatCache(cache_file)
+    directory_state._get_current_directory_state()
+    directory_state.save_stat_cache()
+    assert len(listed) == 3
+
+    # Add a file to one of the directories
+    listed.clear()
+    with open(os.path.join(temp_tree, "b", "3.nc"), "w") as f:
+        f.write("data")
+
+    directory_state._stat_cache = StatCache(cache_file)
+    directory_state._get_current_directory_state()
+
+    assert listed == [os.path.join(temp_tree, "b")]
+    assert directory_state.diff.added == [os.path.join(temp_tree, "b", "3.nc")]
+    assert len(directory_state.current_state) == 7
+
+
+def test_check_modified(temp_tree: str, cache_dir: str) -> None:
+    """Test that files in unchanged directories are not stat'ed if not checked."""
+    cache_file = os.path.join(cache_dir, "test_check_modified.pickle")
+    cache = StatCache(cache_file, check_modified=False)
+    directory_state = DirectoryState(temp_tree, ["**/*.nc"], {"recursive": True})
+    directory_state._stat_cache = cache
+    directory_state._get_current_directory_state()
+
+    with open(os.path.join(temp_tree, "a", "0.nc"), "w") as f:
+        f.write("more data")
+    directory_state._get_current_directory_state()
+
+    assert directory_state.diff.modified == []